@@ -0,0 +1,134 @@
+"""
+Benchmark: local (Pillow) image engine vs Cloudinary on a fixed image corpus.
+
+The default corpus is generated deterministically (same images on every run);
+pass --corpus DIR to use real images instead. The Cloudinary path needs the
+CLOUDINARY_* settings and network access and only runs with --cloudinary.
+
+    PYTHONPATH=src python benchmarks/bench_images.py [--corpus DIR] [--repeat 3] [--cloudinary]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from notifications_worker.domain.variants import VariantTarget, variant_targets
+from notifications_worker.infra.imaging.local import (
+    pillow_formats,
+    render_variants,
+    render_variants_in_pool,
+)
+
+# name, size, format
+GENERATED_CORPUS = [
+    ("photo-800x600.jpg", (800, 600), "JPEG"),
+    ("photo-2400x1600.jpg", (2400, 1600), "JPEG"),
+    ("photo-4000x3000.jpg", (4000, 3000), "JPEG"),
+    ("photo-6000x4000.jpg", (6000, 4000), "JPEG"),
+    ("packshot-1500x1500.png", (1500, 1500), "PNG"),
+    ("cutout-1200x1600.png", (1200, 1600), "PNG"),
+]
+
+
+def generated_corpus() -> dict[str, bytes]:
+    corpus: dict[str, bytes] = {}
+    for i, (name, size, fmt) in enumerate(GENERATED_CORPUS):
+        extent = (-2.0 + i * 0.1, -1.2, 0.6, 1.2)
+        image = Image.effect_mandelbrot(size, extent, 80 + i * 10)
+        gradient = Image.linear_gradient("L").resize(size)
+        image = Image.merge("RGB", (image, gradient, ImageOps.invert(image)))
+        if name.startswith("cutout"):
+            image.putalpha(gradient)
+        buffer = BytesIO()
+        image.save(buffer, fmt, **({"quality": 92} if fmt == "JPEG" else {}))
+        corpus[name] = buffer.getvalue()
+    return corpus
+
+
+def load_corpus(directory: Path) -> dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(directory.iterdir()) if path.is_file()}
+
+
+def local_targets() -> list[VariantTarget]:
+    formats = pillow_formats()
+    return [t for t in variant_targets().values() if t.format in formats]
+
+
+def run_local(data: bytes) -> int:
+    return sum(len(v.data) for v in render_variants(data, local_targets()))
+
+
+def run_local_pool(data: bytes) -> int:
+    return sum(len(v.data) for v in render_variants_in_pool(data, local_targets()))
+
+
+def run_cloudinary(data: bytes) -> int:
+    from notifications_worker.infra.cloudinary.client import (
+        delete_from_cloudinary,
+        download_variant,
+        fetch_and_transform,
+        parse_eager_results,
+    )
+
+    public_id = f"temp/leaf-flow/bench/{time.monotonic_ns()}"
+    with tempfile.NamedTemporaryFile() as original:
+        original.write(data)
+        original.flush()
+        try:
+            result = fetch_and_transform(original.name, public_id)
+            eager = parse_eager_results(result["eager"])  # type: ignore[arg-type]
+            return sum(len(download_variant(str(v["url"]))) for v in eager.values())
+        finally:
+            delete_from_cloudinary(public_id)
+
+
+def measure(run: Callable[[bytes], int], data: bytes, repeat: int) -> tuple[float, int]:
+    """Median milliseconds per image and total bytes of the produced variants."""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = run(data)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=Path, help="directory with original images")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per image (median)")
+    parser.add_argument("--cloudinary", action="store_true", help="also run the Cloudinary path")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else generated_corpus()
+    engines: dict[str, Callable[[bytes], int]] = {
+        "local": run_local,
+        "local-pool": run_local_pool,
+    }
+    if args.cloudinary:
+        engines["cloudinary"] = run_cloudinary
+
+    # Start the process pool before timing
+    run_local_pool(next(iter(corpus.values())))
+
+    totals = dict.fromkeys(engines, 0.0)
+    print(f"{'image':<28} {'original':>10} " + " ".join(f"{e:>18}" for e in engines))
+    for name, data in corpus.items():
+        cells = []
+        for engine, run in engines.items():
+            ms, size = measure(run, data, args.repeat)
+            totals[engine] += ms
+            cells.append(f"{ms:>8.0f} ms {size / 1024:>5.0f}K")
+        print(f"{name:<28} {len(data) / 1024:>9.0f}K " + " ".join(f"{c:>18}" for c in cells))
+
+    print(f"{'total':<28} {'':>10} " + " ".join(f"{t:>15.0f} ms" for t in totals.values()))
+
+
+if __name__ == "__main__":
+    main()
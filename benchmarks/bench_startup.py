@@ -0,0 +1,152 @@
+"""
+Benchmark: worker cold start, offline.
+
+Every sample runs in a fresh interpreter:
+
+- import: `import notifications_worker.app` (what each container start pays);
+- worker[<queues>]: the worker start hooks for a worker consuming <queues> after the
+  import: init_worker in the main process, then init_worker_process as in each prefork
+  child (per-process clients; HTTP warmup is off, there is no network).
+
+The modules column lists the heavy SDKs loaded by the end of the scenario.
+
+    PYTHONPATH=src python benchmarks/bench_startup.py [--repeat 5] [--importtime 15]
+        [--output startup.json] [--baseline startup.json]
+
+--importtime N also prints the N slowest modules of the import (python -X importtime,
+cumulative). A saved --output passed as --baseline prints the change of every median (ms).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+# Settings are read on import: offline values for the required ones
+OFFLINE_ENV = {
+    "TELEGRAM_BOT_TOKEN": "123456:bench",
+    "ADMIN_CHAT_ID": "-1001234567890",
+    "S3_ENDPOINT": "http://127.0.0.1:9",
+    "S3_ACCESS_KEY": "bench",
+    "S3_SECRET_KEY": "bench",
+    "S3_BUCKET": "bench",
+    "API_BASE_URL": "http://127.0.0.1:9",
+    "INTERNAL_TOKEN": "bench",
+    "CLOUDINARY_CLOUD_NAME": "bench",
+    "CLOUDINARY_API_KEY": "bench",
+    "CLOUDINARY_API_SECRET": "bench",
+    "HTTP_WARMUP_ENABLED": "false",
+    "METRICS_ENABLED": "false",
+    "PROFILING_ENABLED": "false",
+}
+HEAVY_MODULES = ("boto3", "botocore", "cloudinary", "PIL", "prometheus_client")
+SCENARIOS = ("import", "worker[notifications]", "worker[images]", "worker[notifications,images]")
+
+
+def child(scenario: str) -> dict[str, Any]:
+    """One sample, in this (fresh) process."""
+    started = time.perf_counter()
+    from notifications_worker import app
+
+    result: dict[str, Any] = {"import": time.perf_counter() - started}
+    if scenario == "import":
+        result["modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+        return result
+
+    queues = scenario.removeprefix("worker[").removesuffix("]").split(",")
+    app.celery_app.amqp.queues.select(queues)
+    started = time.perf_counter()
+    app.init_worker()
+    result["init_worker"] = time.perf_counter() - started
+    started = time.perf_counter()
+    app.init_worker_process()
+    result["init_worker_process"] = time.perf_counter() - started
+    result["modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+    return result
+
+
+def sample(scenario: str) -> dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", scenario],
+        env={**os.environ, **OFFLINE_ENV},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result: dict[str, Any] = json.loads(output.splitlines()[-1])
+    return result
+
+
+def measure(scenario: str, repeat: int) -> dict[str, Any]:
+    samples = [sample(scenario) for _ in range(repeat)]
+    timings: dict[str, Any] = {}
+    for name in samples[0]:
+        if name == "modules":
+            continue
+        values = [s[name] for s in samples]
+        timings[name] = {"min": min(values), "median": statistics.median(values)}
+    return {"timings": timings, "modules": samples[0]["modules"]}
+
+
+def slowest_imports(limit: int) -> list[tuple[int, str]]:
+    """(cumulative microseconds, module) of `import notifications_worker.app`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import notifications_worker.app"],
+        env={**os.environ, **OFFLINE_ENV},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", type=int, default=0, metavar="N")
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="results saved earlier to compare with")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline else {}
+    results = {}
+    print(f"{'scenario':<30} {'stage':<20} {'min ms':>9} {'median ms':>10} {'vs base':>8}  modules")
+    for scenario in SCENARIOS:
+        results[scenario] = result = measure(scenario, args.repeat)
+        last_stage = list(result["timings"])[-1]
+        for stage, timing in result["timings"].items():
+            before = baseline.get(scenario, {}).get("timings", {}).get(stage)
+            change = f"{(timing['median'] - before['median']) * 1000:+.1f}" if before else ""
+            print(
+                f"{scenario:<30} {stage:<20} {timing['min'] * 1000:>9.1f} "
+                f"{timing['median'] * 1000:>10.1f} {change:>8}  "
+                + (", ".join(result["modules"]) if stage == last_stage else "")
+            )
+
+    if args.importtime:
+        print("\nSlowest imports (cumulative ms) of notifications_worker.app:")
+        for cumulative, name in slowest_imports(args.importtime):
+            print(f"{cumulative / 1000:>9.1f}  {name}")
+
+    if args.output:
+        args.output.write_text(json.dumps({"results": results}, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
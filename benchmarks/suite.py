@@ -0,0 +1,307 @@
+"""
+Microbenchmarks of the notification and image hot paths, offline: the Telegram HTTP API
+and Redis are replaced with in-process stand-ins, so only the worker's own code is timed.
+
+    PYTHONPATH=src python benchmarks/suite.py [-k templates] [--seconds 0.5] [--repeat 3]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.15]
+
+Every case reports operations per second (best of --repeat runs of about --seconds each)
+and the peak memory allocated by one call (tracemalloc). --output saves the results as
+JSON; a saved file passed as --baseline is compared against, and cases that got slower
+(or allocate more) by more than --threshold are listed and make the exit code 1.
+Baselines are only comparable on the same machine and Python version.
+"""
+
+import os
+
+# Settings are read on import: offline values for the required ones
+for _name, _value in {
+    "TELEGRAM_BOT_TOKEN": "123456:bench",
+    "ADMIN_CHAT_ID": "-1001234567890",
+    "S3_ENDPOINT": "http://127.0.0.1:9",
+    "S3_ACCESS_KEY": "bench",
+    "S3_SECRET_KEY": "bench",
+    "S3_BUCKET": "bench",
+    "API_BASE_URL": "http://127.0.0.1:9",
+    "INTERNAL_TOKEN": "bench",
+    "CLOUDINARY_CLOUD_NAME": "bench",
+    "CLOUDINARY_API_KEY": "bench",
+    "CLOUDINARY_API_SECRET": "bench",
+    "TELEGRAM_RATE_LIMIT_ENABLED": "false",
+    "HTTP_WARMUP_ENABLED": "false",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import argparse  # noqa: E402
+import fnmatch  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+from collections.abc import Callable  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Any  # noqa: E402
+
+import httpx  # noqa: E402
+
+from notifications_worker.domain.entities import NotificationsOrderEntity  # noqa: E402
+from notifications_worker.infra import http as http_clients  # noqa: E402
+from notifications_worker.infra.cloudinary.client import parse_eager_results  # noqa: E402
+from notifications_worker.infra.redis import client as redis_client  # noqa: E402
+from notifications_worker.infra.telegram.api import build_send_message_body  # noqa: E402
+from notifications_worker.infra.telegram.client import get_telegram_client  # noqa: E402
+from notifications_worker.infra.telegram.keyboards import (  # noqa: E402
+    admin_order_details_button,
+    admin_order_details_button_json,
+    order_actions_json,
+)
+from notifications_worker.services import dispatcher, templates  # noqa: E402
+from notifications_worker.services.variant_planner import plan_variants  # noqa: E402
+
+# --- Payloads -----------------------------------------------------------------------------
+
+NEW_ORDER_PAYLOAD: dict[str, Any] = {
+    "order_id": "LF-2024-000123",
+    "telegram_id": 123456789,
+    "old_status": "created",
+    "new_status": "created",
+    "comment": (
+        "Позвоните, пожалуйста, за час до доставки: домофон не работает <код 45#>, "
+        "во дворе шлагбаум — назовите охраннику номер заказа. Если меня не будет дома, "
+        "оставьте пакет у консьержа & напишите в Telegram. Чай упакуйте отдельно от посуды, "
+        "в прошлый раз пуэр пропах картоном. "
+    )
+    * 4,
+    "phone": "+7 999 123-45-67",
+    "customer_name": "Иванова Мария Петровна",
+    "total": "12500.00",
+    "delivery_method": "courier",
+    "email": "maria.ivanova@example.com",
+    "address": "г. Москва, ул. Большая Никитская, д. 12, кв. 34, подъезд 2 & этаж 5",
+    "status_comment": None,
+    "thread_id": 42,
+    "created_at": "2024-11-05T14:23:11+03:00",
+}
+STATUS_UPDATE_PAYLOAD: dict[str, Any] = {
+    **NEW_ORDER_PAYLOAD,
+    "old_status": "processing",
+    "new_status": "paid",
+    "status_comment": "Оплата получена, передали заказ в сборку. Ожидаемая дата — 7 ноября",
+}
+NEW_ORDER = NotificationsOrderEntity.model_validate(NEW_ORDER_PAYLOAD)
+STATUS_UPDATE = NotificationsOrderEntity.model_validate(STATUS_UPDATE_PAYLOAD)
+
+# Cloudinary upload response with eager results of every variant file
+EAGER = [
+    {
+        "transformation": f"c_limit,h_{size},q_80,w_{size}/{fmt}",
+        "width": size,
+        "height": size * 2 // 3,
+        "bytes": size * 40,
+        "format": fmt,
+        "url": f"http://res.cloudinary.com/bench/image/upload/v1/temp/1.{fmt}",
+        "secure_url": f"https://res.cloudinary.com/bench/image/upload/v1/temp/1.{fmt}",
+    }
+    for size in (150, 600, 1200)
+    for fmt in ("avif", "webp")
+]
+
+# --- Stand-ins for Telegram and Redis ---------------------------------------------------
+
+_SEND_MESSAGE_RESPONSE = json.dumps(
+    {"ok": True, "result": {"message_id": 4242, "chat": {"id": -1001234567890}, "date": 0}}
+).encode()
+
+
+def _telegram_api(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, content=_SEND_MESSAGE_RESPONSE)
+
+
+class _ForgetfulRedis:
+    """Redis that remembers nothing: every notification is new, nothing to edit."""
+
+    def exists(self, *_: Any) -> int:
+        return 0
+
+    def set(self, *_: Any, **__: Any) -> bool:
+        return True
+
+    def pipeline(self, *_: Any, **__: Any) -> "_ForgetfulRedis":
+        return self
+
+    def hset(self, *_: Any, **__: Any) -> "_ForgetfulRedis":
+        return self
+
+    def hget(self, *_: Any, **__: Any) -> "_ForgetfulRedis":
+        return self
+
+    def expire(self, *_: Any, **__: Any) -> "_ForgetfulRedis":
+        return self
+
+    def execute(self) -> list[None]:
+        return [None]
+
+
+def install_stand_ins() -> None:
+    http_clients._clients["telegram"] = httpx.Client(transport=httpx.MockTransport(_telegram_api))
+    redis_client._client = _ForgetfulRedis()  # type: ignore[assignment]
+
+
+# --- Cases --------------------------------------------------------------------------------
+
+CASES: dict[str, Callable[[], object]] = {
+    "entity.model_validate": lambda: NotificationsOrderEntity.model_validate(NEW_ORDER_PAYLOAD),
+    "templates.render_order_message_admin": lambda: templates.render_order_message_admin(NEW_ORDER),
+    "templates.render_order_message_admin_with_status": lambda: (
+        templates.render_order_message_admin_with_status(STATUS_UPDATE)
+    ),
+    "templates.notify_update_status_order_admin": lambda: (
+        templates.notify_update_status_order_admin(STATUS_UPDATE)
+    ),
+    "templates.notify_new_order_user": lambda: templates.notify_new_order_user(NEW_ORDER),
+    "templates.notify_update_status_order_user": lambda: templates.notify_update_status_order_user(
+        STATUS_UPDATE
+    ),
+    "keyboards.admin_order_details_button": lambda: admin_order_details_button(
+        NEW_ORDER.order_id
+    ).to_dict(),
+    "keyboards.admin_order_details_button_json": lambda: admin_order_details_button_json(
+        NEW_ORDER.order_id
+    ),
+    "keyboards.order_actions_json": lambda: order_actions_json(NEW_ORDER.order_id),
+    "telegram.build_send_message_body": lambda: build_send_message_body(
+        -1001234567890,
+        templates.render_order_message_admin(NEW_ORDER),
+        thread_id=42,
+        reply_markup=admin_order_details_button_json(NEW_ORDER.order_id),
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+    ),
+    "telegram.send_message": lambda: get_telegram_client().send_message(
+        -1001234567890,
+        "Заказ LF-2024-000123 оплачен",
+        thread_id=42,
+        reply_markup=admin_order_details_button_json(NEW_ORDER.order_id),
+    ),
+    "dispatcher.admin_new_order": lambda: dispatcher.dispatch_order_notification_admin(NEW_ORDER),
+    "dispatcher.user_status_update": lambda: dispatcher.dispatch_order_notification_user(
+        STATUS_UPDATE
+    ),
+    "dispatcher.order_fanout": lambda: dispatcher.dispatch_order_notifications(NEW_ORDER),
+    "images.parse_eager_results": lambda: parse_eager_results(EAGER),
+    "images.plan_variants": lambda: plan_variants(2400, 1600),
+}
+
+
+# --- Runner -------------------------------------------------------------------------------
+
+
+def ops_per_second(run: Callable[[], object], seconds: float) -> float:
+    """Calls per second over roughly `seconds`, in batches sized so timing overhead is noise."""
+    batch = 1
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            run()
+        calls += batch
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return calls / elapsed
+        batch = min(batch * 2, 10_000)
+
+
+def peak_bytes(run: Callable[[], object]) -> int:
+    """Peak memory allocated during one call (after a warm-up call)."""
+    run()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        run()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def measure(cases: dict[str, Callable[[], object]], seconds: float, repeat: int) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    for name, run in cases.items():
+        results[name] = {
+            "ops_per_sec": round(max(ops_per_second(run, seconds) for _ in range(repeat)), 1),
+            "peak_bytes": peak_bytes(run),
+        }
+    return results
+
+
+def compare(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float,
+) -> dict[str, tuple[float | None, float | None, bool]]:
+    """Relative change of ops/sec and peak memory per case, and whether it is a regression."""
+    changes = {}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            changes[name] = (None, None, False)
+            continue
+        speed = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        memory = (result["peak_bytes"] - base["peak_bytes"]) / max(base["peak_bytes"], 1)
+        # Small absolute growth of small allocations is noise, not a regression
+        grew = memory > threshold and result["peak_bytes"] - base["peak_bytes"] > 1024
+        changes[name] = (speed, memory, speed < -threshold or grew)
+    return changes
+
+
+def _percent(change: float | None) -> str:
+    return "" if change is None else f"{change:+.1%}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("-k", dest="pattern", default="*", help="run cases matching *pattern*")
+    parser.add_argument("--seconds", type=float, default=0.5, help="time per run of a case")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is kept)")
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--baseline", type=Path, help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0..1")
+    args = parser.parse_args()
+
+    pattern = args.pattern if any(c in args.pattern for c in "*?[") else f"*{args.pattern}*"
+    cases = {name: run for name, run in CASES.items() if fnmatch.fnmatch(name, pattern)}
+    install_stand_ins()
+
+    results = measure(cases, args.seconds, args.repeat)
+    baseline = json.loads(args.baseline.read_text())["results"] if args.baseline else {}
+    changes = compare(results, baseline, args.threshold)
+
+    print(f"{'case':<50} {'ops/s':>12} {'':>8} {'peak KiB':>9} {'':>8}")
+    for name, result in results.items():
+        speed, memory, regressed = changes[name]
+        print(
+            f"{name:<50} {result['ops_per_sec']:>12,.0f} {_percent(speed):>8} "
+            f"{result['peak_bytes'] / 1024:>9.1f} {_percent(memory):>8}"
+            + ("  REGRESSION" if regressed else "")
+        )
+
+    if args.output:
+        meta = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "seconds": args.seconds,
+            "repeat": args.repeat,
+        }
+        args.output.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+
+    regressions = [name for name, (_, _, regressed) in changes.items() if regressed]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {regressions}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,69 @@
-from notifications_worker.app import celery_app
+"""
+Worker entry point.
+
+    python -m notifications_worker                  # one worker per queue, supervised
+    python -m notifications_worker --queue images   # a single queue (one container per queue)
+
+Every queue gets its own pool profile from settings (see worker_pools.py), so slow image
+jobs never take the slots of order notifications.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+from notifications_worker.infra import metrics
+from notifications_worker.worker_pools import PoolProfile, pool_profiles
+
+
+def run_queue(profile: PoolProfile, log_level: str) -> None:
+    # Through the celery CLI: it monkey-patches for gevent/eventlet before anything opens
+    # sockets, and this process has already imported ssl and asyncio (settings)
+    argv = ["-m", "celery", "-A", "notifications_worker.app", *profile.worker_argv(log_level)]
+    os.execv(sys.executable, [sys.executable, *argv])
+
+
+def run_all(queues: list[str], log_level: str) -> int:
+    """Run a worker per queue as child processes; stop all of them when one exits."""
+    # This process serves the metrics of all workers; they only write samples
+    metrics.start_metrics_server()
+    env = {**os.environ, "METRICS_PORT": "0"}
+
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "notifications_worker", "--queue", queue, "-l", log_level],
+            env=env,
+        )
+        for queue in queues
+    ]
+
+    def stop(signum: int, _: object) -> None:
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    # Ctrl+C reaches the children directly (same process group)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    _, status = os.wait()
+    # A worker that died takes the others down so the container restarts as a whole
+    stop(signal.SIGTERM, None)
+    for child in children:
+        child.wait()
+    return os.waitstatus_to_exitcode(status)
+
 
 if __name__ == "__main__":
-    celery_app.worker_main([
-        "worker",
-        "-l", "info",
-        "-Q", "notifications,images",
-        "--concurrency", "4",
-    ])
+    profiles = pool_profiles()
+    parser = argparse.ArgumentParser(prog="python -m notifications_worker")
+    parser.add_argument("--queue", choices=sorted(profiles), help="serve only this queue")
+    parser.add_argument("-l", "--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.queue:
+        run_queue(profiles[args.queue], args.log_level)
+    else:
+        sys.exit(run_all(list(profiles), args.log_level))
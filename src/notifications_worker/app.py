@@ -1,8 +1,83 @@
-from celery import Celery
+from celery import Celery, Task
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_init,
+    worker_process_init,
+)
+
+from notifications_worker.infra import metrics, profiling
+from notifications_worker.infra.cloudinary.client import cloudinary_sdk
+from notifications_worker.infra.http import reset_http_clients, warm_up_http_clients
+from notifications_worker.infra.leafflow.client import get_leafflow_client
+from notifications_worker.infra.s3.client import get_s3_client
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram.client import get_telegram_client
 
 celery_app = Celery("notifications_worker")
 celery_app.config_from_object("notifications_worker.celeryconfig")
 celery_app.autodiscover_tasks(["notifications_worker.tasks"])
 
+
+@worker_init.connect
+def init_worker(**_: object) -> None:
+    # Главный процесс, до запуска пула: отдаёт метрики всех дочерних процессов
+    metrics.start_metrics_server()
+    if "images" in _served_queues():
+        # Модули SDK (не клиенты) импортируются до fork, дочерние процессы получают их готовыми
+        import boto3  # noqa: F401
+        import cloudinary.uploader  # noqa: F401
+
+
+@worker_process_init.connect
+def init_worker_process(**_: object) -> None:
+    # Каждый дочерний процесс открывает свои соединения, а не делит сокеты родителя
+    reset_http_clients()
+    # Клиенты создаются и соединения прогреваются в дочернем процессе и только для очередей
+    # этого воркера: воркер одной очереди notifications не импортирует boto3 и SDK Cloudinary
+    # и не ходит к upstream изображений
+    queues = _served_queues()
+    upstreams = []
+    if "notifications" in queues:
+        get_telegram_client()
+        upstreams.append("telegram")
+    if "images" in queues:
+        get_s3_client()
+        get_leafflow_client()
+        upstreams.append("leafflow")
+        if settings.images_engine == "cloudinary":
+            cloudinary_sdk()
+            upstreams.append("cloudinary_cdn")
+    warm_up_http_clients(upstreams)
+
+
+@task_prerun.connect
+def start_task_timer(
+    task_id: str, task: Task, args: object = None, kwargs: object = None, **_: object
+) -> None:
+    profiling.task_started(task_id, task.name, args, kwargs)
+
+
+@task_postrun.connect
+def stop_task_timer(task_id: str, task: Task, state: str | None = None, **_: object) -> None:
+    profiling.task_finished(task_id, task.name, state)
+
+
+@task_retry.connect
+def count_task_retry(sender: Task | None = None, reason: object = None, **_: object) -> None:
+    # reason — celery.exceptions.Retry, исходная ошибка в reason.exc
+    error = getattr(reason, "exc", None) or reason
+    task_name = sender.name if sender is not None else "unknown"
+    metrics.TASK_RETRIES.labels(task_name, type(error).__name__).inc()
+
+
+def _served_queues() -> set[str]:
+    # -Q воркера; без него — все очереди из task_queues.
+    # Полосы notifications.high / notifications.bulk относятся к очереди notifications
+    queues = celery_app.amqp.queues.consume_from or celery_app.amqp.queues
+    return {queue.split(".", 1)[0] for queue in queues}
+
+
 import notifications_worker.tasks.images  # noqa: E402, F401
 import notifications_worker.tasks.notifications  # noqa: E402, F401
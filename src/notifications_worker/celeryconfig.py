@@ -1,4 +1,5 @@
 from notifications_worker.infra.settings import settings
+from notifications_worker.routing import route_task
 
 broker_url = settings.broker_url
 result_backend = settings.result_backend_url
@@ -15,6 +16,8 @@ worker_prefetch_multiplier = 1
 
 broker_transport_options = {
     "visibility_timeout": settings.celery_visibility_timeout,
+    # Notification lanes are consumed in a weighted order (Redis transport only)
+    "queue_order_strategy": "notifications_worker.routing:WeightedCycle",
 }
 
 task_default_queue = settings.celery_queue
@@ -22,17 +25,26 @@ task_default_exchange = settings.celery_queue
 task_default_routing_key = settings.celery_queue
 
 task_queues = {
+    "notifications.high": {
+        "exchange": "notifications.high",
+        "routing_key": "notifications.high",
+    },
     "notifications": {
         "exchange": "notifications",
         "routing_key": "notifications",
     },
+    "notifications.bulk": {
+        "exchange": "notifications.bulk",
+        "routing_key": "notifications.bulk",
+    },
     "images": {
         "exchange": "images",
         "routing_key": "images",
     },
 }
 
-task_routes = {
-    "notifications.*": {"queue": "notifications"},
-    "images.*": {"queue": "images"},
-}
+# notifications.* go to their lane (routing.route_task)
+task_routes = (
+    route_task,
+    {"images.*": {"queue": "images"}},
+)
@@ -46,3 +46,5 @@ class ImageVariantResult(BaseModel):
     width: int
     height: int
     byte_size: int
+    # Качество кодирования (может быть ниже заданного, если файл не укладывался в бюджет)
+    quality: int | None = None
@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+from functools import cache
+from typing import NotRequired, TypedDict
+
+
+class VariantConfig(TypedDict):
+    width: int
+    height: int
+    quality: int
+    # Форматы файлов варианта, по умолчанию только webp
+    formats: NotRequired[list[str]]
+    # Бюджет на файл, байт: качество снижается, пока файл не уложится
+    max_bytes: NotRequired[int]
+
+
+# Конфигурация вариантов
+VARIANTS_CONFIG: dict[str, VariantConfig] = {
+    "thumb": {
+        "width": 150,
+        "height": 150,
+        "quality": 80,
+        "formats": ["avif", "webp"],
+        "max_bytes": 12 * 1024,
+    },
+    "md": {
+        "width": 600,
+        "height": 600,
+        "quality": 85,
+        "formats": ["avif", "webp"],
+        "max_bytes": 80 * 1024,
+    },
+    "lg": {
+        "width": 1200,
+        "height": 1200,
+        "quality": 90,
+        "formats": ["avif", "webp"],
+        "max_bytes": 250 * 1024,
+    },
+}
+
+
+@dataclass(frozen=True, slots=True)
+class VariantTarget:
+    """Один файл варианта: размер варианта в одном формате."""
+
+    variant: str
+    format: str
+    width: int
+    height: int
+    quality: int
+    max_bytes: int | None = None
+
+    @property
+    def key(self) -> str:
+        """ "thumb.webp" — имя файла в S3 и ключ файла во всех картах вариантов."""
+        return f"{self.variant}.{self.format}"
+
+
+@cache
+def variant_targets() -> dict[str, VariantTarget]:
+    """Все файлы вариантов из VARIANTS_CONFIG по ключу "{variant}.{format}", в его порядке."""
+    targets: dict[str, VariantTarget] = {}
+    for name, cfg in VARIANTS_CONFIG.items():
+        for fmt in cfg.get("formats", ["webp"]):
+            target = VariantTarget(
+                variant=name,
+                format=fmt,
+                width=cfg["width"],
+                height=cfg["height"],
+                quality=cfg["quality"],
+                max_bytes=cfg.get("max_bytes"),
+            )
+            targets[target.key] = target
+    return targets
@@ -1,93 +1,238 @@
 import logging
-
-import cloudinary
-import cloudinary.uploader
-import httpx
-
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from types import ModuleType
+from typing import cast
+from urllib.parse import urlsplit
+
+from notifications_worker.domain.variants import variant_targets
+from notifications_worker.infra import metrics
+from notifications_worker.infra.cloudinary.errors import CloudinaryRateLimited
+from notifications_worker.infra.http import get_http_client
+from notifications_worker.infra.profiling import span
 from notifications_worker.infra.settings import settings as cloudinary_settings
+from notifications_worker.utils.lazy import per_process
+from notifications_worker.utils.streams import CountingReader
 
 logger = logging.getLogger(__name__)
 
-# Инициализация Cloudinary
-cloudinary.config(
-    cloud_name=cloudinary_settings.cloudinary_cloud_name,
-    api_key=cloudinary_settings.cloudinary_api_key,
-    api_secret=cloudinary_settings.cloudinary_api_secret,
-    secure=True,
-)
-
-# Конфигурация вариантов
-VARIANTS_CONFIG: dict[str, dict[str, int]] = {
-    "thumb": {"width": 150, "height": 150, "quality": 80},
-    "md": {"width": 600, "height": 600, "quality": 85},
-    "lg": {"width": 1200, "height": 1200, "quality": 90},
-}
-
-
-def _build_eager_transformations() -> list[dict[str, object]]:
-    """Построить список eager transformations."""
-    return [
-        {
-            "width": cfg["width"],
-            "height": cfg["height"],
-            "crop": "fit",
-            "quality": cfg["quality"],
-            "format": "webp",
-        }
-        for cfg in VARIANTS_CONFIG.values()
-    ]
-
 
-def fetch_and_transform(image_url: str, public_id: str) -> dict[str, object]:
+def _configured_sdk() -> ModuleType:
+    """
+    SDK Cloudinary с настройками из settings. Импортируется при первом обращении
+    в процессе, который обрабатывает изображения, а не при импорте воркера.
+    """
+    import cloudinary
+    import cloudinary.api
+    import cloudinary.uploader
+    import cloudinary.utils
+
+    cloudinary.config(
+        cloud_name=cloudinary_settings.cloudinary_cloud_name,
+        api_key=cloudinary_settings.cloudinary_api_key,
+        api_secret=cloudinary_settings.cloudinary_api_secret,
+        secure=True,
+    )
+    if cloudinary_settings.cloudinary_api_base_url:
+        # Свой адрес API и CDN (локальная заглушка tools/fakes/cloudinary.py)
+        api = urlsplit(cloudinary_settings.cloudinary_api_base_url)
+        cloudinary.config(
+            upload_prefix=cloudinary_settings.cloudinary_api_base_url.rstrip("/"),
+            secure=api.scheme == "https",
+            secure_distribution=api.netloc,
+            cname=api.netloc,
+        )
+    return cast(ModuleType, cloudinary)
+
+
+cloudinary_sdk = per_process(_configured_sdk)
+
+
+def _variant_transformation(variant: str, quality: int | None = None) -> dict[str, object]:
+    target = variant_targets()[variant]
+    return {
+        "width": target.width,
+        "height": target.height,
+        # limit: как fit, но без увеличения маленьких оригиналов
+        "crop": "limit",
+        "quality": quality or target.quality,
+        "format": target.format,
+    }
+
+
+def _build_eager_transformations(variants: Sequence[str]) -> list[dict[str, object]]:
+    """Построить список eager transformations для файлов вариантов (в их порядке)."""
+    return [_variant_transformation(name) for name in variants]
+
+
+def fetch_and_transform(
+    image_url: str,
+    public_id: str,
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> dict[str, object]:
     """
     Cloudinary скачивает изображение по URL и создаёт варианты.
 
     Args:
         image_url: Публичный URL оригинала в S3
         public_id: Уникальный ID для Cloudinary (temp/leaf-flow/{product_id}/{image_id})
+        variants: Какие файлы вариантов создать (ключи variant_targets: "thumb.webp", ...)
 
     Returns:
         Результат upload с eager URLs
     """
     logger.info("Cloudinary fetching: %s", image_url)
+    started = time.perf_counter()
+    result = _upload(image_url, public_id, variants, eager_async=False)
+    metrics.CLOUDINARY_TRANSFORM_SECONDS.labels("inline").observe(time.perf_counter() - started)
+    return result
+
+
+def submit_transform(
+    image_url: str,
+    public_id: str,
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> dict[str, object]:
+    """
+    То же, что fetch_and_transform, но не ждёт eager transformations (eager_async):
+    Cloudinary делает варианты в фоне, готовность проверяет pending_variants.
+
+    Returns:
+        Результат upload (public_id, version, width, height оригинала)
+    """
+    logger.info("Cloudinary fetching (async eager): %s", image_url)
+    return _upload(image_url, public_id, variants, eager_async=True)
+
 
-    result: dict[str, object] = cloudinary.uploader.upload(
-        image_url,
-        public_id=public_id,
-        eager=_build_eager_transformations(),
-        eager_async=False,
-        resource_type="image",
-        overwrite=True,
+def pending_variants(public_id: str, variants: Sequence[str]) -> list[str]:
+    """
+    Варианты, eager transformations которых Cloudinary ещё не закончил (Admin API).
+
+    Raises:
+        CloudinaryRateLimited: исчерпан часовой лимит Admin API
+    """
+    sdk = cloudinary_sdk()
+    with span("cloudinary.resource"):
+        try:
+            resource = sdk.api.resource(public_id, resource_type="image")
+        except sdk.exceptions.RateLimited as exc:
+            raise CloudinaryRateLimited(public_id=public_id) from exc
+    derived = {
+        (str(item.get("transformation", "")), str(item.get("format", "")))
+        for item in resource.get("derived") or []
+    }
+
+    pending = []
+    for name in variants:
+        expected, _ = sdk.utils.generate_transformation_string(**_variant_transformation(name))
+        fmt = variant_targets()[name].format
+        # Строка трансформации не содержит формата: у thumb.avif и thumb.webp она одна
+        # и та же. Admin API отдаёт формат расширением ("c_limit,h_150,q_80,w_150/webp")
+        # и полем format — сверяем трансформацию вместе с форматом
+        if not any(
+            transformation == f"{expected}/{fmt}" or (transformation, format_) == (expected, fmt)
+            for transformation, format_ in derived
+        ):
+            pending.append(name)
+    return pending
+
+
+def variant_url(
+    public_id: str,
+    version: int | str,
+    variant: str,
+    quality: int | None = None,
+) -> str:
+    """
+    URL файла варианта в Cloudinary CDN. С качеством из конфигурации совпадает
+    с secure_url eager transformation, с другим — трансформация на лету.
+    """
+    url, _ = cloudinary_sdk().utils.cloudinary_url(
+        public_id, version=version, **_variant_transformation(variant, quality)
     )
+    return str(url)
+
+
+def _upload(
+    image_url: str,
+    public_id: str,
+    variants: Sequence[str],
+    *,
+    eager_async: bool,
+) -> dict[str, object]:
+    with span("cloudinary.upload"):
+        result: dict[str, object] = cloudinary_sdk().uploader.upload(
+            image_url,
+            public_id=public_id,
+            eager=_build_eager_transformations(variants),
+            eager_async=eager_async,
+            resource_type="image",
+            overwrite=True,
+        )
     return result
 
 
 def download_variant(url: str) -> bytes:
     """Скачать трансформированный вариант из Cloudinary CDN."""
-    with httpx.Client(timeout=60) as client:
-        response = client.get(url)
+    started = time.perf_counter()
+    response = get_http_client("cloudinary_cdn").get(url)
+    response.raise_for_status()
+    metrics.CDN_DOWNLOAD_SECONDS.labels(_url_format(url)).observe(time.perf_counter() - started)
+    return response.content
+
+
+def variant_byte_size(url: str) -> int | None:
+    """
+    Размер файла варианта в Cloudinary CDN (HEAD-запрос, трансформация на лету делается
+    при первом обращении). None, если CDN не сообщил размер.
+    """
+    response = get_http_client("cloudinary_cdn").head(url)
+    response.raise_for_status()
+    length = response.headers.get("Content-Length")
+    return int(length) if length else None
+
+
+@contextmanager
+def stream_variant(url: str) -> Iterator[CountingReader]:
+    """
+    Открыть вариант из Cloudinary CDN как поток, не загружая файл в память целиком.
+    После чтения reader.bytes_read — размер файла.
+    """
+    started = time.perf_counter()
+    with get_http_client("cloudinary_cdn").stream("GET", url) as response:
         response.raise_for_status()
-        return response.content
+        yield CountingReader(response.iter_bytes(cloudinary_settings.images_stream_chunk_size))
+    # Вместе с потребителем потока (загрузкой в S3), они идут одновременно
+    metrics.CDN_DOWNLOAD_SECONDS.labels(_url_format(url)).observe(time.perf_counter() - started)
+
+
+def _url_format(url: str) -> str:
+    return url.rsplit(".", 1)[-1]
 
 
 def delete_from_cloudinary(public_id: str) -> None:
     """Удалить изображение из Cloudinary после обработки."""
     try:
-        cloudinary.uploader.destroy(public_id, resource_type="image")
+        with span("cloudinary.destroy"):
+            cloudinary_sdk().uploader.destroy(public_id, resource_type="image")
         logger.info("Deleted from Cloudinary: %s", public_id)
     except Exception:
         logger.warning("Failed to delete from Cloudinary: %s", public_id, exc_info=True)
 
 
-def parse_eager_results(eager: list[dict[str, object]]) -> dict[str, dict[str, object]]:
+def parse_eager_results(
+    eager: list[dict[str, object]],
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> dict[str, dict[str, object]]:
     """
-    Распарсить результаты eager transformations.
+    Распарсить результаты eager transformations (в порядке variants, как в fetch_and_transform).
 
     Returns:
-        {"thumb": {"url": "...", "width": 150, "height": 100}, ...}
+        {"thumb.webp": {"url": "...", "width": 150, "height": 100}, ...}
     """
     results: dict[str, dict[str, object]] = {}
-    variant_names = list(VARIANTS_CONFIG.keys())
+    variant_names = list(variants)
 
     for i, item in enumerate(eager):
         if i >= len(variant_names):
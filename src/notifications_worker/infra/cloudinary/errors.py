@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class CloudinaryTransformTimeout(Exception):
+    """Cloudinary не закончил eager-трансформации за images_transform_timeout_seconds."""
+
+    public_id: str
+    pending: list[str]
+
+    def __str__(self) -> str:
+        return f"CloudinaryTransformTimeout({self.public_id}: {', '.join(self.pending)})"
+
+
+@dataclass(slots=True)
+class CloudinaryRateLimited(Exception):
+    """Admin API Cloudinary ответил 420/429: исчерпан часовой лимит запросов."""
+
+    public_id: str
+
+    def __str__(self) -> str:
+        return f"CloudinaryRateLimited({self.public_id})"
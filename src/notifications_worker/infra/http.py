@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import httpx
+
+from notifications_worker.infra.profiling import http_event_hooks
+from notifications_worker.infra.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class HttpProfile:
+    """Настройки пула соединений к одному upstream."""
+
+    timeout: float
+    connect_timeout: float
+    warmup_url: str | None = None
+
+
+def _profiles() -> dict[str, HttpProfile]:
+    return {
+        "telegram": HttpProfile(
+            timeout=settings.telegram_http_timeout_seconds,
+            connect_timeout=settings.telegram_http_connect_timeout_seconds,
+            warmup_url=settings.telegram_api_base_url,
+        ),
+        "cloudinary_cdn": HttpProfile(
+            timeout=60,
+            connect_timeout=10,
+            warmup_url=settings.cloudinary_api_base_url or settings.cloudinary_cdn_base_url,
+        ),
+        "leafflow": HttpProfile(
+            timeout=30,
+            connect_timeout=10,
+            warmup_url=settings.api_base_url,
+        ),
+    }
+
+
+_WARMUP_TIMEOUT_SECONDS = 2.0
+
+_lock = threading.Lock()
+_clients: dict[str, httpx.Client] = {}
+_pid = os.getpid()
+
+
+def get_http_client(name: str) -> httpx.Client:
+    """
+    Пул соединений (keep-alive, опционально HTTP/2) к upstream `name`,
+    один на процесс и на upstream. Клиенты из родительского процесса после fork
+    не используются (см. reset_http_clients).
+    """
+    global _pid
+    client = _clients.get(name)
+    if client is not None and _pid == os.getpid():
+        return client
+
+    with _lock:
+        if _pid != os.getpid():
+            # Соединения родителя после fork не трогаем (и не закрываем) — просто забываем
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(name)
+        if client is None:
+            profile = _profiles()[name]
+            client = httpx.Client(
+                timeout=_timeout(profile),
+                limits=_limits(settings.http_max_connections),
+                http2=_http2_enabled(),
+                event_hooks=http_event_hooks(),
+            )
+            _clients[name] = client
+        return client
+
+
+def create_async_http_client(name: str, max_connections: int) -> httpx.AsyncClient:
+    """AsyncClient с настройками upstream `name`. Привязан к loop, на котором используется."""
+    return httpx.AsyncClient(
+        timeout=_timeout(_profiles()[name]),
+        limits=_limits(max_connections),
+        http2=_http2_enabled(),
+    )
+
+
+def reset_http_clients() -> None:
+    """Забыть клиенты, унаследованные от родителя (вызывается в worker_process_init)."""
+    global _pid
+    with _lock:
+        _clients.clear()
+        _pid = os.getpid()
+
+
+def warm_up_http_clients(names: Iterable[str]) -> None:
+    """Заранее открыть соединения (TCP + TLS) к upstream `names`: первая задача их не ждёт."""
+    if not settings.http_warmup_enabled:
+        return
+
+    profiles = _profiles()
+    for name in names:
+        profile = profiles[name]
+        if not profile.warmup_url:
+            continue
+        try:
+            get_http_client(name).head(profile.warmup_url, timeout=_WARMUP_TIMEOUT_SECONDS)
+        except httpx.HTTPError as exc:
+            logger.warning("HTTP warmup of %s failed: %s", name, exc)
+
+
+def _timeout(profile: HttpProfile) -> httpx.Timeout:
+    return httpx.Timeout(timeout=profile.timeout, connect=profile.connect_timeout)
+
+
+def _limits(max_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(max_connections, settings.http_max_keepalive_connections),
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+
+
+def _http2_enabled() -> bool:
+    if not settings.http2_enabled:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but 'h2' is not installed, using HTTP/1.1")
+        return False
+    return True
@@ -0,0 +1,13 @@
+def fit_size(size: tuple[int, int], box_width: int, box_height: int) -> tuple[int, int]:
+    """Размер, вписанный в box с сохранением пропорций (как crop=fit в Cloudinary)."""
+    width, height = size
+    scale = min(box_width / width, box_height / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def limit_size(size: tuple[int, int], box_width: int, box_height: int) -> tuple[int, int]:
+    """Как fit_size, но без увеличения: оригинал меньше box остаётся как есть (crop=limit)."""
+    width, height = size
+    if width <= box_width and height <= box_height:
+        return width, height
+    return fit_size(size, box_width, box_height)
@@ -0,0 +1,207 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import TYPE_CHECKING, NamedTuple
+
+from notifications_worker.domain.variants import VariantTarget
+from notifications_worker.infra.imaging.geometry import limit_size
+from notifications_worker.infra.settings import settings
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedVariant(NamedTuple):
+    """Готовый файл варианта и его параметры."""
+
+    key: str
+    data: bytes
+    width: int
+    height: int
+    quality: int
+
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def pillow_formats() -> set[str]:
+    """Форматы вариантов, которые умеет кодировать установленный Pillow."""
+    from PIL import features
+
+    return {fmt for fmt in ("webp", "avif") if features.check(fmt)} | {"jpeg", "png"}
+
+
+def render_variants(
+    data: bytes,
+    targets: Sequence[VariantTarget],
+    *,
+    webp_method: int = 4,
+    avif_speed: int = 8,
+    min_quality: int = 40,
+) -> list[RenderedVariant]:
+    """
+    Сделать файлы вариантов из оригинала — аналог eager-трансформаций Cloudinary (crop=limit).
+
+    Оригинал декодируется один раз (JPEG — сразу в уменьшенном масштабе, но не меньше
+    крупнейшего варианта). Размеры считаются от крупного к мелкому: каждый уменьшается
+    из ближайшего большего готового, а не из полноразмерного оригинала, и кодируется
+    во все форматы своих targets. Если у target есть max_bytes, качество снижается
+    (не ниже min_quality), пока файл не уложится в бюджет.
+
+    Returns:
+        Файлы в порядке `targets`
+    """
+    from PIL import Image, ImageOps
+
+    by_box: dict[tuple[int, int], list[VariantTarget]] = {}
+    for target in targets:
+        by_box.setdefault((target.width, target.height), []).append(target)
+    boxes = sorted(by_box, key=lambda box: box[0] * box[1], reverse=True)
+    largest = max(max(box) for box in boxes)
+
+    with Image.open(BytesIO(data)) as opened:
+        opened.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(opened)
+        image = image.convert("RGBA" if _has_alpha(image) else "RGB")
+
+    # Уменьшенные копии оригинала, от крупной к мелкой
+    sources: list[Image.Image] = []
+    rendered: dict[str, RenderedVariant] = {}
+    for box in boxes:
+        size = limit_size(image.size, *box)
+
+        source = image
+        for candidate in sources:
+            if candidate.width >= size[0] and candidate.height >= size[1]:
+                source = candidate
+
+        resized = source
+        if source.size != size:
+            resized = source.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        sources.append(resized)
+
+        for target in by_box[box]:
+            encoded, quality = _encode_within_budget(
+                resized,
+                target,
+                webp_method=webp_method,
+                avif_speed=avif_speed,
+                min_quality=min_quality,
+            )
+            rendered[target.key] = RenderedVariant(target.key, encoded, size[0], size[1], quality)
+
+    return [rendered[target.key] for target in targets]
+
+
+def _encode_within_budget(
+    image: "Image.Image",
+    target: VariantTarget,
+    *,
+    webp_method: int,
+    avif_speed: int,
+    min_quality: int,
+) -> tuple[bytes, int]:
+    """Файл с качеством target.quality или наибольшим качеством, укладывающимся в max_bytes."""
+
+    def encode(quality: int) -> bytes:
+        return _encode(image, target.format, quality, webp_method, avif_speed)
+
+    data = encode(target.quality)
+    if target.max_bytes is None or len(data) <= target.max_bytes:
+        return data, target.quality
+
+    # Размер растёт с качеством: бинарный поиск вниз от target.quality
+    best: tuple[bytes, int] | None = None
+    low, high = min_quality, target.quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = encode(quality)
+        if len(candidate) <= target.max_bytes:
+            best = (candidate, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        logger.warning(
+            "%s does not fit %d bytes even at quality %d", target.key, target.max_bytes, min_quality
+        )
+        return encode(min_quality), min_quality
+    return best
+
+
+def _encode(
+    image: "Image.Image",
+    fmt: str,
+    quality: int,
+    webp_method: int,
+    avif_speed: int,
+) -> bytes:
+    buffer = BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=quality, method=webp_method)
+    elif fmt == "avif":
+        image.save(buffer, "AVIF", quality=quality, speed=avif_speed)
+    else:
+        image.save(buffer, fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def _has_alpha(image: "Image.Image") -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+_lock = threading.Lock()
+_pool: ProcessPoolExecutor | None = None
+_pool_pid = os.getpid()
+
+
+def render_variants_in_pool(
+    data: bytes,
+    targets: Sequence[VariantTarget],
+) -> list[RenderedVariant]:
+    """
+    render_variants в пуле из images_local_processes процессов.
+
+    В prefork-воркере Celery (процесс-демон не может порождать дочерние) и при
+    images_local_processes=0 считает в текущем процессе.
+    """
+    options = {
+        "webp_method": settings.images_local_webp_method,
+        "avif_speed": settings.images_local_avif_speed,
+        "min_quality": settings.images_min_quality,
+    }
+    pool = _get_pool()
+    if pool is None:
+        return render_variants(data, targets, **options)
+    return pool.submit(render_variants, data, list(targets), **options).result()
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool, _pool_pid
+    if settings.images_local_processes <= 0 or multiprocessing.current_process().daemon:
+        return None
+
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            logger.info("Starting image process pool (%d)", settings.images_local_processes)
+            # spawn: воркер может быть многопоточным, fork из потока небезопасен
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.images_local_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_pid = os.getpid()
+        return _pool
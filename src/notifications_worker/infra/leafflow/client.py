@@ -1,9 +1,14 @@
 import logging
+import time
+from collections.abc import Mapping, Sequence
 
 import httpx
 
 from notifications_worker.domain.entities import ImageVariantResult
+from notifications_worker.infra import metrics
+from notifications_worker.infra.http import get_http_client
 from notifications_worker.infra.settings import settings as leafflow_settings
+from notifications_worker.utils.lazy import per_process
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +19,8 @@ class LeafFlowClient:
     def __init__(self) -> None:
         self._base_url = leafflow_settings.api_base_url.rstrip("/")
         self._token = leafflow_settings.internal_token
+        # None — ещё не знаем, поддерживает ли сервер bulk-эндпоинт
+        self._bulk_supported: bool | None = None
 
     def _headers(self) -> dict[str, str]:
         return {
@@ -29,20 +36,78 @@ class LeafFlowClient:
         """
         url = f"{self._base_url}/v1/internal/images/{image_id}/variants"
 
-        payload = {
-            "variant": variant.variant,
-            "storage_key": variant.storage_key,
-            "format": variant.format,
-            "width": variant.width,
-            "height": variant.height,
-            "byte_size": variant.byte_size,
-        }
-
-        with httpx.Client(timeout=30) as client:
-            response = client.post(url, json=payload, headers=self._headers())
-            response.raise_for_status()
+        started = time.perf_counter()
+        response = get_http_client("leafflow").post(
+            url, json=_variant_payload(variant), headers=self._headers()
+        )
+        response.raise_for_status()
+        metrics.LEAFFLOW_SAVE_SECONDS.labels("single").observe(time.perf_counter() - started)
 
         logger.info("Saved variant %s for image %d", variant.variant, image_id)
 
+    def save_image_variants(self, image_id: int, variants: Sequence[ImageVariantResult]) -> None:
+        """Сохранить метаданные всех вариантов изображения одним запросом."""
+        self.save_images_variants({image_id: variants})
+
+    def save_images_variants(
+        self,
+        variants_by_image: Mapping[int, Sequence[ImageVariantResult]],
+    ) -> None:
+        """
+        Сохранить метаданные вариантов нескольких изображений одним запросом.
+
+        POST /v1/internal/images/variants/bulk
+        Если сервер не знает bulk-эндпоинт (404/405 на первый запрос), переходит
+        на POST /v1/internal/images/{image_id}/variants для каждого варианта.
+        """
+        if self._bulk_supported is not False:
+            url = f"{self._base_url}/v1/internal/images/variants/bulk"
+            payload = {
+                "images": [
+                    {
+                        "image_id": image_id,
+                        "variants": [_variant_payload(v) for v in variants],
+                    }
+                    for image_id, variants in variants_by_image.items()
+                ]
+            }
+
+            started = time.perf_counter()
+            response = get_http_client("leafflow").post(url, json=payload, headers=self._headers())
+            # 404 после успешного bulk-запроса — это ошибка данных (нет изображения),
+            # а не отсутствие эндпоинта: отключать bulk из-за неё нельзя
+            if self._bulk_supported or response.status_code not in _BULK_ROUTE_MISSING:
+                response.raise_for_status()
+                metrics.LEAFFLOW_SAVE_SECONDS.labels("bulk").observe(time.perf_counter() - started)
+                self._bulk_supported = True
+                logger.info("Saved variants for images %s (bulk)", list(variants_by_image.keys()))
+                return
+
+            logger.warning(
+                "LeafFlow bulk variants endpoint unavailable (HTTP %d), saving one by one",
+                response.status_code,
+            )
+            self._bulk_supported = False
+
+        for image_id, variants in variants_by_image.items():
+            for variant in variants:
+                self.save_image_variant(image_id, variant)
+
+
+_BULK_ROUTE_MISSING = (httpx.codes.NOT_FOUND, httpx.codes.METHOD_NOT_ALLOWED)
+
+
+def _variant_payload(variant: ImageVariantResult) -> dict[str, object]:
+    return {
+        "variant": variant.variant,
+        "storage_key": variant.storage_key,
+        "format": variant.format,
+        "width": variant.width,
+        "height": variant.height,
+        "byte_size": variant.byte_size,
+        "quality": variant.quality,
+    }
+
 
-leafflow_client = LeafFlowClient()
+# LeafFlowClient процесса: создаётся при первом обращении или в worker_process_init
+get_leafflow_client = per_process(LeafFlowClient)
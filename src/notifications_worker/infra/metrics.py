@@ -0,0 +1,149 @@
+"""
+Prometheus metrics of the worker.
+
+Metrics are recorded only with METRICS_ENABLED=true and prometheus_client installed
+(`pip install ".[metrics]"`); otherwise every metric is a no-op and recording costs
+one method call. Prefork children write their samples to files in
+METRICS_MULTIPROC_DIR (prometheus_client multiprocess mode); the main worker process
+serves the aggregate of all of them on METRICS_PORT (see start_metrics_server).
+"""
+
+import logging
+import os
+import shutil
+import time
+from typing import Any
+
+from notifications_worker.infra.settings import settings
+
+logger = logging.getLogger(__name__)
+
+if settings.metrics_enabled:
+    # Must be set before prometheus_client is imported: it picks the value storage then
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.metrics_multiproc_dir)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    try:
+        import prometheus_client
+        from prometheus_client import multiprocess
+    except ImportError:  # pragma: no cover - optional dependency
+        logger.warning("METRICS_ENABLED=true but prometheus_client is not installed")
+        prometheus_client = None  # type: ignore[assignment]
+else:
+    prometheus_client = None  # type: ignore[assignment]
+
+
+class _NoopMetric:
+    """Stands in for a metric when metrics are disabled."""
+
+    def labels(self, *_: Any, **__: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, _: float) -> None:
+        pass
+
+    def inc(self, _: float = 1) -> None:
+        pass
+
+
+_NOOP = _NoopMetric()
+
+# Network round trips: a few ms to tens of seconds
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Cloudinary eager transformations: seconds to minutes
+_TRANSFORM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _histogram(name: str, doc: str, labels: tuple[str, ...], buckets: tuple[float, ...]) -> Any:
+    if prometheus_client is None:
+        return _NOOP
+    return prometheus_client.Histogram(name, doc, labels, buckets=buckets)
+
+
+def _counter(name: str, doc: str, labels: tuple[str, ...]) -> Any:
+    if prometheus_client is None:
+        return _NOOP
+    return prometheus_client.Counter(name, doc, labels)
+
+
+# outcome: "ok" or the exception class (TelegramRateLimited, TelegramTransportError, ...)
+TELEGRAM_REQUEST_SECONDS = _histogram(
+    "telegram_request_seconds",
+    "Telegram Bot API request latency",
+    ("method", "outcome"),
+    _LATENCY_BUCKETS,
+)
+TELEGRAM_ERRORS = _counter(
+    "telegram_errors_total",
+    "Telegram Bot API errors by class (infra/telegram/errors.py)",
+    ("error",),
+)
+# mode: "inline" — upload with eager transformations, "staged" — submit until collected
+CLOUDINARY_TRANSFORM_SECONDS = _histogram(
+    "cloudinary_transform_seconds",
+    "Cloudinary upload and eager transformations",
+    ("mode",),
+    _TRANSFORM_BUCKETS,
+)
+# Streamed variants: includes the S3 upload the stream feeds
+CDN_DOWNLOAD_SECONDS = _histogram(
+    "cloudinary_cdn_download_seconds",
+    "Variant download from Cloudinary CDN",
+    ("format",),
+    _LATENCY_BUCKETS,
+)
+S3_PUT_SECONDS = _histogram(
+    "s3_put_seconds",
+    "S3 object upload",
+    ("operation",),
+    _LATENCY_BUCKETS,
+)
+LEAFFLOW_SAVE_SECONDS = _histogram(
+    "leafflow_save_seconds",
+    "LeafFlow variant metadata save",
+    ("endpoint",),
+    _LATENCY_BUCKETS,
+)
+VARIANT_BYTES = _counter(
+    "image_variant_bytes_total",
+    "Bytes of image variants stored",
+    ("variant", "format"),
+)
+TASK_SECONDS = _histogram(
+    "celery_task_seconds",
+    "Celery task run time",
+    ("task", "state"),
+    _TRANSFORM_BUCKETS,
+)
+TASK_RETRIES = _counter(
+    "celery_task_retries_total",
+    "Celery task retries",
+    ("task", "error"),
+)
+
+
+def observe_telegram_request(method: str, outcome: str, started: float) -> None:
+    """Record a Bot API call that began at time.perf_counter() `started`."""
+    TELEGRAM_REQUEST_SECONDS.labels(method, outcome).observe(time.perf_counter() - started)
+    if outcome != "ok":
+        TELEGRAM_ERRORS.labels(outcome).inc()
+
+
+def start_metrics_server() -> None:
+    """
+    Serve metrics of all worker processes on settings.metrics_port.
+
+    Call once in the main worker process before the pool starts: samples left from
+    the previous run are removed first. With METRICS_PORT=0 the process only writes
+    samples (workers started by `python -m notifications_worker`, which serves them).
+    """
+    if prometheus_client is None or not settings.metrics_port:
+        return
+
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+    registry = prometheus_client.CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+    prometheus_client.start_http_server(settings.metrics_port, registry=registry)
+    logger.info("Metrics on :%d/metrics (%s)", settings.metrics_port, directory)
@@ -0,0 +1,303 @@
+"""
+Timing and profiling of Celery tasks (task_prerun / task_postrun hooks, see app.py).
+
+Every task is timed (the celery_task_seconds metric). With PROFILING_ENABLED=true a task
+also collects spans: infra calls (S3, Cloudinary SDK, Telegram rate limiter) and, from
+the HTTP clients' trace, TCP connect (DNS included), TLS handshake and waiting for the
+response. A report is written to PROFILING_DIR when
+
+- the task ran longer than PROFILING_SLOW_TASK_SECONDS: a watchdog thread samples the
+  task's stack from that moment until it finishes (collapsed stacks, flamegraph format);
+- the task was sampled (PROFILING_SAMPLE_RATE): it ran under cProfile from the start,
+  the stats are saved next to the report as .prof (python -m pstats, snakeviz).
+
+Reports are named {time}-{task}-{task_id}.json and hold the payload shape (types and
+lengths, not values), spans and stack samples; only the newest PROFILING_MAX_FILES are kept.
+"""
+
+import cProfile
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType, TracebackType
+from typing import Any
+
+import httpx
+
+from notifications_worker.infra import metrics
+from notifications_worker.infra.settings import settings
+from notifications_worker.utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+_MAX_STACK_DEPTH = 100
+_MAX_SHAPE_DEPTH = 4
+
+# httpcore trace events -> span names
+_HTTP_SPANS = {
+    "connection.connect_tcp": "http.connect",
+    "connection.start_tls": "http.tls",
+    "http11.receive_response_headers": "http.wait_response",
+    "http2.receive_response_headers": "http.wait_response",
+    "http11.receive_response_body": "http.read_body",
+    "http2.receive_response_body": "http.read_body",
+}
+
+
+@dataclass(slots=True)
+class _Run:
+    task_name: str
+    task_id: str
+    thread_id: int
+    started: float
+    started_at: float
+    payload_shape: Any
+    profiler: cProfile.Profile | None = None
+    # (name, offset from task start, duration), seconds
+    spans: list[tuple[str, float, float]] = field(default_factory=list)
+    stacks: Counter[str] = field(default_factory=Counter)
+
+
+_started: dict[str, float] = {}
+_runs: dict[str, _Run] = {}
+_local = threading.local()
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_watchdog_pid: int | None = None
+
+
+def task_started(task_id: str, task_name: str, args: Any, kwargs: Any) -> None:
+    """task_prerun: start timing (and profiling) the task."""
+    started = time.perf_counter()
+    _started[task_id] = started
+    if not settings.profiling_enabled:
+        return
+
+    run = _Run(
+        task_name=task_name,
+        task_id=task_id,
+        thread_id=threading.get_ident(),
+        started=started,
+        started_at=time.time(),
+        payload_shape=_shape({"args": args, "kwargs": kwargs}),
+    )
+    if random.random() < settings.profiling_sample_rate:
+        run.profiler = _start_profiler()
+    _runs[task_id] = run
+    _local.run = run
+    _ensure_watchdog()
+    _wakeup.set()
+
+
+def task_finished(task_id: str, task_name: str, state: str | None) -> None:
+    """task_postrun: record the duration and write the report of a slow or sampled task."""
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.TASK_SECONDS.labels(task_name, state or "UNKNOWN").observe(elapsed)
+
+    run = _runs.pop(task_id, None)
+    if run is None:
+        return
+    _local.run = None
+    if run.profiler is not None:
+        run.profiler.disable()
+    if run.profiler is not None or elapsed >= settings.profiling_slow_task_seconds:
+        try:
+            _write_report(run, elapsed, state)
+        except OSError:
+            logger.warning("Failed to write profile of %s[%s]", task_name, task_id, exc_info=True)
+
+
+def span(name: str) -> AbstractContextManager[object]:
+    """Time a block as a span of the running task (no-op when it is not profiled)."""
+    run = _current_run()
+    if run is None:
+        return _NO_SPAN
+    return _Span(name, run)
+
+
+def http_event_hooks() -> dict[str, list[Any]]:
+    """event_hooks for httpx.Client: trace connection setup and waits of profiled tasks."""
+    if not settings.profiling_enabled:
+        return {}
+    return {"request": [_trace_request]}
+
+
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("_name", "_run", "_started")
+
+    def __init__(self, name: str, run: _Run) -> None:
+        self._name = name
+        self._run = run
+        self._started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        duration = time.perf_counter() - self._started
+        self._run.spans.append((self._name, self._started - self._run.started, duration))
+
+
+class _HttpTracer:
+    """httpcore `trace` extension: turns started/complete event pairs into spans."""
+
+    __slots__ = ("_run", "_host", "_started")
+
+    def __init__(self, run: _Run, host: str) -> None:
+        self._run = run
+        self._host = host
+        self._started: dict[str, float] = {}
+
+    def __call__(self, event_name: str, info: dict[str, Any]) -> None:
+        name, _, phase = event_name.rpartition(".")
+        span_name = _HTTP_SPANS.get(name)
+        if span_name is None:
+            return
+        now = time.perf_counter()
+        if phase == "started":
+            self._started[name] = now
+        elif (started := self._started.pop(name, None)) is not None:
+            suffix = "" if phase == "complete" else f" ({phase})"
+            self._run.spans.append(
+                (f"{span_name} {self._host}{suffix}", started - self._run.started, now - started)
+            )
+
+
+def _trace_request(request: httpx.Request) -> None:
+    run = _current_run()
+    if run is not None:
+        request.extensions["trace"] = _HttpTracer(run, request.url.host)
+
+
+def _current_run() -> _Run | None:
+    run: _Run | None = getattr(_local, "run", None)
+    if run is None and _runs:
+        # Threads of the task's own pool (variant pipeline): prefork runs one task per process
+        runs = list(_runs.values())
+        if len(runs) == 1:
+            run = runs[0]
+    return run
+
+
+def _start_profiler() -> cProfile.Profile | None:
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+: one profiler per process, another task is already profiled
+        return None
+    return profiler
+
+
+def _ensure_watchdog() -> None:
+    global _watchdog_pid
+    if _watchdog_pid == os.getpid():
+        return
+    with _lock:
+        if _watchdog_pid != os.getpid():
+            # Threads do not survive fork: each prefork child starts its own
+            threading.Thread(target=_watch, name="task-profiler", daemon=True).start()
+            _watchdog_pid = os.getpid()
+
+
+def _watch() -> None:
+    threshold = settings.profiling_slow_task_seconds
+    interval = settings.profiling_stack_interval_seconds
+    while True:
+        # Cleared before the snapshot: a task starting after it sets the event again,
+        # so the wait below returns at once instead of missing it
+        _wakeup.clear()
+        runs = list(_runs.values())
+        now = time.perf_counter()
+        slow = [run for run in runs if now - run.started >= threshold]
+        if not slow:
+            # Sleep until the earliest task crosses the threshold or a new task starts
+            _wakeup.wait(min((run.started + threshold - now for run in runs), default=None))
+            continue
+
+        frames = sys._current_frames()
+        for run in slow:
+            frame = frames.get(run.thread_id)
+            if frame is not None:
+                run.stacks[_collapse(frame)] += 1
+        time.sleep(interval)
+
+
+def _collapse(frame: FrameType | None) -> str:
+    stack: list[str] = []
+    while frame is not None and len(stack) < _MAX_STACK_DEPTH:
+        code = frame.f_code
+        path = "/".join(Path(code.co_filename).parts[-2:])
+        stack.append(f"{code.co_name} ({path}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def _shape(value: Any, depth: int = 0) -> Any:
+    """Structure of a payload without its values: {"order_id": "int", "items": ["list[3]", ...]}."""
+    if depth >= _MAX_SHAPE_DEPTH:
+        return type(value).__name__
+    if isinstance(value, dict):
+        return {str(key): _shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        first = [_shape(value[0], depth + 1)] if value else []
+        return [f"{type(value).__name__}[{len(value)}]", *first]
+    if isinstance(value, str | bytes):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def _write_report(run: _Run, elapsed: float, state: str | None) -> None:
+    directory = Path(settings.profiling_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(run.started_at))
+    stem = f"{stamp}-{run.task_name}-{run.task_id}"
+
+    report: dict[str, Any] = {
+        "task": run.task_name,
+        "task_id": run.task_id,
+        "state": state,
+        "started_at": run.started_at,
+        "elapsed_seconds": round(elapsed, 6),
+        "pid": os.getpid(),
+        "payload_shape": run.payload_shape,
+        "spans": [
+            {"name": name, "offset": round(offset, 6), "seconds": round(seconds, 6)}
+            for name, offset, seconds in run.spans
+        ],
+        "stack_interval_seconds": settings.profiling_stack_interval_seconds,
+        "stacks": dict(run.stacks.most_common()),
+    }
+    if run.profiler is not None:
+        run.profiler.dump_stats(directory / f"{stem}.prof")
+        report["cprofile"] = f"{stem}.prof"
+
+    (directory / f"{stem}.json").write_bytes(dumps(report))
+    logger.warning("Task %s[%s] took %.2fs, profile: %s", run.task_name, run.task_id, elapsed, stem)
+    _prune(directory)
+
+
+def _prune(directory: Path) -> None:
+    reports = sorted(directory.glob("*.json"))
+    for report in reports[: max(0, len(reports) - settings.profiling_max_files)]:
+        report.unlink(missing_ok=True)
+        report.with_suffix(".prof").unlink(missing_ok=True)
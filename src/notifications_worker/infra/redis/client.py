@@ -0,0 +1,42 @@
+import redis
+import redis.asyncio
+
+from notifications_worker.infra.settings import settings
+
+# Quoted: redis.Redis is generic only in types-redis, not at runtime
+_client: "redis.Redis[bytes] | None" = None
+_async_client: "redis.asyncio.Redis[bytes] | None" = None
+
+
+def get_redis() -> "redis.Redis[bytes]":
+    """
+    Redis for shared worker state (not the Celery broker).
+
+    Created lazily; redis-py reconnects after fork, so the client is safe to use
+    from prefork children.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.state_url,
+            socket_timeout=settings.redis_state_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_state_socket_timeout_seconds,
+        )
+    return _client
+
+
+def get_async_redis() -> "redis.asyncio.Redis[bytes]":
+    """
+    Asyncio counterpart of get_redis().
+
+    Connections are bound to the event loop that first uses them, so call it only
+    from the notification engine loop (services/async_engine.py).
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis.from_url(
+            settings.state_url,
+            socket_timeout=settings.redis_state_socket_timeout_seconds,
+            socket_connect_timeout=settings.redis_state_socket_timeout_seconds,
+        )
+    return _async_client
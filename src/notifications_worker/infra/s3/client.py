@@ -1,15 +1,22 @@
+import time
 from io import BytesIO
+from typing import BinaryIO
 
-import boto3
-from botocore.config import Config
-
+from notifications_worker.infra import metrics
+from notifications_worker.infra.profiling import span
 from notifications_worker.infra.settings import settings as s3_settings
+from notifications_worker.utils.lazy import per_process
 
 
 class S3Client:
     """Клиент для загрузки файлов в S3."""
 
     def __init__(self) -> None:
+        # boto3 импортируется только в процессе, которому нужен S3 (воркер очереди images)
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
         self._client = boto3.client(
             "s3",
             endpoint_url=s3_settings.s3_endpoint,
@@ -20,15 +27,61 @@ class S3Client:
             config=Config(signature_version="s3v4"),
         )
         self._bucket = s3_settings.s3_bucket
+        # Потоки читаются последовательно: в памяти не больше одной части multipart
+        self._transfer_config = TransferConfig(
+            multipart_threshold=s3_settings.s3_multipart_threshold_bytes,
+            multipart_chunksize=s3_settings.s3_multipart_chunk_size_bytes,
+            use_threads=False,
+        )
 
     def upload(self, key: str, data: bytes, content_type: str) -> None:
         """Загрузить файл в S3."""
-        self._client.put_object(
-            Bucket=self._bucket,
-            Key=key,
-            Body=BytesIO(data),
-            ContentType=content_type,
-        )
+        started = time.perf_counter()
+        with span("s3.put_object"):
+            self._client.put_object(
+                Bucket=self._bucket,
+                Key=key,
+                Body=BytesIO(data),
+                ContentType=content_type,
+            )
+        metrics.S3_PUT_SECONDS.labels("put_object").observe(time.perf_counter() - started)
+
+    def head(self, key: str) -> str | None:
+        """ETag объекта в S3 (HEAD, без скачивания) или None, если объекта нет."""
+        try:
+            with span("s3.head_object"):
+                response = self._client.head_object(Bucket=self._bucket, Key=key)
+        except self._client.exceptions.ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        etag: str = response["ETag"].strip('"')
+        return etag
+
+    def download(self, key: str) -> bytes:
+        """Скачать файл из S3."""
+        with span("s3.get_object"):
+            response = self._client.get_object(Bucket=self._bucket, Key=key)
+            data: bytes = response["Body"].read()
+        return data
+
+    def upload_stream(self, key: str, stream: BinaryIO, content_type: str) -> None:
+        """
+        Загрузить файл в S3 из потока.
+
+        Крупные файлы уходят multipart-загрузкой частями по s3_multipart_chunk_size_bytes.
+        """
+        started = time.perf_counter()
+        with span("s3.upload_fileobj"):
+            self._client.upload_fileobj(
+                Fileobj=stream,
+                Bucket=self._bucket,
+                Key=key,
+                ExtraArgs={"ContentType": content_type},
+                Config=self._transfer_config,
+            )
+        metrics.S3_PUT_SECONDS.labels("upload_fileobj").observe(time.perf_counter() - started)
 
 
-s3_client = S3Client()
+# S3Client процесса: создаётся при первом обращении или в worker_process_init
+get_s3_client = per_process(S3Client)
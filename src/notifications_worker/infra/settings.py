@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,13 +18,100 @@ class Settings(BaseSettings):
     celery_queue: str = "notifications"
     celery_visibility_timeout: int = 60 * 30
 
+    # Notification lanes (see routing.py): relative share of turns a worker gives each lane
+    # while all of them have a backlog; new-order admin alerts go to the high lane
+    notifications_high_lane_weight: int = 6
+    notifications_normal_lane_weight: int = 3
+    notifications_bulk_lane_weight: int = 1
+
+    # Worker pool per queue (python -m notifications_worker, see worker_pools.py).
+    # Time limits and max_tasks_per_child: 0 = none; max_tasks_per_child is prefork only.
+    notifications_pool: Literal["prefork", "threads", "gevent", "solo"] = "prefork"
+    notifications_concurrency: int = 4
+    notifications_prefetch_multiplier: int = 1
+    notifications_time_limit_seconds: int = 0
+    notifications_soft_time_limit_seconds: int = 0
+    notifications_max_tasks_per_child: int = 0
+    # None: threads for the local engine with a process pool (prefork children are daemonic
+    # and cannot start images_local_processes), prefork otherwise
+    images_pool: Literal["prefork", "threads", "gevent", "solo"] | None = None
+    images_concurrency: int = 2
+    images_prefetch_multiplier: int = 1
+    images_time_limit_seconds: int = 0
+    images_soft_time_limit_seconds: int = 0
+    images_max_tasks_per_child: int = 0
+
+    # Retries / dead letters
+    retry_backoff_base_seconds: float = 5.0
+    retry_backoff_max_seconds: float = 300.0
+    retry_jitter_seconds: float = 3.0
+    retry_rate_limited_default_seconds: float = 10.0
+    dead_letter_key: str = "notifications:dead_letter"
+    dead_letter_max_length: int = 10_000
+
+    # Redis (shared worker state: rate limits, ledgers, caches)
+    redis_state_db: int = 2
+    redis_state_url: str | None = None
+    redis_state_socket_timeout_seconds: float = 0.5
+
+    # HTTP (shared pooled clients, see infra/http.py)
+    http_max_connections: int = 20
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http2_enabled: bool = False
+    http_warmup_enabled: bool = True
+
+    # Metrics (Prometheus, needs the `metrics` extra; see infra/metrics.py)
+    metrics_enabled: bool = False
+    # 0 = do not serve, only write samples (another process serves the directory)
+    metrics_port: int = 9808
+    # Prefork children write samples here, the main process aggregates them on scrape
+    metrics_multiproc_dir: str = "/tmp/notifications-worker-metrics"
+
+    # Task profiling (see infra/profiling.py)
+    profiling_enabled: bool = False
+    profiling_dir: str = "/tmp/notifications-worker-profiles"
+    # Tasks running longer than this get their stack sampled until they finish
+    profiling_slow_task_seconds: float = 10.0
+    profiling_stack_interval_seconds: float = 0.01
+    # Fraction of tasks (0..1) run under cProfile from start to finish
+    profiling_sample_rate: float = 0.0
+    profiling_max_files: int = 500
+
     # Telegram
     telegram_bot_token: str
     admin_chat_id: int
+    telegram_api_base_url: str = "https://api.telegram.org"
 
     telegram_http_timeout_seconds: float = 10.0
     telegram_http_connect_timeout_seconds: float = 5.0
 
+    # Telegram rate limiting (token buckets shared through Redis)
+    telegram_rate_limit_enabled: bool = True
+    telegram_rate_limit_global_per_second: float = 28.0
+    telegram_rate_limit_chat_per_second: float = 1.0
+    telegram_rate_limit_group_per_minute: float = 19.0
+    telegram_rate_limit_group_burst: int = 3
+    telegram_rate_limit_thread_per_second: float = 1.0
+    telegram_rate_limit_max_wait_seconds: float = 5.0
+
+    # Notifications engine
+    # sync: blocking httpx.Client per prefork process
+    # async: thread pool worker + one asyncio loop per process doing all Telegram I/O
+    notifications_engine: Literal["sync", "async"] = "sync"
+    notifications_async_concurrency: int = 200
+    notifications_async_pool_size: int = 200
+    notifications_fanout_workers: int = 8
+    # Status updates of one order to one recipient within this window are merged into
+    # a single message with the latest status (0 disables). New orders are never delayed.
+    notifications_coalesce_window_seconds: float = 3.0
+    # Status updates edit the admin message of the order instead of posting a new one
+    admin_message_edit_enabled: bool = True
+    admin_message_ttl_days: int = 7
+    # Delivered (order, status change, recipient) are remembered to skip duplicate sends
+    # on redelivery; must outlive the visibility timeout plus all retries.
+    delivery_ledger_ttl_seconds: int = 24 * 60 * 60
+
     # s3
     s3_endpoint: str
     s3_access_key: str
@@ -30,15 +119,50 @@ class Settings(BaseSettings):
     s3_bucket: str
     s3_region: str = "us-east-1"
     s3_use_ssl: bool = False
+    s3_multipart_threshold_bytes: int = 8 * 1024 * 1024
+    s3_multipart_chunk_size_bytes: int = 8 * 1024 * 1024
 
     # leafflow
     api_base_url: str
     internal_token: str
 
+    # images
+    # Variants processed in parallel per image (download → S3 → metadata); 1 = serial
+    images_pipeline_concurrency: int = 3
+    # Variants are streamed CDN → S3 in chunks of this size instead of being buffered whole
+    images_stream_chunk_size: int = 256 * 1024
+    # cloudinary: transforms in Cloudinary; local: Pillow in the worker (extra "local-images")
+    images_engine: Literal["cloudinary", "local"] = "cloudinary"
+    # Process pool for the local engine (0 = render in the task process). Not used in prefork
+    # workers: their children are daemonic and each one renders itself
+    images_local_processes: int = 2
+    # WebP encoder effort 0..6 (higher = smaller files, slower)
+    images_local_webp_method: int = 4
+    # AVIF encoder speed 0..10 (lower = smaller files, much slower)
+    images_local_avif_speed: int = 8
+    # Variants over their max_bytes budget are re-encoded at lower quality, down to this
+    images_min_quality: int = 40
+    # Cloudinary engine: quality step of each re-encode when searching for the budget
+    images_quality_step: int = 10
+    # Skip variants already made from the same original (S3 ETag) with the same config
+    images_skip_cache_enabled: bool = True
+    images_skip_cache_ttl_days: int = 30
+    # Cloudinary engine: run create_variants as separate Celery stages (submit → poll → transfer
+    # → finalize) so no worker slot waits for Cloudinary; False = one blocking task
+    images_staged_enabled: bool = True
+    images_transform_poll_seconds: float = 2.0
+    images_transform_poll_max_seconds: float = 30.0
+    # Next poll after the hourly Admin API limit was hit (does not use up the task's retries)
+    images_transform_rate_limited_poll_seconds: float = 120.0
+    images_transform_timeout_seconds: int = 600
+
     # cloudinary
     cloudinary_cloud_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
+    cloudinary_cdn_base_url: str = "https://res.cloudinary.com"
+    # Override for the API and CDN host (e.g. the offline stand-in in tools/fakes)
+    cloudinary_api_base_url: str | None = None
 
     @property
     def broker_url(self) -> str:
@@ -48,5 +172,9 @@ class Settings(BaseSettings):
     def result_backend_url(self) -> str:
         return self.celery_result_backend or f"redis://{self.redis_host}:{self.redis_port}/{self.redis_backend_db}"
 
+    @property
+    def state_url(self) -> str:
+        return self.redis_state_url or f"redis://{self.redis_host}:{self.redis_port}/{self.redis_state_db}"
+
 
 settings = Settings()
@@ -0,0 +1,141 @@
+from typing import Any
+
+import httpx
+
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram.errors import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbidden,
+    TelegramNotFound,
+    TelegramRateLimited,
+    TelegramServerError,
+)
+from notifications_worker.utils.serialization import dumps, loads
+
+# Pre-encoded JSON (see keyboards.py) or a plain dict
+ReplyMarkup = bytes | dict[str, Any]
+
+
+def bot_api_url() -> str:
+    return f"{settings.telegram_api_base_url.rstrip('/')}/bot{settings.telegram_bot_token}"
+
+
+def build_send_message_body(
+    chat_id: int,
+    text: str,
+    *,
+    thread_id: int | None,
+    reply_markup: ReplyMarkup | None,
+    parse_mode: str | None,
+    disable_web_page_preview: bool,
+) -> bytes:
+    """JSON body of sendMessage."""
+    payload: dict[str, Any] = {
+        "chat_id": chat_id,
+        "text": text,
+        "disable_web_page_preview": disable_web_page_preview,
+    }
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+    if thread_id and thread_id > 0:
+        payload["message_thread_id"] = thread_id
+    return _encode(payload, reply_markup)
+
+
+def build_edit_message_text_body(
+    chat_id: int,
+    message_id: int,
+    text: str,
+    *,
+    reply_markup: ReplyMarkup | None,
+    parse_mode: str | None,
+    disable_web_page_preview: bool,
+) -> bytes:
+    """JSON body of editMessageText."""
+    payload: dict[str, Any] = {
+        "chat_id": chat_id,
+        "message_id": message_id,
+        "text": text,
+        "disable_web_page_preview": disable_web_page_preview,
+    }
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+    return _encode(payload, reply_markup)
+
+
+def _encode(payload: dict[str, Any], reply_markup: ReplyMarkup | None) -> bytes:
+    if isinstance(reply_markup, bytes):
+        # Splice the pre-encoded markup in instead of walking it again
+        return dumps(payload)[:-1] + b',"reply_markup":' + reply_markup + b"}"
+    if reply_markup is not None:
+        payload["reply_markup"] = reply_markup
+    return dumps(payload)
+
+
+def message_id_of(data: dict[str, Any]) -> int | None:
+    """message_id from a sendMessage response."""
+    result = data.get("result")
+    message_id = result.get("message_id") if isinstance(result, dict) else None
+    return message_id if isinstance(message_id, int) else None
+
+
+def parse_response(resp: httpx.Response) -> dict[str, Any]:
+    """Map a Bot API response to its JSON body or to one of the Telegram errors."""
+    data = _try_json(resp)
+
+    # Telegram almost always returns JSON, even on errors.
+    # If not, keep fallback to text.
+    if resp.status_code >= 400:
+        _raise_http_error(resp, data)
+
+    # API-level error (HTTP 200 but ok=false)
+    if isinstance(data, dict) and data.get("ok") is False:
+        raise TelegramAPIError(
+            description=str(data.get("description") or "Unknown Telegram error"),
+            error_code=data.get("error_code"),
+            parameters=data.get("parameters"),
+        )
+
+    if not isinstance(data, dict):
+        raise TelegramServerError(status_code=resp.status_code, body=resp.text)
+
+    return data
+
+
+def _try_json(resp: httpx.Response) -> dict[str, Any] | None:
+    try:
+        obj = loads(resp.content)
+        return obj if isinstance(obj, dict) else None
+    except Exception:
+        return None
+
+
+def _raise_http_error(resp: httpx.Response, data: dict[str, Any] | None) -> None:
+    desc = None
+    params: dict[str, Any] | None = None
+
+    if data:
+        desc = data.get("description")
+        params = data.get("parameters")
+
+    desc = desc or resp.text or f"HTTP {resp.status_code}"
+
+    if resp.status_code == 429:
+        retry_after = None
+        if params and isinstance(params, dict):
+            retry_after = params.get("retry_after")
+        raise TelegramRateLimited(retry_after=retry_after)
+
+    if 500 <= resp.status_code <= 599:
+        raise TelegramServerError(status_code=resp.status_code, body=resp.text)
+
+    if resp.status_code == 400:
+        raise TelegramBadRequest(description=desc)
+    if resp.status_code == 403:
+        raise TelegramForbidden(description=desc)
+    if resp.status_code == 404:
+        raise TelegramNotFound(description=desc)
+
+    # Any other 4xx
+    raise TelegramBadRequest(description=desc)
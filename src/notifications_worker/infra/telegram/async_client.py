@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Any
+
+import httpx
+
+from notifications_worker.infra import metrics
+from notifications_worker.infra.http import create_async_http_client
+from notifications_worker.infra.telegram.api import (
+    ReplyMarkup,
+    bot_api_url,
+    build_edit_message_text_body,
+    build_send_message_body,
+    message_id_of,
+    parse_response,
+)
+from notifications_worker.infra.telegram.errors import TelegramTransportError
+from notifications_worker.infra.telegram.rate_limiter import TelegramRateLimiter
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class AsyncTelegramClient:
+    """
+    Asyncio version of TelegramClient with the same payloads and error mapping.
+
+    At most max_in_flight requests are sent concurrently; waiting for the rate
+    limiter does not hold a slot. The underlying httpx.AsyncClient is bound to
+    the loop it is first used on.
+    """
+
+    def __init__(self, max_in_flight: int) -> None:
+        self._base = bot_api_url()
+        self._max_in_flight = max_in_flight
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._client: httpx.AsyncClient | None = None
+        self._rate_limiter = TelegramRateLimiter()
+
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        thread_id: int | None = None,
+        reply_markup: ReplyMarkup | None = None,
+        parse_mode: str | None = "HTML",
+        disable_web_page_preview: bool = True,
+    ) -> int | None:
+        """Send a message. Returns its message_id."""
+        body = build_send_message_body(
+            chat_id,
+            text,
+            thread_id=thread_id,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+            disable_web_page_preview=disable_web_page_preview,
+        )
+
+        await self._rate_limiter.acquire_async(chat_id, thread_id)
+        data = await self._post("sendMessage", body)
+        return message_id_of(data)
+
+    async def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        *,
+        reply_markup: ReplyMarkup | None = None,
+        parse_mode: str | None = "HTML",
+        disable_web_page_preview: bool = True,
+    ) -> None:
+        body = build_edit_message_text_body(
+            chat_id,
+            message_id,
+            text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+            disable_web_page_preview=disable_web_page_preview,
+        )
+
+        await self._rate_limiter.acquire_async(chat_id, edit=True)
+        await self._post("editMessageText", body)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, method: str, body: bytes) -> dict[str, Any]:
+        url = f"{self._base}/{method}"
+        async with self._in_flight:
+            started = time.perf_counter()
+            try:
+                try:
+                    resp = await self._http().post(url, content=body, headers=_JSON_HEADERS)
+                except httpx.RequestError as exc:
+                    raise TelegramTransportError(str(exc)) from exc
+                data = parse_response(resp)
+            except Exception as exc:
+                metrics.observe_telegram_request(method, type(exc).__name__, started)
+                raise
+
+        metrics.observe_telegram_request(method, "ok", started)
+        return data
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = create_async_http_client("telegram", self._max_in_flight)
+        return self._client
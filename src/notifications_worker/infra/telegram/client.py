@@ -1,28 +1,30 @@
+import time
 from typing import Any
 
 import httpx
 
-from notifications_worker.infra.settings import settings
-from notifications_worker.infra.telegram.errors import (
-    TelegramAPIError,
-    TelegramBadRequest,
-    TelegramForbidden,
-    TelegramNotFound,
-    TelegramRateLimited,
-    TelegramServerError,
-    TelegramTransportError,
+from notifications_worker.infra import metrics
+from notifications_worker.infra.http import get_http_client
+from notifications_worker.infra.profiling import span
+from notifications_worker.infra.telegram.api import (
+    ReplyMarkup,
+    bot_api_url,
+    build_edit_message_text_body,
+    build_send_message_body,
+    message_id_of,
+    parse_response,
 )
+from notifications_worker.infra.telegram.errors import TelegramTransportError
+from notifications_worker.infra.telegram.rate_limiter import TelegramRateLimiter
+from notifications_worker.utils.lazy import per_process
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
 
 class TelegramClient:
     def __init__(self) -> None:
-        self._base = f"https://api.telegram.org/bot{settings.telegram_bot_token}"
-        self._client = httpx.Client(
-            timeout=httpx.Timeout(
-                timeout=settings.telegram_http_timeout_seconds,
-                connect=settings.telegram_http_connect_timeout_seconds,
-            )
-        )
+        self._base = bot_api_url()
+        self._rate_limiter = TelegramRateLimiter()
 
     def send_message(
         self,
@@ -30,88 +32,64 @@ class TelegramClient:
         text: str,
         *,
         thread_id: int | None = None,
-        reply_markup: dict[str, Any] | None = None,
+        reply_markup: ReplyMarkup | None = None,
+        parse_mode: str | None = "HTML",
+        disable_web_page_preview: bool = True,
+    ) -> int | None:
+        """Send a message. Returns its message_id."""
+        body = build_send_message_body(
+            chat_id,
+            text,
+            thread_id=thread_id,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+            disable_web_page_preview=disable_web_page_preview,
+        )
+
+        with span("telegram.rate_limit"):
+            self._rate_limiter.acquire(chat_id, thread_id)
+        data = self._post("sendMessage", body)
+        return message_id_of(data)
+
+    def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        *,
+        reply_markup: ReplyMarkup | None = None,
         parse_mode: str | None = "HTML",
         disable_web_page_preview: bool = True,
     ) -> None:
-        payload: dict[str, Any] = {
-            "chat_id": chat_id,
-            "text": text,
-            "disable_web_page_preview": disable_web_page_preview,
-        }
-        if parse_mode:
-            payload["parse_mode"] = parse_mode
-        if thread_id and thread_id > 0:
-            payload["message_thread_id"] = thread_id
-        if reply_markup is not None:
-            payload["reply_markup"] = reply_markup
+        body = build_edit_message_text_body(
+            chat_id,
+            message_id,
+            text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+            disable_web_page_preview=disable_web_page_preview,
+        )
 
-        self._post("sendMessage", payload)
+        with span("telegram.rate_limit"):
+            self._rate_limiter.acquire(chat_id, edit=True)
+        self._post("editMessageText", body)
 
-    def _post(self, method: str, payload: dict[str, Any]) -> dict[str, Any]:
+    def _post(self, method: str, body: bytes) -> dict[str, Any]:
         url = f"{self._base}/{method}"
+        started = time.perf_counter()
         try:
-            resp = self._client.post(url, json=payload)
-        except httpx.RequestError as exc:
-            raise TelegramTransportError(str(exc)) from exc
-
-        data = self._try_json(resp)
-
-        # Telegram almost always returns JSON, even on errors.
-        # If not, keep fallback to text.
-        if resp.status_code >= 400:
-            self._raise_http_error(resp, data)
-
-        # API-level error (HTTP 200 but ok=false)
-        if isinstance(data, dict) and data.get("ok") is False:
-            raise TelegramAPIError(
-                description=str(data.get("description") or "Unknown Telegram error"),
-                error_code=data.get("error_code"),
-                parameters=data.get("parameters"),
-            )
-
-        if not isinstance(data, dict):
-            raise TelegramServerError(status_code=resp.status_code, body=resp.text)
-
+            try:
+                resp = get_http_client("telegram").post(url, content=body, headers=_JSON_HEADERS)
+            except httpx.RequestError as exc:
+                raise TelegramTransportError(str(exc)) from exc
+            data = parse_response(resp)
+        except Exception as exc:
+            metrics.observe_telegram_request(method, type(exc).__name__, started)
+            raise
+
+        metrics.observe_telegram_request(method, "ok", started)
         return data
 
-    @staticmethod
-    def _try_json(resp: httpx.Response) -> dict[str, Any] | None:
-        try:
-            obj = resp.json()
-            return obj if isinstance(obj, dict) else None
-        except Exception:
-            return None
-
-    @staticmethod
-    def _raise_http_error(resp: httpx.Response, data: dict[str, Any] | None) -> None:
-        desc = None
-        params: dict[str, Any] | None = None
-
-        if data:
-            desc = data.get("description")
-            params = data.get("parameters")
-
-        desc = desc or resp.text or f"HTTP {resp.status_code}"
-
-        if resp.status_code == 429:
-            retry_after = None
-            if params and isinstance(params, dict):
-                retry_after = params.get("retry_after")
-            raise TelegramRateLimited(retry_after=retry_after)
-
-        if 500 <= resp.status_code <= 599:
-            raise TelegramServerError(status_code=resp.status_code, body=resp.text)
-
-        if resp.status_code == 400:
-            raise TelegramBadRequest(description=desc)
-        if resp.status_code == 403:
-            raise TelegramForbidden(description=desc)
-        if resp.status_code == 404:
-            raise TelegramNotFound(description=desc)
-
-        # Any other 4xx
-        raise TelegramBadRequest(description=desc)
-
 
-tg = TelegramClient()
\ No newline at end of file
+# The process's TelegramClient, created on first use or in worker_process_init
+get_telegram_client = per_process(TelegramClient)
@@ -33,6 +33,14 @@ class TelegramRateLimited(TelegramRetryableError):
         return f"TelegramRateLimited(retry_after={self.retry_after})"
 
 
+@dataclass(slots=True)
+class TelegramRateLimitDeferred(TelegramRateLimited):
+    """Our own rate limiter would wait too long: the request never reached Telegram."""
+
+    def __str__(self) -> str:
+        return f"TelegramRateLimitDeferred(retry_after={self.retry_after})"
+
+
 @dataclass(slots=True)
 class TelegramBadRequest(TelegramNonRetryableError):
     description: str
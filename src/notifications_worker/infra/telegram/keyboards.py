@@ -1,4 +1,7 @@
+from collections.abc import Callable
+
 from notifications_worker.infra.telegram.models import InlineKeyboardMarkup, InlineKeyboardButton
+from notifications_worker.utils.serialization import dumps
 
 
 def order_actions(order_id: str) -> InlineKeyboardMarkup:
@@ -18,3 +21,23 @@ def admin_order_details_button(order_id: str) -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text="✏️ Изменить статус", callback_data=f"admin:status:{order_id}")]
         ]
     )
+
+
+class _EncodedKeyboard:
+    """
+    Клавиатура, закодированная в JSON один раз при импорте.
+    На каждое сообщение в готовые байты подставляется только order_id.
+    """
+
+    _SLOT = "\x00"
+
+    def __init__(self, layout: Callable[[str], InlineKeyboardMarkup]) -> None:
+        encoded = dumps(layout(self._SLOT).to_dict())
+        self._parts = encoded.split(dumps(self._SLOT)[1:-1])
+
+    def __call__(self, order_id: str) -> bytes:
+        return dumps(order_id)[1:-1].join(self._parts)
+
+
+order_actions_json = _EncodedKeyboard(order_actions)
+admin_order_details_button_json = _EncodedKeyboard(admin_order_details_button)
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+import redis
+import redis.asyncio
+from redis.commands.core import AsyncScript, Script
+
+from notifications_worker.infra.redis.client import get_async_redis, get_redis
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram.errors import TelegramRateLimitDeferred
+
+logger = logging.getLogger(__name__)
+
+# Takes one token from every bucket or from none of them.
+# Returns "0" on success, otherwise the seconds to wait until all buckets have a token
+# (as a string: Redis truncates Lua numbers to integers).
+# Uses the Redis clock so buckets stay consistent across nodes.
+_TAKE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 't', 'ts')
+    local t = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    t = math.min(capacity, t + math.max(0, now - ts) * rate)
+    tokens[i] = t
+    if t < 1 then
+        wait = math.max(wait, (1 - t) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    redis.call('HSET', KEYS[i], 't', tostring(tokens[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate * 1000) + 1000)
+end
+return '0'
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Bucket:
+    key: str
+    rate: float  # tokens per second
+    capacity: float
+
+
+class _LocalBuckets:
+    """In-process token buckets, used while Redis is unavailable."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._state: dict[str, tuple[float, float]] = {}
+
+    def take(self, buckets: Sequence[Bucket]) -> float:
+        with self._lock:
+            now = time.monotonic()
+            tokens: list[float] = []
+            wait = 0.0
+            for b in buckets:
+                t, ts = self._state.get(b.key, (b.capacity, now))
+                t = min(b.capacity, t + max(0.0, now - ts) * b.rate)
+                tokens.append(t)
+                if t < 1:
+                    wait = max(wait, (1 - t) / b.rate)
+            if wait > 0:
+                return wait
+            for b, t in zip(buckets, tokens, strict=True):
+                self._state[b.key] = (t - 1, now)
+            return 0.0
+
+
+class TelegramRateLimiter:
+    """
+    Proactive limiter for Bot API sends: global bot bucket, per-chat bucket
+    (private chats and groups have different limits) and per-thread bucket.
+
+    Buckets live in Redis so every process on every node shares them.
+    Falls back to per-process buckets when Redis is unreachable.
+    """
+
+    def __init__(
+        self,
+        redis_factory: Callable[[], "redis.Redis[bytes]"] = get_redis,
+        async_redis_factory: Callable[[], "redis.asyncio.Redis[bytes]"] = get_async_redis,
+    ) -> None:
+        self._redis_factory = redis_factory
+        self._async_redis_factory = async_redis_factory
+        self._script: Script | None = None
+        self._async_script: AsyncScript | None = None
+        self._local = _LocalBuckets()
+
+    def buckets_for(
+        self,
+        chat_id: int,
+        thread_id: int | None = None,
+        *,
+        edit: bool = False,
+    ) -> list[Bucket]:
+        buckets = [
+            Bucket(
+                key="tg:rl:global",
+                rate=settings.telegram_rate_limit_global_per_second,
+                capacity=settings.telegram_rate_limit_global_per_second,
+            )
+        ]
+        if edit:
+            # Edits are limited separately from new messages in the chat
+            buckets.append(
+                Bucket(
+                    key=f"tg:rl:edit:{chat_id}",
+                    rate=settings.telegram_rate_limit_chat_per_second,
+                    capacity=1,
+                )
+            )
+        elif chat_id < 0:
+            # Groups, supergroups and channels
+            buckets.append(
+                Bucket(
+                    key=f"tg:rl:chat:{chat_id}",
+                    rate=settings.telegram_rate_limit_group_per_minute / 60,
+                    capacity=settings.telegram_rate_limit_group_burst,
+                )
+            )
+        else:
+            buckets.append(
+                Bucket(
+                    key=f"tg:rl:chat:{chat_id}",
+                    rate=settings.telegram_rate_limit_chat_per_second,
+                    capacity=1,
+                )
+            )
+        if thread_id and thread_id > 0 and not edit:
+            buckets.append(
+                Bucket(
+                    key=f"tg:rl:thread:{chat_id}:{thread_id}",
+                    rate=settings.telegram_rate_limit_thread_per_second,
+                    capacity=1,
+                )
+            )
+        return buckets
+
+    def acquire(
+        self,
+        chat_id: int,
+        thread_id: int | None = None,
+        *,
+        edit: bool = False,
+    ) -> None:
+        """
+        Block until a send to chat_id/thread_id fits into every bucket.
+
+        Raises TelegramRateLimitDeferred if that would take longer than
+        telegram_rate_limit_max_wait_seconds, so the task is retried later
+        instead of holding a worker slot.
+        """
+        if not settings.telegram_rate_limit_enabled:
+            return
+
+        buckets = self.buckets_for(chat_id, thread_id, edit=edit)
+        deadline = time.monotonic() + settings.telegram_rate_limit_max_wait_seconds
+
+        while True:
+            wait = self.take(buckets)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise TelegramRateLimitDeferred(retry_after=math.ceil(wait))
+            time.sleep(wait)
+
+    async def acquire_async(
+        self,
+        chat_id: int,
+        thread_id: int | None = None,
+        *,
+        edit: bool = False,
+    ) -> None:
+        """Same as acquire(), for the asyncio engine."""
+        if not settings.telegram_rate_limit_enabled:
+            return
+
+        buckets = self.buckets_for(chat_id, thread_id, edit=edit)
+        deadline = time.monotonic() + settings.telegram_rate_limit_max_wait_seconds
+
+        while True:
+            wait = await self.take_async(buckets)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise TelegramRateLimitDeferred(retry_after=math.ceil(wait))
+            await asyncio.sleep(wait)
+
+    def take(self, buckets: Sequence[Bucket]) -> float:
+        """Try to take a token from every bucket. Returns seconds to wait (0 = taken)."""
+        try:
+            return self._take_redis(buckets)
+        except redis.RedisError as exc:
+            logger.warning("Rate limiter: Redis unavailable (%s), using local buckets", exc)
+            return self._local.take(buckets)
+
+    async def take_async(self, buckets: Sequence[Bucket]) -> float:
+        try:
+            if self._async_script is None:
+                self._async_script = self._async_redis_factory().register_script(_TAKE_SCRIPT)
+            result = await self._async_script(
+                keys=[b.key for b in buckets], args=_script_args(buckets)
+            )
+            return float(result)
+        except redis.RedisError as exc:
+            logger.warning("Rate limiter: Redis unavailable (%s), using local buckets", exc)
+            return self._local.take(buckets)
+
+    def _take_redis(self, buckets: Sequence[Bucket]) -> float:
+        if self._script is None:
+            self._script = self._redis_factory().register_script(_TAKE_SCRIPT)
+
+        result = self._script(keys=[b.key for b in buckets], args=_script_args(buckets))
+        return float(result)
+
+
+def _script_args(buckets: Sequence[Bucket]) -> list[float]:
+    args: list[float] = []
+    for b in buckets:
+        args.extend((b.rate, b.capacity))
+    return args
@@ -0,0 +1,126 @@
+"""
+Notification lanes: which queue a task goes to and in which order a worker takes them.
+
+    notifications.high   new-order admin alerts (operators act on them), also in batches
+    notifications        status updates and everything else (the original queue)
+    notifications.bulk   batches without new-order admin alerts and backfills
+
+Celery routers run where a task is published, not in the worker. route_task routes the tasks
+the worker publishes itself (hand-offs, deferred status updates); the backend must pick the
+lane on its side: pass queue= to send_task, or set this function as its task router
+(task_routes = ("notifications_worker.routing.route_task",)). The module imports nothing
+of the worker, so that needs no worker settings. An explicit queue= wins over the router.
+WeightedCycle is the queue order strategy of the Redis transport: a worker
+consuming several lanes takes them in a smooth weighted round robin, so under a backlog of
+status updates or a bulk backfill a new-order alert waits a few free slots, not the backlog.
+"""
+
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+
+HIGH_LANE = "notifications.high"
+NORMAL_LANE = "notifications"
+BULK_LANE = "notifications.bulk"
+NOTIFICATION_LANES = (HIGH_LANE, NORMAL_LANE, BULK_LANE)
+
+# Tasks whose payload is a single order and may carry a new-order admin alert
+_ORDER_TASKS = {
+    "notifications.send_notification.order",
+    "notifications.send_notification.order.admin",
+}
+_BULK_TASKS = {"notifications.send_notification.order.batch"}
+
+
+def route_task(
+    name: str,
+    args: Sequence[Any] | None,
+    kwargs: Mapping[str, Any] | None,
+    options: Mapping[str, Any],
+    task: object = None,
+    **_: object,
+) -> dict[str, str] | None:
+    """Celery router: the lane of a notification task, None for other tasks."""
+    if not name.startswith("notifications."):
+        return None
+    if name in _BULK_TASKS:
+        # Batches peak at promo launches: their new-order alerts must not wait behind backfills
+        if _alerts_admin(args, kwargs) and any(map(_is_new_order, _batch_payloads(args))):
+            return {"queue": HIGH_LANE}
+        return {"queue": BULK_LANE}
+    if name in _ORDER_TASKS and args and _is_new_order(args[0]):
+        return {"queue": HIGH_LANE}
+    return {"queue": NORMAL_LANE}
+
+
+def _is_new_order(payload: object) -> bool:
+    # The heuristic of dispatcher._is_new_order on the raw payload: routing runs before
+    # the payload is validated, and an invalid one simply goes to the normal lane
+    return (
+        isinstance(payload, Mapping)
+        and payload.get("old_status") == "created"
+        and payload.get("new_status") == "created"
+    )
+
+
+def _batch_payloads(args: Sequence[Any] | None) -> Sequence[Any]:
+    payloads = args[0] if args else None
+    return payloads if isinstance(payloads, list) else []
+
+
+def _alerts_admin(args: Sequence[Any] | None, kwargs: Mapping[str, Any] | None) -> bool:
+    # recipients: the second argument of the batch task, None = admin and user
+    recipients = args[1] if args and len(args) > 1 else (kwargs or {}).get("recipients")
+    return not recipients or "admin" in recipients
+
+
+def lane_weights() -> dict[str, int]:
+    # Imported here: route_task must stay importable by producers without worker settings
+    from notifications_worker.infra.settings import settings
+
+    return {
+        HIGH_LANE: settings.notifications_high_lane_weight,
+        NORMAL_LANE: settings.notifications_normal_lane_weight,
+        BULK_LANE: settings.notifications_bulk_lane_weight,
+    }
+
+
+class WeightedCycle:
+    """
+    kombu queue order strategy (broker_transport_options["queue_order_strategy"]).
+
+    The Redis transport BRPOPs all consumed queues in the order of consume() and reports
+    the queue a message came from to rotate(). Every rotate() adds each queue's weight to
+    its credit and takes the total weight from the queue that was served; consume() lists
+    queues by credit. With all lanes backlogged they are served in proportion to their
+    weights; an empty lane is skipped by BRPOP. Credits stay within ± the total weight, so
+    after a lane was idle for long no lane takes (or loses) a long run of turns.
+    Queues without a weight (e.g. images) weigh 1.
+    """
+
+    def __init__(self, it: Iterable[str] | None = None) -> None:
+        self.weights = lane_weights()
+        self.items: list[str] = []
+        self.credits: dict[str, int] = {}
+        self.update(it or [])
+
+    def update(self, it: Iterable[str]) -> None:
+        self.items[:] = it
+        self.credits = {queue: self.credits.get(queue, 0) for queue in self.items}
+
+    def consume(self, n: int) -> list[str]:
+        items = self.items[:n]
+        # Stable sort: equal credits keep the configured queue order
+        return sorted(items, key=lambda queue: -(self.credits[queue] + self._weight(queue)))
+
+    def rotate(self, last_used: str) -> str:
+        if last_used not in self.credits:
+            return last_used
+        total = sum(self._weight(queue) for queue in self.items)
+        self.credits[last_used] -= total
+        for queue in self.items:
+            credit = self.credits[queue] + self._weight(queue)
+            self.credits[queue] = max(-total, min(credit, total))
+        return last_used
+
+    def _weight(self, queue: str) -> int:
+        return max(self.weights.get(queue, 1), 1)
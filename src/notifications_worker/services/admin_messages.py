@@ -0,0 +1,71 @@
+import logging
+import time
+
+import redis
+
+from notifications_worker.infra.redis.client import get_redis
+from notifications_worker.infra.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_DAY = 24 * 60 * 60
+
+
+def get_admin_message_id(chat_id: int, thread_id: int | None, order_id: str) -> int | None:
+    """message_id of the admin message posted for the order, if still remembered."""
+    keys = [_key(chat_id, thread_id, day) for day in _days()]
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in keys:
+            pipe.hget(key, order_id)
+        values = pipe.execute()
+    except redis.RedisError:
+        logger.warning("Admin messages: Redis unavailable, order %s", order_id)
+        return None
+
+    for value in values:
+        if value is not None:
+            return int(value)
+    return None
+
+
+def save_admin_message_id(
+    chat_id: int,
+    thread_id: int | None,
+    order_id: str,
+    message_id: int,
+) -> None:
+    """
+    Remember the admin message of the order.
+
+    Entries are kept in one hash per chat/thread and day, so they expire after
+    admin_message_ttl_days without per-field TTLs and the hashes stay compact.
+    """
+    key = _key(chat_id, thread_id, _days()[0])
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, order_id, message_id)
+        pipe.expire(key, settings.admin_message_ttl_days * _DAY + _DAY)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Admin messages: failed to save message_id for order %s", order_id)
+
+
+def forget_admin_message_id(chat_id: int, thread_id: int | None, order_id: str) -> None:
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for day in _days():
+            pipe.hdel(_key(chat_id, thread_id, day), order_id)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Admin messages: failed to forget message_id for order %s", order_id)
+
+
+def _days() -> list[int]:
+    """Day buckets to look into, newest first."""
+    today = int(time.time()) // _DAY
+    return [today - i for i in range(settings.admin_message_ttl_days)]
+
+
+def _key(chat_id: int, thread_id: int | None, day: int) -> str:
+    return f"tg:admin_msg:{chat_id}:{thread_id or 0}:{day}"
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+from collections.abc import Coroutine
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram.api import ReplyMarkup
+from notifications_worker.infra.telegram.async_client import AsyncTelegramClient
+
+T = TypeVar("T")
+
+
+class AsyncNotificationEngine:
+    """
+    Per-process asyncio loop that performs all Telegram I/O in async mode.
+
+    The loop runs in a daemon thread and is started on first use (so after the
+    worker forks). Celery tasks running on the thread pool hand their requests
+    over with run() and wait for the result; the loop keeps hundreds of them in
+    flight at once, bounded by notifications_async_concurrency.
+    """
+
+    def __init__(self, concurrency: int) -> None:
+        self._concurrency = concurrency
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pid: int | None = None
+        self.telegram = EngineTelegramClient(self)
+        self._async_telegram: AsyncTelegramClient | None = None
+
+    @property
+    def async_telegram(self) -> AsyncTelegramClient:
+        self._ensure_started()
+        assert self._async_telegram is not None
+        return self._async_telegram
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        return self.submit(coro).result()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # A loop inherited through fork has no thread behind it
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="notifications-async-engine",
+                    daemon=True,
+                )
+                thread.start()
+                self._loop = loop
+                self._pid = os.getpid()
+                self._async_telegram = AsyncTelegramClient(max_in_flight=self._concurrency)
+            return self._loop
+
+
+class EngineTelegramClient:
+    """Blocking facade with the TelegramClient interface, executed on the engine loop."""
+
+    def __init__(self, engine: AsyncNotificationEngine) -> None:
+        self._engine = engine
+
+    def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        thread_id: int | None = None,
+        reply_markup: ReplyMarkup | None = None,
+        parse_mode: str | None = "HTML",
+        disable_web_page_preview: bool = True,
+    ) -> int | None:
+        return self._engine.run(
+            self._engine.async_telegram.send_message(
+                chat_id,
+                text,
+                thread_id=thread_id,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+                disable_web_page_preview=disable_web_page_preview,
+            )
+        )
+
+    def edit_message_text(
+        self,
+        chat_id: int,
+        message_id: int,
+        text: str,
+        *,
+        reply_markup: ReplyMarkup | None = None,
+        parse_mode: str | None = "HTML",
+        disable_web_page_preview: bool = True,
+    ) -> None:
+        self._engine.run(
+            self._engine.async_telegram.edit_message_text(
+                chat_id,
+                message_id,
+                text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+                disable_web_page_preview=disable_web_page_preview,
+            )
+        )
+
+
+async_engine = AsyncNotificationEngine(settings.notifications_async_concurrency)
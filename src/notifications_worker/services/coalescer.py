@@ -0,0 +1,41 @@
+import logging
+
+import redis
+
+from notifications_worker.infra.redis.client import get_redis
+from notifications_worker.infra.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def register_update(recipient: str, order_id: str) -> int | None:
+    """
+    Register a status update for (order, recipient) and return its sequence token.
+
+    The send is deferred by the coalescing window; when it runs, only the update
+    holding the latest token is sent. Returns None if Redis is unavailable —
+    the caller should then send right away.
+    """
+    key = _key(recipient, order_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, int(settings.notifications_coalesce_window_seconds * 10) + 60)
+        token, _ = pipe.execute()
+    except redis.RedisError:
+        logger.warning("Coalescer: Redis unavailable, sending order %s without delay", order_id)
+        return None
+    return int(token)
+
+
+def is_latest(recipient: str, order_id: str, token: int) -> bool:
+    """True if no newer update for (order, recipient) was registered after token."""
+    try:
+        current = get_redis().get(_key(recipient, order_id))
+    except redis.RedisError:
+        return True
+    return current is None or int(current) == token
+
+
+def _key(recipient: str, order_id: str) -> str:
+    return f"coalesce:{recipient}:{order_id}"
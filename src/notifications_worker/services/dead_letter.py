@@ -0,0 +1,52 @@
+import json
+import logging
+import time
+from typing import Any
+
+import redis
+
+from notifications_worker.infra.redis.client import get_redis
+from notifications_worker.infra.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def record_dead_letter(
+    *,
+    task_name: str | None,
+    task_id: str | None,
+    payload: Any,
+    reason: str,
+    exc: BaseException,
+    retries: int,
+) -> None:
+    """
+    Put a task that will not be retried anymore into the dead-letter list in Redis.
+
+    Newest entries first; the list is capped at dead_letter_max_length.
+    """
+    entry = json.dumps(
+        {
+            "task_name": task_name,
+            "task_id": task_id,
+            "payload": payload,
+            "reason": reason,
+            "error": repr(exc),
+            "retries": retries,
+            "failed_at": time.time(),
+        },
+        ensure_ascii=False,
+        default=str,
+    )
+
+    logger.error("Task %s[%s] dead-lettered: %s (%r)", task_name, task_id, reason, exc)
+
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lpush(settings.dead_letter_key, entry)
+        pipe.ltrim(settings.dead_letter_key, 0, settings.dead_letter_max_length - 1)
+        pipe.execute()
+    except redis.RedisError:
+        logger.error(
+            "Failed to write dead letter for task %s[%s]", task_name, task_id, exc_info=True
+        )
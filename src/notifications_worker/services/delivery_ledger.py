@@ -0,0 +1,40 @@
+import logging
+
+import redis
+
+from notifications_worker.domain.entities import NotificationsOrderEntity
+from notifications_worker.infra.redis.client import get_redis
+from notifications_worker.infra.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def is_delivered(entity: NotificationsOrderEntity, recipient: str) -> bool:
+    """
+    True if this status change was already delivered to the recipient
+    (redelivered message, retry after a send that actually succeeded).
+    """
+    try:
+        return bool(get_redis().exists(_key(entity, recipient)))
+    except redis.RedisError:
+        logger.warning("Delivery ledger: Redis unavailable, order %s", entity.order_id)
+        return False
+
+
+def mark_delivered(entity: NotificationsOrderEntity, recipient: str) -> None:
+    """Record a successful delivery. Call only after Telegram accepted the message."""
+    try:
+        get_redis().set(
+            _key(entity, recipient),
+            1,
+            nx=True,
+            ex=settings.delivery_ledger_ttl_seconds,
+        )
+    except redis.RedisError:
+        logger.warning(
+            "Delivery ledger: failed to record order %s -> %s", entity.order_id, recipient
+        )
+
+
+def _key(entity: NotificationsOrderEntity, recipient: str) -> str:
+    return f"ledger:{entity.order_id}:{entity.old_status}:{entity.new_status}:{recipient}"
@@ -1,41 +1,136 @@
-from typing import Any
+import logging
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal
 
 from notifications_worker.domain.entities import NotificationsOrderEntity
 from notifications_worker.infra.settings import settings
-from notifications_worker.infra.telegram.client import tg
-from notifications_worker.infra.telegram.errors import TelegramNonRetryableError
+from notifications_worker.infra.telegram.client import TelegramClient, get_telegram_client
+from notifications_worker.infra.telegram.errors import (
+    TelegramBadRequest,
+    TelegramNonRetryableError,
+    TelegramNotFound,
+)
+from notifications_worker.services.admin_messages import (
+    forget_admin_message_id,
+    get_admin_message_id,
+    save_admin_message_id,
+)
 from notifications_worker.services.templates import (
     render_order_message_admin,
+    render_order_message_admin_with_status,
     notify_new_order_user,
     notify_update_status_order_user,
     notify_update_status_order_admin
 )
-from notifications_worker.infra.telegram.keyboards import order_actions, admin_order_details_button
+from notifications_worker.infra.telegram.keyboards import (
+    admin_order_details_button_json,
+    order_actions_json,
+)
+from notifications_worker.services.async_engine import EngineTelegramClient, async_engine
+from notifications_worker.services.delivery_ledger import is_delivered, mark_delivered
+
+logger = logging.getLogger(__name__)
+
+Recipient = Literal["admin", "user"]
+
+_fanout_pool = ThreadPoolExecutor(
+    max_workers=settings.notifications_fanout_workers,
+    thread_name_prefix="notifications-fanout",
+)
 
 
 def dispatch_order_notification_admin(entity: NotificationsOrderEntity) -> None:
     admin_chat_id = settings.admin_chat_id
     admin_thread_id = entity.thread_id
+    recipient = f"admin:{admin_chat_id}"
+
+    if is_delivered(entity, recipient):
+        logger.info("Order %s admin notification already delivered, skipped", entity.order_id)
+        return
+
+    if settings.admin_message_edit_enabled and not _is_new_order(entity):
+        if _edit_admin(admin_chat_id, admin_thread_id, entity):
+            mark_delivered(entity, recipient)
+            return
+
     admin_text, reply_markup = _render_admin_message_and_markup(entity)
-    _send_admin(admin_chat_id, admin_text, thread_id=admin_thread_id, reply_markup=reply_markup)
+    message_id = _send_admin(
+        admin_chat_id, admin_text, thread_id=admin_thread_id, reply_markup=reply_markup
+    )
+
+    mark_delivered(entity, recipient)
+
+    if settings.admin_message_edit_enabled and message_id is not None:
+        save_admin_message_id(admin_chat_id, admin_thread_id, entity.order_id, message_id)
 
 
 def dispatch_order_notification_user(entity: NotificationsOrderEntity) -> None:
+    """Best effort: a user who blocked the bot (or never started it) is skipped."""
+    try:
+        _deliver_order_notification_user(entity)
+    except TelegramNonRetryableError as exc:
+        logger.info(
+            "User notification skipped (non-retryable): %s chat_id=%s", exc, entity.telegram_id
+        )
+
+
+def _deliver_order_notification_user(entity: NotificationsOrderEntity) -> None:
+    """dispatch_order_notification_user that raises non-retryable errors too."""
     if not entity.telegram_id:
         return
 
+    recipient = f"user:{entity.telegram_id}"
+    if is_delivered(entity, recipient):
+        logger.info("Order %s user notification already delivered, skipped", entity.order_id)
+        return
+
     user_text, reply_markup = _render_user_message_and_markup(entity)
+    _send_user_best_effort(chat_id=entity.telegram_id, text=user_text, reply_markup=reply_markup)
 
-    try:
-        _send_user_best_effort(chat_id=entity.telegram_id, text=user_text, reply_markup=reply_markup)
-    except TelegramNonRetryableError as exc:
-        print("User notification skipped (non-retryable): %s chat_id=%s", exc, entity.telegram_id)
-        return
+    mark_delivered(entity, recipient)
+
+
+def dispatch_order_notifications(
+    entity: NotificationsOrderEntity,
+    recipients: Sequence[Recipient] = ("admin", "user"),
+) -> dict[Recipient, Exception | None]:
+    """
+    Send one order notification to several recipients in parallel.
+
+    Never raises: returns the error per recipient (None = delivered), non-retryable
+    ones included, so the caller can retry only the recipients that failed and
+    report the ones that will never get the message.
+    """
+    return dispatch_order_notifications_many([entity], recipients)[0]
+
+
+def dispatch_order_notifications_many(
+    entities: Sequence[NotificationsOrderEntity],
+    recipients: Sequence[Recipient] = ("admin", "user"),
+) -> list[dict[Recipient, Exception | None]]:
+    """Same as dispatch_order_notifications for many orders at once, all sends in parallel."""
+    futures = [
+        {r: _fanout_pool.submit(_DISPATCHERS[r], entity) for r in recipients}
+        for entity in entities
+    ]
+
+    results: list[dict[Recipient, Exception | None]] = []
+    for per_entity in futures:
+        outcome: dict[Recipient, Exception | None] = {}
+        for recipient, future in per_entity.items():
+            try:
+                future.result()
+                outcome[recipient] = None
+            except Exception as exc:
+                outcome[recipient] = exc
+        results.append(outcome)
+    return results
 
 
 def _render_admin_message_and_markup(
         e: NotificationsOrderEntity,
-) -> tuple[str, dict[str, Any] | None]:
+) -> tuple[str, bytes | None]:
     """
     Chooses admin text depending on status change.
     Adds inline keyboard if available.
@@ -45,15 +140,12 @@ def _render_admin_message_and_markup(
     else:
         text = notify_update_status_order_admin(e)
 
-    kb = admin_order_details_button(e.order_id)
-    reply_markup = kb.to_dict() if hasattr(kb, "to_dict") else kb
-
-    return text, reply_markup
+    return text, admin_order_details_button_json(e.order_id)
 
 
 def _render_user_message_and_markup(
     e: NotificationsOrderEntity,
-) -> tuple[str, dict[str, Any] | None]:
+) -> tuple[str, bytes | None]:
     """
     Chooses user text depending on status change.
     Adds inline keyboard if available.
@@ -63,10 +155,11 @@ def _render_user_message_and_markup(
     else:
         text = notify_update_status_order_user(e)
 
-    kb = order_actions(e.order_id)
-    reply_markup = kb.to_dict() if hasattr(kb, "to_dict") else kb
+    return text, order_actions_json(e.order_id)
+
 
-    return text, reply_markup
+def is_status_update(e: NotificationsOrderEntity) -> bool:
+    return not _is_new_order(e)
 
 
 def _is_new_order(e: NotificationsOrderEntity) -> bool:
@@ -74,11 +167,49 @@ def _is_new_order(e: NotificationsOrderEntity) -> bool:
     return (e.old_status == "created") and (e.new_status == "created")
 
 
-def _send_admin(chat_id: int, text: str, *, thread_id: int | None, reply_markup: dict[str, Any] | None) -> None:
+def _edit_admin(chat_id: int, thread_id: int | None, e: NotificationsOrderEntity) -> bool:
+    """
+    Show the new status in the admin message already posted for the order.
+    Returns False if there is no message to edit (never posted, forgotten or deleted).
+    """
+    message_id = get_admin_message_id(chat_id, thread_id, e.order_id)
+    if message_id is None:
+        return False
+
+    text = render_order_message_admin_with_status(e)
+    reply_markup = admin_order_details_button_json(e.order_id)
+
+    try:
+        _telegram().edit_message_text(chat_id, message_id, text, reply_markup=reply_markup)
+    except TelegramBadRequest as exc:
+        description = exc.description.lower()
+        if "message is not modified" in description:
+            return True
+        if not any(reason in description for reason in _MESSAGE_GONE):
+            raise
+        forget_admin_message_id(chat_id, thread_id, e.order_id)
+        return False
+    except TelegramNotFound:
+        forget_admin_message_id(chat_id, thread_id, e.order_id)
+        return False
+
+    return True
+
+
+_MESSAGE_GONE = ("message to edit not found", "message can't be edited")
+
+
+def _send_admin(
+    chat_id: int,
+    text: str,
+    *,
+    thread_id: int | None,
+    reply_markup: bytes | None,
+) -> int | None:
     """
     Admin is required.
     """
-    tg.send_message(
+    return _telegram().send_message(
         chat_id=chat_id,
         text=text,
         thread_id=thread_id,
@@ -87,13 +218,25 @@ def _send_admin(chat_id: int, text: str, *, thread_id: int | None, reply_markup:
     )
 
 
-def _send_user_best_effort(chat_id: int, text: str, *, reply_markup: dict[str, Any] | None) -> None:
+def _send_user_best_effort(chat_id: int, text: str, *, reply_markup: bytes | None) -> None:
     """
     User is required.
     """
-    tg.send_message(
+    _telegram().send_message(
         chat_id=chat_id,
         text=text,
         parse_mode="HTML",
         reply_markup=reply_markup,
     )
+
+
+def _telegram() -> TelegramClient | EngineTelegramClient:
+    if settings.notifications_engine == "async":
+        return async_engine.telegram
+    return get_telegram_client()
+
+
+_DISPATCHERS: dict[Recipient, Callable[[NotificationsOrderEntity], None]] = {
+    "admin": dispatch_order_notification_admin,
+    "user": _deliver_order_notification_user,
+}
@@ -1,28 +1,83 @@
 import logging
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from io import BytesIO
+from typing import BinaryIO
+
+from pydantic import BaseModel
 
 from notifications_worker.domain.entities import ImageVariantResult
+from notifications_worker.domain.variants import VariantTarget, variant_targets
+from notifications_worker.infra import metrics
 from notifications_worker.infra.cloudinary.client import (
-    VARIANTS_CONFIG,
     delete_from_cloudinary,
-    download_variant,
     fetch_and_transform,
     parse_eager_results,
+    pending_variants,
+    stream_variant,
+    submit_transform,
+    variant_byte_size,
+    variant_url,
+)
+from notifications_worker.infra.imaging.geometry import limit_size
+from notifications_worker.infra.imaging.local import (
+    RenderedVariant,
+    pillow_available,
+    pillow_formats,
+    render_variants_in_pool,
 )
+from notifications_worker.infra.s3.client import get_s3_client
+from notifications_worker.infra.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Получатель потока варианта (stream, storage_key): загрузка в S3 и т.п.
+# Поток нужно дочитать до конца — по нему считается byte_size.
+VariantSink = Callable[[BinaryIO, str], None]
+
+# Движок вариантов: (original_url, original_key, product_id, image_id, sink, variants)
+# -> метаданные созданных вариантов
+VariantEngine = Callable[[str, str, str, int, VariantSink, Sequence[str]], list[ImageVariantResult]]
+
+# URL файла варианта в Cloudinary CDN с заданным качеством
+VariantUrl = Callable[[int], str]
+
+
+def process_image(
+    original_url: str,
+    original_key: str,
+    product_id: str,
+    image_id: int,
+    sink: VariantSink,
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> list[ImageVariantResult]:
+    """Создать варианты (все или только `variants`) движком из settings.images_engine."""
+    return _engine()(original_url, original_key, product_id, image_id, sink, variants)
+
+
+def engine_formats() -> set[str] | None:
+    """Форматы вариантов, которые умеет движок из settings.images_engine; None — все."""
+    if _engine() is process_image_locally:
+        return pillow_formats()
+    return None
+
 
 def process_image_with_cloudinary(
     original_url: str,
     original_key: str,
     product_id: str,
     image_id: int,
-) -> list[tuple[bytes, ImageVariantResult]]:
+    sink: VariantSink,
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> list[ImageVariantResult]:
     """
     Обработать изображение через Cloudinary.
 
     1. Cloudinary скачивает оригинал по URL и создаёт варианты
-    2. Worker скачивает готовые варианты из Cloudinary CDN
+    2. Каждый вариант независимо проходит конвейер: поток из Cloudinary CDN → sink,
+       без буферизации файла целиком (до images_pipeline_concurrency вариантов параллельно)
     3. Удаляет временное изображение из Cloudinary
 
     Args:
@@ -30,16 +85,25 @@ def process_image_with_cloudinary(
         original_key: Ключ S3 для формирования путей вариантов
         product_id: ID продукта
         image_id: ID изображения
+        sink: Вызывается для каждого варианта с потоком его содержимого (из потока пула)
+        variants: Какие файлы вариантов создать (ключи variant_targets: "thumb.webp", ...)
+
+    Файл, не уложившийся в max_bytes своего варианта, берётся из CDN с качеством ниже
+    (шагами images_quality_step, не ниже images_min_quality) — Cloudinary делает такие
+    трансформации на лету; размер проверяется HEAD-запросом до переноса.
 
     Returns:
-        Список кортежей (данные_варианта, метаданные)
+        Метаданные обработанных вариантов в порядке variants
+
+    Raises:
+        Первую ошибку любого этапа любого варианта (остальные варианты дорабатывают)
     """
-    public_id = f"temp/leaf-flow/{product_id}/{image_id}"
+    public_id = _temp_public_id(product_id, image_id)
 
     try:
         # 1. Cloudinary fetch + transform
         logger.info("Processing image via Cloudinary: %s", original_url)
-        upload_result = fetch_and_transform(original_url, public_id)
+        upload_result = fetch_and_transform(original_url, public_id, variants)
 
         eager = upload_result.get("eager")
         if not eager or not isinstance(eager, list):
@@ -47,47 +111,272 @@ def process_image_with_cloudinary(
             raise ValueError(msg)
 
         # 2. Парсим результаты
-        eager_results = parse_eager_results(eager)
-
-        # 3. Скачиваем каждый вариант из Cloudinary CDN
-        results: list[tuple[bytes, ImageVariantResult]] = []
+        eager_results = parse_eager_results(eager, variants)
+        version = upload_result["version"]
 
-        # Извлекаем базовый путь из original_key
-        # public/products/pu-erh/123/original.jpg -> public/products/pu-erh/123
-        base_path = "/".join(original_key.rsplit("/", 1)[:-1])
-
-        for variant_name in VARIANTS_CONFIG:
+        variant_names = []
+        for variant_name in variants:
             if variant_name not in eager_results:
                 logger.warning("Variant %s not in eager results", variant_name)
                 continue
+            variant_names.append(variant_name)
 
-            variant_info = eager_results[variant_name]
+        # 3. Конвейер по вариантам
+        with _pipeline(image_id) as pool:
+            futures = [
+                pool.submit(
+                    _process_variant,
+                    image_id,
+                    variant_targets()[variant_name],
+                    _url_builder(public_id, version, variant_name),  # type: ignore[arg-type]
+                    eager_results[variant_name],
+                    variant_storage_key(original_key, variant_name),
+                    sink,
+                )
+                for variant_name in variant_names
+            ]
+            return [future.result() for future in futures]
 
-            logger.info("Downloading %s from Cloudinary CDN", variant_name)
-            variant_data = download_variant(str(variant_info["url"]))
+    finally:
+        # 4. Удаляем из Cloudinary (освобождаем квоту)
+        delete_from_cloudinary(public_id)
 
-            storage_key = f"{base_path}/{variant_name}.webp"
 
-            meta = ImageVariantResult(
-                variant=variant_name,
-                storage_key=storage_key,
-                format="webp",
-                width=int(variant_info["width"]),  # type: ignore[arg-type]
-                height=int(variant_info["height"]),  # type: ignore[arg-type]
-                byte_size=len(variant_data),
-            )
+def process_image_locally(
+    original_url: str,
+    original_key: str,
+    product_id: str,
+    image_id: int,
+    sink: VariantSink,
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> list[ImageVariantResult]:
+    """
+    Обработать изображение в воркере (Pillow), без Cloudinary.
 
-            results.append((variant_data, meta))
-            logger.info(
-                "Prepared %s: %dx%d, %d bytes",
-                variant_name,
-                meta.width,
-                meta.height,
-                meta.byte_size,
+    1. Скачивает оригинал из S3
+    2. Делает все варианты за одно декодирование (в пуле процессов, см. render_variants)
+    3. Передаёт варианты в sink (до images_pipeline_concurrency параллельно)
+
+    Аргументы и результат — как у process_image_with_cloudinary.
+    """
+    logger.info("Processing image locally: %s", original_key)
+    original = get_s3_client().download(original_key)
+    targets = [variant_targets()[name] for name in variants]
+    rendered = render_variants_in_pool(original, targets)
+
+    with _pipeline(image_id) as pool:
+        futures = [
+            pool.submit(
+                _store_rendered_variant,
+                image_id,
+                target,
+                variant,
+                variant_storage_key(original_key, variant.key),
+                sink,
             )
+            for target, variant in zip(targets, rendered, strict=True)
+        ]
+        return [future.result() for future in futures]
 
-        return results
 
-    finally:
-        # 4. Удаляем из Cloudinary (освобождаем квоту)
-        delete_from_cloudinary(public_id)
+class CloudinaryTransform(BaseModel):
+    """Eager transformations, запущенные в Cloudinary; передаётся между стадиями задачи."""
+
+    public_id: str
+    version: int | str
+    # Размеры оригинала
+    width: int
+    height: int
+    variants: list[str]
+    submitted_at: float
+
+
+def start_cloudinary_transform(
+    original_url: str,
+    product_id: str,
+    image_id: int,
+    variants: Sequence[str] = tuple(variant_targets()),
+) -> CloudinaryTransform:
+    """
+    Стадия 1 поэтапной обработки: загрузить оригинал в Cloudinary и запустить
+    eager transformations в фоне, не дожидаясь их.
+    """
+    public_id = _temp_public_id(product_id, image_id)
+    result = submit_transform(original_url, public_id, variants)
+    return CloudinaryTransform(
+        public_id=public_id,
+        version=result["version"],  # type: ignore[arg-type]
+        width=result["width"],  # type: ignore[arg-type]
+        height=result["height"],  # type: ignore[arg-type]
+        variants=list(variants),
+        submitted_at=time.time(),
+    )
+
+
+def pending_cloudinary_variants(transform: CloudinaryTransform) -> list[str]:
+    """Стадия 2: варианты, которые Cloudinary ещё не сделал."""
+    return pending_variants(transform.public_id, transform.variants)
+
+
+def transfer_cloudinary_variant(
+    image_id: int,
+    transform: CloudinaryTransform,
+    variant: str,
+    original_key: str,
+    sink: VariantSink,
+) -> ImageVariantResult:
+    """
+    Стадия 3: перенести готовый вариант из Cloudinary CDN в sink.
+
+    Размеры варианта считаются по размерам оригинала так же, как crop=limit в Cloudinary.
+    Бюджет max_bytes — как в process_image_with_cloudinary.
+    """
+    target = variant_targets()[variant]
+    width, height = limit_size((transform.width, transform.height), target.width, target.height)
+    return _process_variant(
+        image_id,
+        target,
+        _url_builder(transform.public_id, transform.version, variant),
+        {"width": width, "height": height},
+        variant_storage_key(original_key, variant),
+        sink,
+    )
+
+
+def discard_cloudinary_transform(public_id: str) -> None:
+    """Стадия 4 (и обработка ошибок): удалить временное изображение из Cloudinary."""
+    delete_from_cloudinary(public_id)
+
+
+def variant_storage_key(original_key: str, variant: str) -> str:
+    """
+    Ключ файла варианта рядом с оригиналом:
+    public/products/pu-erh/123/original.jpg, thumb.webp -> public/products/pu-erh/123/thumb.webp
+    """
+    base_path = "/".join(original_key.rsplit("/", 1)[:-1])
+    return f"{base_path}/{variant}"
+
+
+@cache
+def _engine() -> VariantEngine:
+    if settings.images_engine == "local":
+        if pillow_available():
+            return process_image_locally
+        logger.warning("IMAGES_ENGINE=local but Pillow is not installed, using Cloudinary")
+    return process_image_with_cloudinary
+
+
+def _temp_public_id(product_id: str, image_id: int) -> str:
+    return f"temp/leaf-flow/{product_id}/{image_id}"
+
+
+def _url_builder(public_id: str, version: int | str, variant: str) -> VariantUrl:
+    def build(quality: int) -> str:
+        return variant_url(public_id, version, variant, quality)
+
+    return build
+
+
+def _pipeline(image_id: int) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=max(1, settings.images_pipeline_concurrency),
+        thread_name_prefix=f"image-{image_id}",
+    )
+
+
+def _store_rendered_variant(
+    image_id: int,
+    target: VariantTarget,
+    variant: RenderedVariant,
+    storage_key: str,
+    sink: VariantSink,
+) -> ImageVariantResult:
+    try:
+        sink(BytesIO(variant.data), storage_key)
+    except Exception:
+        logger.error("[image_id=%d] Variant %s failed at store stage", image_id, variant.key)
+        raise
+
+    metrics.VARIANT_BYTES.labels(target.variant, target.format).inc(len(variant.data))
+
+    logger.info(
+        "Stored %s: %dx%d, %d bytes, q%d",
+        variant.key,
+        variant.width,
+        variant.height,
+        len(variant.data),
+        variant.quality,
+    )
+    return ImageVariantResult(
+        variant=target.variant,
+        storage_key=storage_key,
+        format=target.format,
+        width=variant.width,
+        height=variant.height,
+        byte_size=len(variant.data),
+        quality=variant.quality,
+    )
+
+
+def _process_variant(
+    image_id: int,
+    target: VariantTarget,
+    url_for: VariantUrl,
+    variant_info: dict[str, object],
+    storage_key: str,
+    sink: VariantSink,
+) -> ImageVariantResult:
+    try:
+        quality = _quality_within_budget(target, url_for)
+        logger.info("Streaming %s from Cloudinary CDN", target.key)
+        with stream_variant(url_for(quality)) as stream:
+            sink(stream, storage_key)  # type: ignore[arg-type]
+            byte_size = stream.bytes_read
+        metrics.VARIANT_BYTES.labels(target.variant, target.format).inc(byte_size)
+
+        meta = ImageVariantResult(
+            variant=target.variant,
+            storage_key=storage_key,
+            format=target.format,
+            width=int(variant_info["width"]),  # type: ignore[arg-type]
+            height=int(variant_info["height"]),  # type: ignore[arg-type]
+            byte_size=byte_size,
+            quality=quality,
+        )
+        logger.info(
+            "Stored %s: %dx%d, %d bytes, q%d",
+            target.key,
+            meta.width,
+            meta.height,
+            meta.byte_size,
+            quality,
+        )
+        return meta
+
+    except Exception:
+        logger.error("[image_id=%d] Variant %s failed at transfer stage", image_id, target.key)
+        raise
+
+
+def _quality_within_budget(target: VariantTarget, url_for: VariantUrl) -> int:
+    """
+    Наибольшее качество (шагами вниз от target.quality), при котором файл в CDN
+    укладывается в target.max_bytes; если не укладывается и при минимальном — минимальное.
+    """
+    quality = target.quality
+    if target.max_bytes is None:
+        return quality
+
+    step = max(1, settings.images_quality_step)
+    while quality > settings.images_min_quality:
+        size = variant_byte_size(url_for(quality))
+        if size is None or size <= target.max_bytes:
+            return quality
+        quality = max(settings.images_min_quality, quality - step)
+
+    size = variant_byte_size(url_for(quality))
+    if size is not None and size > target.max_bytes:
+        logger.warning(
+            "%s does not fit %d bytes even at quality %d", target.key, target.max_bytes, quality
+        )
+    return quality
@@ -0,0 +1,116 @@
+import random
+from dataclasses import dataclass
+from typing import Any, NoReturn
+
+from celery import Task
+from celery.exceptions import Retry
+from pydantic import ValidationError
+
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram.errors import (
+    TelegramAPIError,
+    TelegramNonRetryableError,
+    TelegramRateLimitDeferred,
+    TelegramRateLimited,
+    TelegramRetryableError,
+)
+from notifications_worker.services.dead_letter import record_dead_letter
+
+
+@dataclass(frozen=True, slots=True)
+class RetryDecision:
+    retry: bool
+    countdown: float = 0.0
+    reason: str = ""
+
+
+def decide_retry(exc: BaseException, retries: int) -> RetryDecision:
+    """
+    Map an exception to a retry strategy.
+
+    - 429: wait exactly retry_after (plus jitter)
+    - our own rate limiter refused to wait: the same, it is not a failure
+    - 5xx / transport: exponential backoff
+    - 4xx / broken payload: no retry
+    """
+    if isinstance(exc, TelegramRateLimitDeferred):
+        countdown = _rate_limited_countdown(exc.retry_after)
+        return RetryDecision(True, countdown, "rate_limit_deferred")
+
+    if isinstance(exc, TelegramRateLimited):
+        countdown = _rate_limited_countdown(exc.retry_after)
+        return RetryDecision(True, countdown, "telegram_rate_limited")
+
+    if isinstance(exc, TelegramRetryableError):
+        return RetryDecision(True, _exponential_countdown(retries), type(exc).__name__)
+
+    if isinstance(exc, TelegramNonRetryableError):
+        return RetryDecision(False, reason=type(exc).__name__)
+
+    if isinstance(exc, TelegramAPIError):
+        # HTTP 200 with ok=false: trust error_code
+        if exc.error_code == 429:
+            countdown = _rate_limited_countdown((exc.parameters or {}).get("retry_after"))
+            return RetryDecision(True, countdown, "telegram_rate_limited")
+        if exc.error_code is not None and exc.error_code >= 500:
+            return RetryDecision(True, _exponential_countdown(retries), "telegram_api_error")
+        return RetryDecision(False, reason="telegram_api_error")
+
+    if isinstance(exc, ValidationError):
+        # контракт сломан
+        return RetryDecision(False, reason="invalid_payload")
+
+    return RetryDecision(True, _exponential_countdown(retries), type(exc).__name__)
+
+
+def retry_or_dead_letter(task: Task, payload: Any, exc: Exception) -> NoReturn:
+    """
+    Retry the running task according to decide_retry, or move it to the dead-letter
+    queue if the error is permanent or retries are exhausted (then re-raise).
+
+    Deferrals by our own rate limiter do not count against max_retries: Telegram never
+    saw the request, and a burst of new orders must not exhaust the admin alerts' retries.
+    """
+    retries = task.request.retries
+    decision = decide_retry(exc, retries)
+
+    if isinstance(exc, TelegramRateLimitDeferred):
+        raise _defer(task, exc, decision.countdown)
+
+    if decision.retry and (task.max_retries is None or retries < task.max_retries):
+        raise task.retry(exc=exc, countdown=decision.countdown)
+
+    reason = decision.reason if not decision.retry else f"max_retries_exceeded:{decision.reason}"
+    record_dead_letter(
+        task_name=task.name,
+        task_id=task.request.id,
+        payload=payload,
+        reason=reason,
+        exc=exc,
+        retries=retries,
+    )
+    raise exc
+
+
+def _defer(task: Task, exc: Exception, countdown: float) -> Retry:
+    """Like task.retry(), but the re-sent task keeps the current retries count."""
+    request = task.request
+    task.signature_from_request(request, countdown=countdown, retries=request.retries).apply_async()
+    return Retry(exc=exc, when=countdown)
+
+
+def _rate_limited_countdown(retry_after: Any) -> float:
+    try:
+        base = float(retry_after)
+    except (TypeError, ValueError):
+        base = settings.retry_rate_limited_default_seconds
+    return base + random.uniform(0, settings.retry_jitter_seconds)
+
+
+def _exponential_countdown(retries: int) -> float:
+    delay = min(
+        settings.retry_backoff_max_seconds,
+        settings.retry_backoff_base_seconds * 2.0**retries,
+    )
+    # Jitter spreads retries of a burst so they don't hit Telegram together
+    return delay + random.uniform(0, settings.retry_jitter_seconds)
@@ -1,89 +1,108 @@
+from html import escape
+
 from notifications_worker.domain.entities import NotificationsOrderEntity
 
+_STATUS_EMOJI = {
+    "created": "🆕",
+    "processing": "⏳",
+    "paid": "💰",
+    "fulfilled": "✅",
+    "cancelled": "❌",
+}
+
+_STATUS_TEXT = {
+    "created": "Создан",
+    "processing": "В обработке",
+    "paid": "Оплачен",
+    "fulfilled": "Выполнен",
+    "cancelled": "Отменён",
+}
+
+_DELIVERY_TEXT = {
+    "courier": "Курьер",
+    "pickup": "Самовывоз",
+}
+
+_COMMENT_SEPARATOR = "━━━━━━━━━━━━━━━━━━━━"
+
+_USER_NEW_ORDER_TEXT = (
+    "В ближайшее время с вами свяжется оператор. Если у вас возникнут вопросы, "
+    "вы можете написать нам, нажав соответствующую кнопку ниже."
+)
+
+
+def _html(value: str) -> str:
+    """Экранирование пользовательских полей для parse_mode=HTML (без копии, если не нужно)"""
+    if "&" in value or "<" in value or ">" in value:
+        return escape(value, quote=False)
+    return value
+
 
 def _status_emoji_emoji(status: str | None) -> str:
     """Возвращает эмодзи для статуса заказа"""
-    mapping = {
-        "created": "🆕",
-        "processing": "⏳",
-        "paid": "💰",
-        "fulfilled": "✅",
-        "cancelled": "❌"
-    }
-    return mapping.get(status or "", "📋")
+    return _STATUS_EMOJI.get(status or "", "📋")
 
 
 def _human_status(status: str | None) -> str:
-    mapping = {
-        "created": "Создан",
-        "processing": "В обработке",
-        "paid": "Оплачен",
-        "fulfilled": "Выполнен",
-        "cancelled": "Отменён"
-    }
-    return mapping.get(status or "", status or "Неизвестно")
+    return _STATUS_TEXT.get(status or "", status or "Неизвестно")
 
 
 def _human_delivery(delivery_method: str | None) -> str:
     """Возвращает человеко-читаемый текст для способа доставки"""
-    mapping = {
-        "courier": "Курьер",
-        "pickup": "Самовывоз"
-    }
-    return mapping.get(delivery_method or "", delivery_method or "Не указан")
+    return _DELIVERY_TEXT.get(delivery_method or "", delivery_method or "Не указан")
 
 
 def render_order_message_admin(e: NotificationsOrderEntity) -> str:
-    delivery_method = _human_delivery(e.delivery_method)
-
-    lines = [
-        f"<b>Новый заказ</b>\n",
-        f"📦 <b>Заказ #{e.order_id}</b>",
-        f"👤 <b>Клиент:</b> {e.customer_name}",
-        f"📱 <b>Телефон:</b> {e.phone}",
-        f"💰 <b>Сумма:</b> {e.total}",
-        f"🚚 <b>Доставка:</b> {delivery_method}",
-        f"📅 <b>Дата:</b> {e.created_at}"
-    ]
+    return _render_order_card_admin(e, header="<b>Новый заказ</b>")
+
+
+def render_order_message_admin_with_status(e: NotificationsOrderEntity) -> str:
+    """Карточка заказа для админа с текущим статусом (редактируется при смене статуса)"""
+    status_emoji = _status_emoji_emoji(e.new_status)
+    status_text = _html(_human_status(e.new_status))
+    text = _render_order_card_admin(e, header=f"{status_emoji} <b>{status_text}</b>")
+    if e.status_comment:
+        text += f"\n\n💬 <b>Комментарий к статусу:</b>\n{_html(e.status_comment)}"
+    return text
+
+
+def _render_order_card_admin(e: NotificationsOrderEntity, header: str) -> str:
+    text = (
+        f"{header}\n\n"
+        f"📦 <b>Заказ #{_html(e.order_id)}</b>\n"
+        f"👤 <b>Клиент:</b> {_html(e.customer_name)}\n"
+        f"📱 <b>Телефон:</b> {_html(e.phone)}\n"
+        f"💰 <b>Сумма:</b> {e.total}\n"
+        f"🚚 <b>Доставка:</b> {_html(_human_delivery(e.delivery_method))}\n"
+        f"📅 <b>Дата:</b> {_html(e.created_at)}"
+    )
     if e.email:
-        lines.append(f"📧 <b>Email:</b> {e.email}")
+        text += f"\n📧 <b>Email:</b> {_html(e.email)}"
     if e.address:
-        lines.append(f"🗾 <b>Адрес:</b> {e.address}")
+        text += f"\n🗾 <b>Адрес:</b> {_html(e.address)}"
     if e.comment:
-        lines.append("\n━━━━━━━━━━━━━━━━━━━━\n")
-        lines.append(f"💬 <b>Комментарий:</b>\n{e.comment}")
-    return "\n".join(lines)
+        text += f"\n\n{_COMMENT_SEPARATOR}\n\n💬 <b>Комментарий:</b>\n{_html(e.comment)}"
+    return text
 
 
 def notify_update_status_order_admin(e: NotificationsOrderEntity) -> str:
-    status_name = _human_status(e.new_status)
-    lines = [
-        f"✅ <b>Статус заказа обновлён</b>\n",
-        f"📦 Заказ: #{e.order_id}",
-        f"{status_name}",
-    ]
-    return "\n".join(lines)
+    return (
+        f"✅ <b>Статус заказа обновлён</b>\n\n"
+        f"📦 Заказ: #{_html(e.order_id)}\n"
+        f"{_html(_human_status(e.new_status))}"
+    )
 
 
 def notify_new_order_user(e: NotificationsOrderEntity) -> str:
-    lines = [
-        f"✅ <b>Заказ #{e.order_id} создан</b>",
-        "В ближайшее время с вами свяжется оператор. Если у вас возникнут вопросы, "
-        "вы можете написать нам, нажав соответствующую кнопку ниже."
-    ]
-    return "\n".join(lines)
+    return f"✅ <b>Заказ #{_html(e.order_id)} создан</b>\n{_USER_NEW_ORDER_TEXT}"
 
 
 def notify_update_status_order_user(e: NotificationsOrderEntity) -> str:
-    status_emoji = _status_emoji_emoji(e.new_status)
-    status_text = _human_status(e.new_status)
-    lines = [
-        f"🔔 <b>Обновление по заказу #{e.order_id}</b>",
-        f"{status_emoji} <b>Новый статус:</b> {status_text}"
-    ]
-
+    text = (
+        f"🔔 <b>Обновление по заказу #{_html(e.order_id)}</b>\n"
+        f"{_status_emoji_emoji(e.new_status)} <b>Новый статус:</b> "
+        f"{_html(_human_status(e.new_status))}"
+    )
     if e.status_comment:
-        lines.append("")
-        lines.append(f"💬 <b>Комментарий:</b>\n{e.status_comment}")
-
-    return "\n".join(lines)
+        text += f"\n\n💬 <b>Комментарий:</b>\n{_html(e.status_comment)}"
+    return text
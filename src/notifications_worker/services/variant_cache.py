@@ -0,0 +1,117 @@
+import hashlib
+import logging
+from collections.abc import Sequence
+
+import redis
+from pydantic import BaseModel, ValidationError
+
+from notifications_worker.domain.entities import ImageVariantResult
+from notifications_worker.domain.variants import variant_targets
+from notifications_worker.infra.redis.client import get_redis
+from notifications_worker.infra.s3.client import get_s3_client
+from notifications_worker.infra.settings import settings
+from notifications_worker.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_DAY = 24 * 60 * 60
+
+
+class CachedVariant(BaseModel):
+    """Вариант, уже лежащий в S3 для этой версии оригинала."""
+
+    result: ImageVariantResult
+    # Изображение, для которого метаданные варианта уже сохранены в LeafFlow
+    image_id: int
+
+
+def find_cached_variants(original_key: str, source_etag: str) -> dict[str, CachedVariant]:
+    """
+    Варианты, которые не нужно создавать заново.
+
+    Файл варианта годится, если он сделан из оригинала с тем же ETag, по текущей
+    конфигурации из VARIANTS_CONFIG и объект всё ещё есть в S3 (проверяется HEAD-запросом).
+    При недоступном Redis возвращает {} — всё будет создано заново.
+
+    Returns:
+        По ключам variant_targets ("thumb.webp", ...)
+    """
+    if not settings.images_skip_cache_enabled:
+        return {}
+
+    try:
+        entries = get_redis().hgetall(_key(original_key))
+    except redis.RedisError:
+        logger.warning("Variant cache: Redis unavailable, %s", original_key)
+        return {}
+
+    cached: dict[str, CachedVariant] = {}
+    for raw_name, raw_entry in entries.items():
+        name = raw_name.decode() if isinstance(raw_name, bytes) else raw_name
+        if name not in variant_targets():
+            continue
+        try:
+            entry = loads(raw_entry)
+            result = ImageVariantResult.model_validate(entry["result"])
+        except (ValueError, KeyError, TypeError, ValidationError):
+            logger.warning("Variant cache: broken entry %s for %s", name, original_key)
+            continue
+        if entry.get("source") != source_etag or entry.get("config") != config_hash(name):
+            continue
+        if get_s3_client().head(result.storage_key) is None:
+            logger.info("Variant cache: %s is gone from S3", result.storage_key)
+            continue
+        cached[name] = CachedVariant(result=result, image_id=int(entry["image_id"]))
+
+    return cached
+
+
+def remember_variants(
+    original_key: str,
+    source_etag: str,
+    image_id: int,
+    results: Sequence[ImageVariantResult],
+) -> None:
+    """Запомнить варианты. Вызывать после того, как метаданные сохранены в LeafFlow."""
+    if not settings.images_skip_cache_enabled or not results:
+        return
+
+    mapping: dict[str | bytes, bytes | float | int | str] = {
+        f"{result.variant}.{result.format}": dumps(
+            {
+                "source": source_etag,
+                "config": config_hash(f"{result.variant}.{result.format}"),
+                "image_id": image_id,
+                "result": result.model_dump(),
+            }
+        )
+        for result in results
+    }
+    key = _key(original_key)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, settings.images_skip_cache_ttl_days * _DAY)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Variant cache: failed to save variants of %s", original_key)
+
+
+def config_hash(key: str) -> str:
+    """Хеш настроек файла варианта: при их изменении файл создаётся заново."""
+    target = variant_targets()[key]
+    cfg = {
+        "variant": target.variant,
+        "format": target.format,
+        "crop": "limit",
+        "width": target.width,
+        "height": target.height,
+        "quality": target.quality,
+        "max_bytes": target.max_bytes,
+        "min_quality": settings.images_min_quality,
+    }
+    return hashlib.sha256(dumps(dict(sorted(cfg.items())))).hexdigest()[:16]
+
+
+def _key(original_key: str) -> str:
+    return f"img:variants:{original_key}"
@@ -0,0 +1,97 @@
+import logging
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+
+from notifications_worker.domain.entities import ImageVariantResult
+from notifications_worker.domain.variants import VariantTarget, variant_targets
+from notifications_worker.infra.imaging.geometry import limit_size
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class VariantPlan:
+    target: VariantTarget
+    width: int
+    height: int
+    # Файл меньшего варианта того же размера и формата, используемый вместо отдельного
+    alias_of: str | None = None
+
+    @property
+    def source(self) -> str:
+        """Файл варианта, который нужно создать для этого файла."""
+        return self.alias_of or self.target.key
+
+
+def plan_variants(
+    original_width: int,
+    original_height: int,
+    formats: Iterable[str] | None = None,
+) -> dict[str, VariantPlan]:
+    """
+    План файлов вариантов по размерам оригинала.
+
+    Варианты не увеличивают оригинал (crop=limit), поэтому у маленького оригинала
+    крупные варианты совпадают по размеру с меньшим — такие файлы становятся
+    псевдонимами файла меньшего варианта в том же формате и не создаются отдельно.
+    Без размеров оригинала псевдонимов нет.
+
+    Args:
+        formats: Только файлы этих форматов (что умеет движок); None — все
+
+    Returns:
+        План по ключам variant_targets ("thumb.webp", ...), в их порядке
+    """
+    allowed = set(formats) if formats is not None else None
+    targets = [t for t in variant_targets().values() if allowed is None or t.format in allowed]
+    known = original_width > 0 and original_height > 0
+    by_size: dict[tuple[str, int, int], str] = {}
+    plans: dict[str, VariantPlan] = {}
+
+    # От мелкого к крупному: псевдоним всегда указывает на наименьший вариант того же размера
+    for target in sorted(targets, key=lambda t: t.width * t.height):
+        if not known:
+            plans[target.key] = VariantPlan(target, target.width, target.height)
+            continue
+        width, height = limit_size((original_width, original_height), target.width, target.height)
+        alias_of = by_size.setdefault((target.format, width, height), target.key)
+        plans[target.key] = VariantPlan(
+            target, width, height, None if alias_of == target.key else alias_of
+        )
+
+    return {t.key: plans[t.key] for t in targets}
+
+
+def sources_to_create(
+    plans: Mapping[str, VariantPlan],
+    wanted: Iterable[str],
+    available: Iterable[str] = (),
+) -> list[str]:
+    """Файлы, которые нужно создать для `wanted` (без уже имеющихся `available`)."""
+    have = set(available)
+    needed = {plans[key].source for key in wanted} - have
+    return [key for key in plans if key in needed]
+
+
+def with_aliases(
+    plans: Mapping[str, VariantPlan],
+    wanted: Iterable[str],
+    results: Mapping[str, ImageVariantResult],
+) -> list[ImageVariantResult]:
+    """
+    Результаты для `wanted`: псевдонимы получают файл (storage_key, размеры, byte_size,
+    quality) своего источника из `results`, под своим именем варианта. Файлы, источник
+    которых не создан, пропускаются.
+    """
+    resolved = []
+    for key in wanted:
+        plan = plans[key]
+        source = results.get(plan.source)
+        if source is None:
+            logger.warning("Variant %s: source %s was not created", key, plan.source)
+        elif plan.alias_of is None:
+            resolved.append(source)
+        else:
+            logger.info("Variant %s reuses %s (%s)", key, plan.source, source.storage_key)
+            resolved.append(source.model_copy(update={"variant": plan.target.variant}))
+    return resolved
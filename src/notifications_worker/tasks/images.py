@@ -1,15 +1,53 @@
 import logging
+import time
+from typing import Any, BinaryIO
 
-from celery import shared_task
+from celery import Task, chord, group, shared_task
+from pydantic import BaseModel
 
-from notifications_worker.domain.entities import ImageUploadedEntity
-from notifications_worker.infra.leafflow.client import leafflow_client
-from notifications_worker.infra.s3.client import s3_client
-from notifications_worker.services.image_processor import process_image_with_cloudinary
+from notifications_worker.domain.entities import ImageUploadedEntity, ImageVariantResult
+from notifications_worker.infra import metrics
+from notifications_worker.infra.cloudinary.errors import (
+    CloudinaryRateLimited,
+    CloudinaryTransformTimeout,
+)
+from notifications_worker.infra.leafflow.client import get_leafflow_client
+from notifications_worker.infra.s3.client import get_s3_client
+from notifications_worker.infra.settings import settings
+from notifications_worker.services.image_processor import (
+    CloudinaryTransform,
+    VariantSink,
+    discard_cloudinary_transform,
+    engine_formats,
+    pending_cloudinary_variants,
+    process_image,
+    start_cloudinary_transform,
+    transfer_cloudinary_variant,
+)
+from notifications_worker.services.variant_cache import (
+    CachedVariant,
+    find_cached_variants,
+    remember_variants,
+)
+from notifications_worker.services.variant_planner import (
+    plan_variants,
+    sources_to_create,
+    with_aliases,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class _StagedImage(BaseModel):
+    """Состояние поэтапной обработки, передаётся между стадиями."""
+
+    transform: CloudinaryTransform
+    source_etag: str | None
+    cached: dict[str, CachedVariant]
+    started_at: float
+    polls: int = 0
+
+
 @shared_task(
     name="images.create_variants",
     bind=True,
@@ -20,21 +58,44 @@ logger = logging.getLogger(__name__)
 )
 def create_variants(self, payload: dict) -> dict:  # type: ignore[type-arg]
     """
-    Создать варианты изображения через Cloudinary.
+    Создать варианты изображения движком из IMAGES_ENGINE.
+
+    Flow (cloudinary, IMAGES_STAGED_ENABLED — по умолчанию), каждая стадия — своя задача,
+    слот воркера не ждёт Cloudinary:
+    1. images.create_variants: Cloudinary fetch оригинал по URL + eager transformations
+       в фоне (eager_async)
+    2. images.collect_variants: опрос готовности (повторный запуск с задержкой)
+    3. images.transfer_variant: для каждого файла варианта (thumb, md, lg в AVIF и WebP),
+       параллельно (chord): поток из Cloudinary CDN → загрузка в S3 (multipart для крупных
+       файлов)
+    4. images.finalize_variants: метаданные → LeafFlow, удалить временное изображение
+       из Cloudinary
+
+    Flow (cloudinary, IMAGES_STAGED_ENABLED=false) — те же шаги в одной задаче.
+
+    Flow (local):
+    1. Скачать оригинал из S3, сделать варианты Pillow в пуле процессов
+    2. Загрузить варианты в S3 параллельно
 
-    Flow:
-    1. Cloudinary fetch оригинал по URL + eager transformations
-    2. Скачать варианты (thumb, md, lg) из Cloudinary CDN
-    3. Загрузить варианты в S3
-    4. Сохранить метаданные через LeafFlow API
-    5. Удалить временное изображение из Cloudinary
+    Затем:
+    4. Сохранить метаданные всех вариантов одним запросом к LeafFlow API
+
+    Варианты, уже сделанные из того же оригинала (по ETag в S3) с той же конфигурацией,
+    не создаются заново; если таких все и их метаданные уже сохранены — задача сразу
+    завершается. Варианты не увеличивают оригинал: если у маленького оригинала крупный
+    вариант совпадает по размеру с меньшим, он не создаётся, а ссылается на файл меньшего
+    (см. plan_variants). Файл, не уложившийся в max_bytes варианта, делается с качеством
+    ниже; формат, которого не умеет движок, пропускается.
 
     Args:
         payload: Данные события ImageUploadedEvent
 
     Returns:
-        {"image_id": 123, "variants_created": ["thumb", "md", "lg"]}
+        {"image_id": 123, "variants_created": ["thumb.avif", "thumb.webp"],
+         "variants_reused": ["md.avif", ...], "elapsed_ms": 1234}
+        или {"image_id": 123, "stage": "submitted", "variants": [...]} при поэтапной обработке
     """
+    started_at = time.time()
     entity = ImageUploadedEntity.model_validate(payload)
 
     logger.info(
@@ -43,39 +104,251 @@ def create_variants(self, payload: dict) -> dict:  # type: ignore[type-arg]
         entity.product_id,
     )
 
-    # 1-2. Обрабатываем через Cloudinary
-    variants = process_image_with_cloudinary(
+    plans = plan_variants(entity.original_width, entity.original_height, engine_formats())
+    source_etag = get_s3_client().head(entity.original_key)
+    cached = find_cached_variants(entity.original_key, source_etag) if source_etag else {}
+    missing = [key for key in plans if key not in cached]
+    # Псевдонимы не создаются: им нужен только файл варианта-источника
+    to_create = sources_to_create(plans, missing, available=cached)
+
+    if not to_create:
+        return _finish(entity, source_etag, cached, [], started_at)
+
+    if settings.images_engine == "cloudinary" and settings.images_staged_enabled:
+        transform = start_cloudinary_transform(
+            original_url=entity.original_url,
+            product_id=entity.product_id,
+            image_id=entity.image_id,
+            variants=to_create,
+        )
+        state = _StagedImage(
+            transform=transform,
+            source_etag=source_etag,
+            cached=cached,
+            started_at=started_at,
+        )
+        collect_variants.apply_async(
+            (payload, state.model_dump(mode="json")),
+            countdown=settings.images_transform_poll_seconds,
+        )
+        logger.info("[image_id=%d] Cloudinary transform submitted: %s", entity.image_id, to_create)
+        return {"image_id": entity.image_id, "stage": "submitted", "variants": to_create}
+
+    created = process_image(
         original_url=entity.original_url,
         original_key=entity.original_key,
         product_id=entity.product_id,
         image_id=entity.image_id,
+        sink=_uploader(entity.image_id),
+        variants=to_create,
     )
-
-    if not variants:
+    if not created:
         msg = "No variants created"
         raise ValueError(msg)
 
-    # 3. Загружаем варианты в S3
-    for data, meta in variants:
-        logger.info("[image_id=%d] Uploading to S3: %s", entity.image_id, meta.storage_key)
-        s3_client.upload(
-            key=meta.storage_key,
-            data=data,
-            content_type="image/webp",
+    return _finish(entity, source_etag, cached, created, started_at)
+
+
+def _discard_on_failure(
+    task: Task,
+    exc: Exception,
+    task_id: str,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+    einfo: object,
+) -> None:
+    """collect_variants упал окончательно (таймаут, исчерпаны повторы): удалить временный файл."""
+    state = _StagedImage.model_validate(args[1] if len(args) > 1 else kwargs["state"])
+    discard_cloudinary_transform(state.transform.public_id)
+
+
+@shared_task(
+    name="images.collect_variants",
+    bind=True,
+    autoretry_for=(Exception,),
+    dont_autoretry_for=(CloudinaryTransformTimeout,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_kwargs={"max_retries": 3},
+    on_failure=_discard_on_failure,
+)
+def collect_variants(self, payload: dict, state: dict) -> dict:  # type: ignore[type-arg]
+    """
+    Стадия 2: дождаться eager transformations Cloudinary.
+
+    Пока варианты не готовы, задача ставит себя заново с растущей задержкой
+    (images_transform_poll_seconds … images_transform_poll_max_seconds), не занимая слот.
+    Лимит Admin API не тратит повторы задачи: следующий опрос откладывается
+    на images_transform_rate_limited_poll_seconds. Когда готовы — запускает chord:
+    images.transfer_variant на каждый вариант, затем images.finalize_variants.
+    Если задача падает окончательно, временное изображение удаляется из Cloudinary.
+    """
+    entity = ImageUploadedEntity.model_validate(payload)
+    staged = _StagedImage.model_validate(state)
+    transform = staged.transform
+
+    try:
+        pending = pending_cloudinary_variants(transform)
+        countdown = min(
+            settings.images_transform_poll_seconds * 2**staged.polls,
+            settings.images_transform_poll_max_seconds,
+        )
+    except CloudinaryRateLimited:
+        logger.warning(
+            "[image_id=%d] Cloudinary Admin API rate limit, next poll in %.0f s",
+            entity.image_id,
+            settings.images_transform_rate_limited_poll_seconds,
         )
+        pending = list(transform.variants)
+        countdown = settings.images_transform_rate_limited_poll_seconds
 
-    # 4. Сохраняем метаданные через LeafFlow API
-    for _, meta in variants:
-        leafflow_client.save_image_variant(entity.image_id, meta)
+    if pending:
+        if time.time() - transform.submitted_at > settings.images_transform_timeout_seconds:
+            raise CloudinaryTransformTimeout(public_id=transform.public_id, pending=pending)
+
+        staged.polls += 1
+        collect_variants.apply_async(
+            (payload, staged.model_dump(mode="json")),
+            countdown=countdown,
+        )
+        return {"image_id": entity.image_id, "stage": "polling", "pending": pending}
+
+    # С точностью до интервала опроса
+    metrics.CLOUDINARY_TRANSFORM_SECONDS.labels("staged").observe(
+        time.time() - transform.submitted_at
+    )
+    state = staged.model_dump(mode="json")
+    finalize = finalize_variants.s(payload, state).on_error(
+        discard_transform.si(transform.public_id)
+    )
+    chord(
+        group(
+            transfer_variant.s(entity.image_id, entity.original_key, transform.model_dump(), name)
+            for name in transform.variants
+        ),
+        finalize,
+    ).apply_async()
 
-    created_variants = [meta.variant for _, meta in variants]
     logger.info(
-        "[image_id=%d] Successfully created variants: %s",
+        "[image_id=%d] Cloudinary transform ready after %d polls, transferring %s",
         entity.image_id,
-        created_variants,
+        staged.polls,
+        transform.variants,
+    )
+    return {"image_id": entity.image_id, "stage": "transferring", "variants": transform.variants}
+
+
+@shared_task(
+    name="images.transfer_variant",
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_kwargs={"max_retries": 3},
+)
+def transfer_variant(
+    self,
+    image_id: int,
+    original_key: str,
+    transform: dict,  # type: ignore[type-arg]
+    variant: str,
+) -> dict:  # type: ignore[type-arg]
+    """Стадия 3: перенести один готовый файл варианта из Cloudinary CDN в S3."""
+    meta = transfer_cloudinary_variant(
+        image_id,
+        CloudinaryTransform.model_validate(transform),
+        variant,
+        original_key,
+        _uploader(image_id),
     )
+    return meta.model_dump()
+
+
+@shared_task(
+    name="images.finalize_variants",
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_kwargs={"max_retries": 3},
+)
+def finalize_variants(self, results: list, payload: dict, state: dict) -> dict:  # type: ignore[type-arg]
+    """Стадия 4: сохранить метаданные в LeafFlow и удалить временное изображение из Cloudinary."""
+    entity = ImageUploadedEntity.model_validate(payload)
+    staged = _StagedImage.model_validate(state)
+    created = [ImageVariantResult.model_validate(result) for result in results]
+
+    try:
+        return _finish(entity, staged.source_etag, staged.cached, created, staged.started_at)
+    finally:
+        discard_cloudinary_transform(staged.transform.public_id)
+
+
+@shared_task(name="images.discard_transform")
+def discard_transform(public_id: str) -> None:
+    """Удалить временное изображение из Cloudinary, если перенос вариантов не удался."""
+    discard_cloudinary_transform(public_id)
+
+
+def _uploader(image_id: int) -> VariantSink:
+    def upload_variant(stream: BinaryIO, storage_key: str) -> None:
+        logger.info("[image_id=%d] Uploading to S3: %s", image_id, storage_key)
+        get_s3_client().upload_stream(
+            key=storage_key,
+            stream=stream,
+            content_type=f"image/{storage_key.rsplit('.', 1)[-1]}",
+        )
+
+    return upload_variant
+
+
+def _finish(
+    entity: ImageUploadedEntity,
+    source_etag: str | None,
+    cached: dict[str, CachedVariant],
+    created: list[ImageVariantResult],
+    started_at: float,
+) -> dict:  # type: ignore[type-arg]
+    # Созданные варианты и псевдонимы, ссылающиеся на созданные или уже имеющиеся файлы
+    plans = plan_variants(entity.original_width, entity.original_height, engine_formats())
+    results = {key: c.result for key, c in cached.items()}
+    results.update((f"{meta.variant}.{meta.format}", meta) for meta in created)
+    created = with_aliases(plans, [key for key in plans if key not in cached], results)
+    # Объекты в S3 есть, но метаданные сохранены для другого изображения (повторная загрузка)
+    unsaved = [c.result for c in cached.values() if c.image_id != entity.image_id]
+
+    if created or unsaved:
+        # Сохраняем метаданные через LeafFlow API (один запрос на изображение)
+        get_leafflow_client().save_image_variants(entity.image_id, unsaved + created)
+        if source_etag:
+            remember_variants(
+                entity.original_key,
+                source_etag,
+                entity.image_id,
+                [c.result for c in cached.values()] + created,
+            )
+
+    created_variants = [f"{meta.variant}.{meta.format}" for meta in created]
+    elapsed_ms = round((time.time() - started_at) * 1000)
+    if created_variants or unsaved:
+        logger.info(
+            "[image_id=%d] Successfully created variants: %s, reused: %s in %d ms "
+            "(engine %s, concurrency %d)",
+            entity.image_id,
+            created_variants,
+            list(cached),
+            elapsed_ms,
+            settings.images_engine,
+            settings.images_pipeline_concurrency,
+        )
+    else:
+        logger.info(
+            "[image_id=%d] Variants are up to date, skipping (%d ms)", entity.image_id, elapsed_ms
+        )
 
     return {
         "image_id": entity.image_id,
         "variants_created": created_variants,
+        "variants_reused": list(cached),
+        "elapsed_ms": elapsed_ms,
     }
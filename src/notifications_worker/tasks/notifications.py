@@ -1,33 +1,212 @@
-from pydantic import ValidationError
+import logging
+from typing import Any
+
+from celery import Task
+from pydantic import TypeAdapter, ValidationError
 
 from notifications_worker.app import celery_app
 from notifications_worker.domain.entities import NotificationsOrderEntity
-from notifications_worker.infra.telegram.errors import TelegramRetryableError
+from notifications_worker.infra.settings import settings
+from notifications_worker.services import coalescer
+from notifications_worker.services.dead_letter import record_dead_letter
 from notifications_worker.services.dispatcher import (
+    Recipient,
+    dispatch_order_notification_admin,
     dispatch_order_notification_user,
-    dispatch_order_notification_admin
+    dispatch_order_notifications,
+    dispatch_order_notifications_many,
+    is_status_update,
 )
+from notifications_worker.services.retry_policy import decide_retry, retry_or_dead_letter
+
+logger = logging.getLogger(__name__)
 
 
 @celery_app.task(name="notifications.send_notification.order.admin", bind=True, max_retries=5)
-def send_notification_order_admin(self, payload: dict) -> None:
+def send_notification_order_admin(
+    self, payload: dict, coalesce_token: int | None = None, coalesce: bool = True
+) -> None:
     try:
         entity = NotificationsOrderEntity.model_validate(payload)
+        if coalesce and not _should_send_now(self, "admin", entity, payload, coalesce_token):
+            return
         dispatch_order_notification_admin(entity=entity)
 
-    except ValidationError:
-        # контракт сломан
-        raise
-
-    except TelegramRetryableError as exc:
-        raise self.retry(exc=exc, countdown=10)
+    except Exception as exc:
+        retry_or_dead_letter(self, payload, exc)
 
 
 @celery_app.task(name="notifications.send_notification.order.user", bind=True, max_retries=5)
-def send_notification_order_user(self, payload: dict) -> None:
+def send_notification_order_user(
+    self, payload: dict, coalesce_token: int | None = None, coalesce: bool = True
+) -> None:
     try:
         entity = NotificationsOrderEntity.model_validate(payload)
+        if coalesce and not _should_send_now(self, "user", entity, payload, coalesce_token):
+            return
         dispatch_order_notification_user(entity=entity)
 
     except Exception as exc:
-        raise self.retry(exc=exc, countdown=10)
+        retry_or_dead_letter(self, payload, exc)
+
+
+@celery_app.task(name="notifications.send_notification.order", bind=True)
+def send_notification_order(self, payload: dict[str, Any]) -> dict[str, str]:
+    """
+    Notify admin and user about one order in parallel.
+
+    A recipient that fails is handed off to its own task, so a retry never
+    re-sends to the recipient that already got the message.
+    """
+    try:
+        entity = NotificationsOrderEntity.model_validate(payload)
+    except ValidationError as exc:
+        retry_or_dead_letter(self, payload, exc)
+
+    outcomes = dispatch_order_notifications(entity)
+    return {
+        recipient: _hand_off_failure(self.name, recipient, payload, error)
+        for recipient, error in outcomes.items()
+    }
+
+
+@celery_app.task(name="notifications.send_notification.order.batch", bind=True)
+def send_notification_order_batch(
+    self,
+    payloads: list[dict[str, Any]],
+    recipients: list[Recipient] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Notify about many orders with one message.
+
+    Payloads are validated in one pass and sent concurrently. Returns a status per
+    item and recipient; failed sends are retried one by one by the per-recipient
+    tasks, invalid payloads are dead-lettered, the batch itself is never retried.
+    """
+    recipients = recipients or ["admin", "user"]
+
+    try:
+        valid = _validate_batch(self.name, payloads)
+    except ValidationError as exc:
+        retry_or_dead_letter(self, payloads, exc)
+
+    results: list[dict[str, Any]] = [
+        {"index": i, "status": "invalid"} for i in range(len(payloads))
+    ]
+    outcomes = dispatch_order_notifications_many([entity for _, entity in valid], recipients)
+
+    for (index, entity), outcome in zip(valid, outcomes, strict=True):
+        item = results[index]
+        item["order_id"] = entity.order_id
+        item["status"] = "processed"
+        for recipient, error in outcome.items():
+            item[recipient] = _hand_off_failure(self.name, recipient, payloads[index], error)
+
+    return results
+
+
+_ORDER_LIST = TypeAdapter(list[NotificationsOrderEntity])
+
+_RECIPIENT_TASKS = {
+    "admin": send_notification_order_admin,
+    "user": send_notification_order_user,
+}
+
+
+def _should_send_now(
+    task: Task,
+    recipient: Recipient,
+    entity: NotificationsOrderEntity,
+    payload: dict[str, Any],
+    coalesce_token: int | None,
+) -> bool:
+    """
+    Debounce status updates per (order, recipient).
+
+    The first run of a status update registers itself and re-schedules the task
+    after the coalescing window; the deferred run sends only if no newer update
+    arrived meanwhile. New orders are sent immediately.
+    """
+    if coalesce_token is not None:
+        if coalescer.is_latest(recipient, entity.order_id, coalesce_token):
+            return True
+        logger.info(
+            "Order %s %s notification superseded by a newer status, skipped",
+            entity.order_id,
+            recipient,
+        )
+        return False
+
+    window = settings.notifications_coalesce_window_seconds
+    if window <= 0 or not is_status_update(entity):
+        return True
+
+    token = coalescer.register_update(recipient, entity.order_id)
+    if token is None:
+        return True
+
+    task.apply_async(args=[payload], kwargs={"coalesce_token": token}, countdown=window)
+    return False
+
+
+def _validate_batch(
+    task_name: str,
+    payloads: list[dict[str, Any]],
+) -> list[tuple[int, NotificationsOrderEntity]]:
+    """
+    Validate all payloads in one pass. Invalid items are dead-lettered and left out;
+    raises ValidationError only if the batch itself is malformed.
+    """
+    try:
+        return list(enumerate(_ORDER_LIST.validate_python(payloads)))
+    except ValidationError as exc:
+        invalid = {
+            err["loc"][0] for err in exc.errors() if err["loc"] and isinstance(err["loc"][0], int)
+        }
+        if not invalid:
+            raise
+        batch_error = exc
+
+    for index in sorted(invalid):
+        record_dead_letter(
+            task_name=task_name,
+            task_id=None,
+            payload=payloads[index],
+            reason="invalid_payload",
+            exc=batch_error,
+            retries=0,
+        )
+
+    valid_indexes = [i for i in range(len(payloads)) if i not in invalid]
+    entities = _ORDER_LIST.validate_python([payloads[i] for i in valid_indexes])
+    return list(zip(valid_indexes, entities, strict=True))
+
+
+def _hand_off_failure(
+    task_name: str,
+    recipient: Recipient,
+    payload: dict[str, Any],
+    exc: Exception | None,
+) -> str:
+    """Schedule a per-recipient retry (or dead-letter it). Returns the item status."""
+    if exc is None:
+        return "sent"
+
+    decision = decide_retry(exc, retries=0)
+    if decision.retry:
+        # The batch or combined task does not coalesce, so neither does its hand-off:
+        # it already waits for the retry countdown
+        _RECIPIENT_TASKS[recipient].apply_async(
+            args=[payload], kwargs={"coalesce": False}, countdown=decision.countdown
+        )
+        return "retrying"
+
+    record_dead_letter(
+        task_name=f"{task_name}:{recipient}",
+        task_id=None,
+        payload=payload,
+        reason=decision.reason,
+        exc=exc,
+        retries=0,
+    )
+    return "failed"
@@ -0,0 +1,31 @@
+import os
+import threading
+from collections.abc import Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+def per_process(factory: Callable[[], T]) -> Callable[[], T]:  # noqa: UP047
+    """
+    Accessor of one factory() object per process, created on first call.
+
+    Nothing is built at import time, and an object created before fork is not reused
+    by the child (it is forgotten, not closed): clients must not share sockets
+    between processes.
+    """
+    lock = threading.Lock()
+    instances: dict[int, T] = {}
+
+    def get() -> T:
+        pid = os.getpid()
+        instance = instances.get(pid)
+        if instance is None:
+            with lock:
+                instance = instances.get(pid)
+                if instance is None:
+                    instances.clear()
+                    instance = instances[pid] = factory()
+        return instance
+
+    return get
@@ -0,0 +1,37 @@
+from collections.abc import Iterator
+
+
+class CountingReader:
+    """
+    Read-only file-like object over an iterator of chunks (e.g. an HTTP response body).
+
+    Holds at most one chunk beyond what the caller asked for and counts the bytes
+    handed out, so the size of a streamed file is known once it has been consumed.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]) -> None:
+        self._chunks = chunks
+        self._buffer = b""
+        self.bytes_read = 0
+
+    def read(self, size: int | None = -1) -> bytes:
+        if size is None or size < 0:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+        else:
+            parts = [self._buffer]
+            available = len(self._buffer)
+            while available < size:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                parts.append(chunk)
+                available += len(chunk)
+            joined = b"".join(parts)
+            data, self._buffer = joined[:size], joined[size:]
+
+        self.bytes_read += len(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
@@ -0,0 +1,78 @@
+from dataclasses import dataclass, replace
+
+from notifications_worker.infra.settings import settings
+from notifications_worker.routing import NOTIFICATION_LANES
+
+
+@dataclass(frozen=True, slots=True)
+class PoolProfile:
+    """Celery worker pool serving one queue."""
+
+    queue: str
+    pool: str
+    concurrency: int
+    prefetch_multiplier: int
+    # 0 = not set
+    time_limit_seconds: int = 0
+    soft_time_limit_seconds: int = 0
+    max_tasks_per_child: int = 0
+    # Celery queues consumed, in priority order (see routing.py); empty = just `queue`
+    lanes: tuple[str, ...] = ()
+
+    def worker_argv(self, log_level: str = "info") -> list[str]:
+        """Arguments of the `celery worker` command for this queue."""
+        argv = [
+            "worker",
+            "-l", log_level,
+            "-Q", ",".join(self.lanes or (self.queue,)),
+            "-n", f"{self.queue}@%h",
+            "--pool", self.pool,
+            "--concurrency", str(self.concurrency),
+            "--prefetch-multiplier", str(self.prefetch_multiplier),
+        ]
+        if self.time_limit_seconds:
+            argv += ["--time-limit", str(self.time_limit_seconds)]
+        if self.soft_time_limit_seconds:
+            argv += ["--soft-time-limit", str(self.soft_time_limit_seconds)]
+        if self.max_tasks_per_child and self.pool == "prefork":
+            argv += ["--max-tasks-per-child", str(self.max_tasks_per_child)]
+        return argv
+
+
+def pool_profiles() -> dict[str, PoolProfile]:
+    """Pool profile of every queue from the NOTIFICATIONS_* / IMAGES_* settings."""
+    notifications = PoolProfile(
+        queue="notifications",
+        pool=settings.notifications_pool,
+        concurrency=settings.notifications_concurrency,
+        prefetch_multiplier=settings.notifications_prefetch_multiplier,
+        time_limit_seconds=settings.notifications_time_limit_seconds,
+        soft_time_limit_seconds=settings.notifications_soft_time_limit_seconds,
+        max_tasks_per_child=settings.notifications_max_tasks_per_child,
+        lanes=NOTIFICATION_LANES,
+    )
+    if settings.notifications_engine == "async":
+        # Telegram I/O runs on one asyncio loop per process;
+        # pool threads only wait for it, so they are cheap to have many of.
+        notifications = replace(
+            notifications, pool="threads", concurrency=settings.notifications_async_pool_size
+        )
+
+    images = PoolProfile(
+        queue="images",
+        pool=settings.images_pool or _default_images_pool(),
+        concurrency=settings.images_concurrency,
+        prefetch_multiplier=settings.images_prefetch_multiplier,
+        time_limit_seconds=settings.images_time_limit_seconds,
+        soft_time_limit_seconds=settings.images_soft_time_limit_seconds,
+        max_tasks_per_child=settings.images_max_tasks_per_child,
+    )
+    return {"notifications": notifications, "images": images}
+
+
+def _default_images_pool() -> str:
+    # A prefork child is daemonic and may not start the local engine's process pool:
+    # with prefork IMAGES_LOCAL_PROCESSES would do nothing
+    if settings.images_engine == "local" and settings.images_local_processes > 0:
+        return "threads"
+    return "prefork"
@@ -0,0 +1,47 @@
+import os
+from collections.abc import Iterator
+
+import fakeredis
+import pytest
+
+# Settings are read on import: offline values for the required ones, before any
+# notifications_worker module is imported by a test
+for name, value in {
+    "TELEGRAM_BOT_TOKEN": "123456:test",
+    "ADMIN_CHAT_ID": "-1001234567890",
+    "S3_ENDPOINT": "http://s3.test",
+    "S3_ACCESS_KEY": "test",
+    "S3_SECRET_KEY": "test",
+    "S3_BUCKET": "test",
+    "API_BASE_URL": "http://leafflow.test",
+    "INTERNAL_TOKEN": "test",
+    "CLOUDINARY_CLOUD_NAME": "test",
+    "CLOUDINARY_API_KEY": "test",
+    "CLOUDINARY_API_SECRET": "test",
+    "HTTP_WARMUP_ENABLED": "false",
+    "METRICS_ENABLED": "false",
+    "PROFILING_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+from notifications_worker.infra.redis import client as redis_client  # noqa: E402
+
+
+@pytest.fixture
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> Iterator[fakeredis.FakeRedis]:
+    """get_redis() of the worker state, backed by an in-memory server."""
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(redis_client, "_client", client)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def broken_redis(monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeRedis:
+    """get_redis() of a Redis that is down: every command raises ConnectionError."""
+    server = fakeredis.FakeServer()
+    server.connected = False
+    client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(redis_client, "_client", client)
+    return client
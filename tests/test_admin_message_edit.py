@@ -0,0 +1,132 @@
+import json
+from typing import Any
+
+import fakeredis
+import httpx
+import pytest
+
+from notifications_worker.domain.entities import NotificationsOrderEntity
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram import client as telegram_client
+from notifications_worker.infra.telegram.errors import TelegramBadRequest
+from notifications_worker.services import dispatcher
+from notifications_worker.services.admin_messages import (
+    get_admin_message_id,
+    save_admin_message_id,
+)
+from notifications_worker.services.delivery_ledger import is_delivered
+
+ADMIN = f"admin:{settings.admin_chat_id}"
+POSTED = 100
+NEW_MESSAGE = 200
+
+STATUS_UPDATE = NotificationsOrderEntity.model_validate(
+    {
+        "order_id": "42",
+        "old_status": "created",
+        "new_status": "paid",
+        "phone": "+79990000000",
+        "customer_name": "Анна",
+        "total": "1500",
+        "delivery_method": "pickup",
+        "created_at": "2026-01-01T10:00:00",
+    }
+)
+
+
+def telegram_error(status: int, description: str) -> httpx.Response:
+    return httpx.Response(
+        status, json={"ok": False, "error_code": status, "description": description}
+    )
+
+
+def mock_telegram(monkeypatch: pytest.MonkeyPatch, edit: httpx.Response) -> list[str]:
+    """Telegram answering editMessageText with edit and sendMessage with NEW_MESSAGE."""
+    methods: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rsplit("/", 1)[-1]
+        methods.append(method)
+        if method == "editMessageText":
+            assert json.loads(request.content)["message_id"] == POSTED
+            return edit
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": NEW_MESSAGE}})
+
+    http = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(telegram_client, "get_http_client", lambda name: http)
+    # A client per test: the per-process one keeps its limiter bound to an earlier test's Redis
+    client = telegram_client.TelegramClient()
+    monkeypatch.setattr(dispatcher, "get_telegram_client", lambda: client)
+    return methods
+
+
+def posted_message_id() -> int | None:
+    return get_admin_message_id(settings.admin_chat_id, None, STATUS_UPDATE.order_id)
+
+
+@pytest.fixture
+def posted(fake_redis: fakeredis.FakeRedis) -> None:
+    save_admin_message_id(settings.admin_chat_id, None, STATUS_UPDATE.order_id, POSTED)
+
+
+def test_edits_the_posted_message(posted: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    ok: dict[str, Any] = {"ok": True, "result": {"message_id": POSTED}}
+    methods = mock_telegram(monkeypatch, httpx.Response(200, json=ok))
+
+    dispatcher.dispatch_order_notification_admin(STATUS_UPDATE)
+
+    assert methods == ["editMessageText"]
+    assert is_delivered(STATUS_UPDATE, ADMIN)
+    assert posted_message_id() == POSTED
+
+
+def test_not_modified_counts_as_delivered(posted: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    not_modified = telegram_error(400, "Bad Request: message is not modified")
+    methods = mock_telegram(monkeypatch, not_modified)
+
+    dispatcher.dispatch_order_notification_admin(STATUS_UPDATE)
+
+    assert methods == ["editMessageText"]
+    assert is_delivered(STATUS_UPDATE, ADMIN)
+
+
+@pytest.mark.parametrize(
+    "gone",
+    [
+        telegram_error(400, "Bad Request: message to edit not found"),
+        telegram_error(400, "Bad Request: message can't be edited"),
+        telegram_error(404, "Not Found"),
+    ],
+)
+def test_gone_message_is_forgotten_and_a_new_one_sent(
+    posted: None, monkeypatch: pytest.MonkeyPatch, gone: httpx.Response
+) -> None:
+    methods = mock_telegram(monkeypatch, gone)
+
+    dispatcher.dispatch_order_notification_admin(STATUS_UPDATE)
+
+    assert methods == ["editMessageText", "sendMessage"]
+    assert posted_message_id() == NEW_MESSAGE
+    assert is_delivered(STATUS_UPDATE, ADMIN)
+
+
+def test_other_bad_requests_are_raised(posted: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    methods = mock_telegram(monkeypatch, telegram_error(400, "Bad Request: can't parse entities"))
+
+    with pytest.raises(TelegramBadRequest):
+        dispatcher.dispatch_order_notification_admin(STATUS_UPDATE)
+
+    assert methods == ["editMessageText"]
+    assert posted_message_id() == POSTED
+    assert not is_delivered(STATUS_UPDATE, ADMIN)
+
+
+def test_sends_when_no_message_is_remembered(
+    fake_redis: fakeredis.FakeRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    methods = mock_telegram(monkeypatch, telegram_error(400, "unexpected edit"))
+
+    dispatcher.dispatch_order_notification_admin(STATUS_UPDATE)
+
+    assert methods == ["sendMessage"]
+    assert posted_message_id() == NEW_MESSAGE
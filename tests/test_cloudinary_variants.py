@@ -0,0 +1,57 @@
+from typing import Any
+
+import pytest
+
+from notifications_worker.infra.cloudinary import client as cloudinary_client
+
+
+def mock_resource(monkeypatch: pytest.MonkeyPatch, derived: list[dict[str, Any]]) -> list[str]:
+    """Admin API resource() of the SDK answering with the given derived items."""
+    calls: list[str] = []
+
+    def resource(public_id: str, **options: Any) -> dict[str, Any]:
+        calls.append(public_id)
+        return {"public_id": public_id, "derived": derived}
+
+    monkeypatch.setattr(cloudinary_client.cloudinary_sdk().api, "resource", resource)
+    return calls
+
+
+def test_avif_stays_pending_while_only_webp_is_derived(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = mock_resource(
+        monkeypatch, [{"transformation": "c_limit,h_150,q_80,w_150/webp", "format": "webp"}]
+    )
+
+    pending = cloudinary_client.pending_variants("temp/p/1", ["thumb.avif", "thumb.webp"])
+
+    assert pending == ["thumb.avif"]
+    assert calls == ["temp/p/1"]
+
+
+def test_nothing_pending_when_every_format_is_derived(monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_resource(
+        monkeypatch,
+        [
+            {"transformation": "c_limit,h_150,q_80,w_150/webp", "format": "webp"},
+            {"transformation": "c_limit,h_150,q_80,w_150/avif", "format": "avif"},
+        ],
+    )
+
+    assert cloudinary_client.pending_variants("temp/p/1", ["thumb.avif", "thumb.webp"]) == []
+
+
+def test_format_field_without_extension_is_matched(monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_resource(monkeypatch, [{"transformation": "c_limit,h_600,q_85,w_600", "format": "avif"}])
+
+    pending = cloudinary_client.pending_variants("temp/p/1", ["md.avif", "md.webp"])
+
+    assert pending == ["md.webp"]
+
+
+def test_everything_pending_before_any_derived(monkeypatch: pytest.MonkeyPatch) -> None:
+    mock_resource(monkeypatch, [])
+
+    assert cloudinary_client.pending_variants("temp/p/1", ["lg.avif", "lg.webp"]) == [
+        "lg.avif",
+        "lg.webp",
+    ]
@@ -0,0 +1,38 @@
+import fakeredis
+
+from notifications_worker.services.coalescer import is_latest, register_update
+
+
+def test_tokens_grow_per_order_and_recipient(fake_redis: fakeredis.FakeRedis) -> None:
+    assert register_update("admin", "1") == 1
+    assert register_update("admin", "1") == 2
+    assert register_update("user", "1") == 1
+    assert register_update("admin", "2") == 1
+
+
+def test_only_the_latest_update_is_sent(fake_redis: fakeredis.FakeRedis) -> None:
+    first = register_update("admin", "1")
+    second = register_update("admin", "1")
+
+    assert first is not None and second is not None
+    assert not is_latest("admin", "1", first)
+    assert is_latest("admin", "1", second)
+
+
+def test_tokens_expire(fake_redis: fakeredis.FakeRedis) -> None:
+    register_update("admin", "1")
+
+    assert fake_redis.ttl("coalesce:admin:1") > 0
+
+
+def test_expired_token_does_not_block_the_send(fake_redis: fakeredis.FakeRedis) -> None:
+    token = register_update("admin", "1")
+    fake_redis.delete("coalesce:admin:1")
+
+    assert token is not None
+    assert is_latest("admin", "1", token)
+
+
+def test_sends_right_away_without_redis(broken_redis: fakeredis.FakeRedis) -> None:
+    assert register_update("admin", "1") is None
+    assert is_latest("admin", "1", 1)
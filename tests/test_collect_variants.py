@@ -0,0 +1,104 @@
+import time
+from typing import Any
+
+import pytest
+
+from notifications_worker.infra.cloudinary.errors import (
+    CloudinaryRateLimited,
+    CloudinaryTransformTimeout,
+)
+from notifications_worker.infra.settings import settings
+from notifications_worker.tasks import images
+
+PAYLOAD = {
+    "image_id": 1,
+    "product_id": "pu-erh",
+    "original_url": "http://s3.test/public/products/pu-erh/1/original.jpg",
+    "original_key": "public/products/pu-erh/1/original.jpg",
+    "original_format": "jpg",
+    "original_width": 2000,
+    "original_height": 1500,
+}
+
+
+def state(submitted_at: float | None = None, polls: int = 0) -> dict[str, Any]:
+    return {
+        "transform": {
+            "public_id": "temp/leaf-flow/pu-erh/1",
+            "version": 1,
+            "width": 2000,
+            "height": 1500,
+            "variants": ["thumb.avif", "thumb.webp"],
+            "submitted_at": time.time() if submitted_at is None else submitted_at,
+        },
+        "source_etag": None,
+        "cached": {},
+        "started_at": time.time(),
+        "polls": polls,
+    }
+
+
+class Cloudinary:
+    """pending_cloudinary_variants, discard_cloudinary_transform and re-scheduled polls."""
+
+    def __init__(self, monkeypatch: pytest.MonkeyPatch, pending: Any) -> None:
+        self.polls = 0
+        self.discarded: list[str] = []
+        self.scheduled: list[float] = []
+
+        def pending_variants(transform: Any) -> list[str]:
+            self.polls += 1
+            if isinstance(pending, Exception):
+                raise pending
+            return list(pending)
+
+        def apply_async(args: Any, countdown: float) -> None:
+            self.scheduled.append(countdown)
+
+        monkeypatch.setattr(images, "pending_cloudinary_variants", pending_variants)
+        monkeypatch.setattr(images, "discard_cloudinary_transform", self.discarded.append)
+        monkeypatch.setattr(images.collect_variants, "apply_async", apply_async)
+
+
+def test_not_ready_polls_again_with_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    cloudinary = Cloudinary(monkeypatch, ["thumb.avif"])
+
+    result = images.collect_variants.apply(args=[PAYLOAD, state(polls=2)]).get()
+
+    assert result["stage"] == "polling"
+    assert cloudinary.scheduled == [settings.images_transform_poll_seconds * 4]
+    assert cloudinary.discarded == []
+
+
+def test_rate_limit_defers_the_poll_without_using_retries(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cloudinary = Cloudinary(monkeypatch, CloudinaryRateLimited(public_id="temp/leaf-flow/pu-erh/1"))
+
+    result = images.collect_variants.apply(args=[PAYLOAD, state()]).get()
+
+    assert result["pending"] == ["thumb.avif", "thumb.webp"]
+    assert cloudinary.polls == 1
+    assert cloudinary.scheduled == [settings.images_transform_rate_limited_poll_seconds]
+
+
+def test_timeout_discards_the_temporary_image(monkeypatch: pytest.MonkeyPatch) -> None:
+    cloudinary = Cloudinary(monkeypatch, ["thumb.avif"])
+    expired = time.time() - settings.images_transform_timeout_seconds - 1
+
+    result = images.collect_variants.apply(args=[PAYLOAD, state(submitted_at=expired)])
+
+    assert result.failed()
+    assert CloudinaryTransformTimeout.__name__ in str(result.result)
+    assert cloudinary.discarded == ["temp/leaf-flow/pu-erh/1"]
+    assert cloudinary.scheduled == []
+
+
+def test_exhausted_retries_discard_the_temporary_image(monkeypatch: pytest.MonkeyPatch) -> None:
+    cloudinary = Cloudinary(monkeypatch, ConnectionError("reset"))
+
+    result = images.collect_variants.apply(args=[PAYLOAD, state()])
+
+    assert isinstance(result.result, ConnectionError)
+    assert cloudinary.polls == 4
+    assert cloudinary.discarded == ["temp/leaf-flow/pu-erh/1"]
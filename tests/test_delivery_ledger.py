@@ -0,0 +1,52 @@
+from typing import Any
+
+import fakeredis
+
+from notifications_worker.domain.entities import NotificationsOrderEntity
+from notifications_worker.infra.settings import settings
+from notifications_worker.services.delivery_ledger import is_delivered, mark_delivered
+
+
+def order(**changes: Any) -> NotificationsOrderEntity:
+    payload = {
+        "order_id": "42",
+        "old_status": "created",
+        "new_status": "paid",
+        "phone": "+79990000000",
+        "customer_name": "Анна",
+        "total": "1500",
+        "delivery_method": "pickup",
+        "created_at": "2026-01-01T10:00:00",
+    }
+    return NotificationsOrderEntity.model_validate(payload | changes)
+
+
+def test_marks_a_status_change_per_recipient(fake_redis: fakeredis.FakeRedis) -> None:
+    assert not is_delivered(order(), "admin")
+
+    mark_delivered(order(), "admin")
+
+    assert is_delivered(order(), "admin")
+    assert not is_delivered(order(), "user")
+
+
+def test_another_status_change_is_not_delivered(fake_redis: fakeredis.FakeRedis) -> None:
+    mark_delivered(order(), "admin")
+
+    assert not is_delivered(order(old_status="paid", new_status="fulfilled"), "admin")
+    assert not is_delivered(order(order_id="43"), "admin")
+
+
+def test_entries_expire(fake_redis: fakeredis.FakeRedis) -> None:
+    mark_delivered(order(), "admin")
+
+    ttl = fake_redis.ttl("ledger:42:created:paid:admin")
+    assert 0 < ttl <= settings.delivery_ledger_ttl_seconds
+
+
+def test_without_redis_nothing_is_delivered_and_nothing_raises(
+    broken_redis: fakeredis.FakeRedis,
+) -> None:
+    mark_delivered(order(), "admin")
+
+    assert not is_delivered(order(), "admin")
@@ -0,0 +1,63 @@
+import httpx
+import pytest
+
+from notifications_worker.domain.entities import ImageVariantResult
+from notifications_worker.infra.leafflow import client as leafflow_client
+
+VARIANT = ImageVariantResult(
+    variant="thumb",
+    storage_key="products/p/1/thumb.webp",
+    format="webp",
+    width=150,
+    height=150,
+    byte_size=4096,
+)
+
+
+def mock_leafflow(monkeypatch: pytest.MonkeyPatch, bulk_statuses: list[int]) -> list[str]:
+    """LeafFlow answering the bulk route with bulk_statuses in turn, single saves with 201."""
+    paths: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        if request.url.path.endswith("/variants/bulk"):
+            return httpx.Response(bulk_statuses.pop(0))
+        return httpx.Response(201)
+
+    http = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(leafflow_client, "get_http_client", lambda name: http)
+    return paths
+
+
+def test_saves_all_images_with_one_bulk_request(monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = mock_leafflow(monkeypatch, [200])
+
+    leafflow_client.LeafFlowClient().save_images_variants({1: [VARIANT], 2: [VARIANT]})
+
+    assert paths == ["/v1/internal/images/variants/bulk"]
+
+
+def test_falls_back_to_single_saves_without_bulk_route(monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = mock_leafflow(monkeypatch, [404])
+    client = leafflow_client.LeafFlowClient()
+
+    client.save_images_variants({1: [VARIANT]})
+    client.save_images_variants({2: [VARIANT]})
+
+    assert paths == [
+        "/v1/internal/images/variants/bulk",
+        "/v1/internal/images/1/variants",
+        "/v1/internal/images/2/variants",
+    ]
+
+
+def test_404_after_a_working_bulk_call_raises(monkeypatch: pytest.MonkeyPatch) -> None:
+    paths = mock_leafflow(monkeypatch, [200, 404, 200])
+    client = leafflow_client.LeafFlowClient()
+    client.save_images_variants({1: [VARIANT]})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        client.save_images_variants({2: [VARIANT]})
+    client.save_images_variants({3: [VARIANT]})
+
+    assert paths == ["/v1/internal/images/variants/bulk"] * 3
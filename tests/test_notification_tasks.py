@@ -0,0 +1,178 @@
+import json
+from typing import Any
+
+import fakeredis
+import httpx
+import pytest
+from pydantic import ValidationError
+
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram import client as telegram_client
+from notifications_worker.infra.telegram.errors import TelegramForbidden, TelegramServerError
+from notifications_worker.services import dispatcher
+from notifications_worker.tasks import notifications as tasks
+
+BATCH_TASK = "notifications.send_notification.order.batch"
+BLOCKED_USER = 777
+
+
+def payload(order_id: str, **changes: Any) -> dict[str, Any]:
+    return {
+        "order_id": order_id,
+        "telegram_id": 42,
+        "old_status": "created",
+        "new_status": "created",
+        "phone": "+79990000000",
+        "customer_name": "Анна",
+        "total": "1500",
+        "delivery_method": "pickup",
+        "created_at": "2026-01-01T10:00:00",
+    } | changes
+
+
+def dead_letters(redis: fakeredis.FakeRedis) -> list[dict[str, Any]]:
+    return [json.loads(entry) for entry in redis.lrange(settings.dead_letter_key, 0, -1)]
+
+
+@pytest.fixture
+def handed_off(monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, dict[str, Any]]]:
+    """apply_async calls of the per-recipient tasks: (recipient, options)."""
+    calls: list[tuple[str, dict[str, Any]]] = []
+    for recipient, task in tasks._RECIPIENT_TASKS.items():
+
+        def apply_async(recipient: str = recipient, **options: Any) -> None:
+            calls.append((recipient, options))
+
+        monkeypatch.setattr(task, "apply_async", apply_async)
+    return calls
+
+
+def test_validate_batch_keeps_indexes_of_valid_items(fake_redis: fakeredis.FakeRedis) -> None:
+    payloads = [payload("1"), {"order_id": "2"}, payload("3"), payload("4", total="abc")]
+
+    valid = tasks._validate_batch(BATCH_TASK, payloads)
+
+    assert [(index, entity.order_id) for index, entity in valid] == [(0, "1"), (2, "3")]
+    letters = dead_letters(fake_redis)
+    assert sorted(letter["payload"]["order_id"] for letter in letters) == ["2", "4"]
+    assert {letter["reason"] for letter in letters} == {"invalid_payload"}
+
+
+def test_validate_batch_of_valid_items(fake_redis: fakeredis.FakeRedis) -> None:
+    valid = tasks._validate_batch(BATCH_TASK, [payload("1"), payload("2")])
+
+    assert [index for index, _ in valid] == [0, 1]
+    assert dead_letters(fake_redis) == []
+
+
+@pytest.mark.parametrize("payloads", [{"order_id": "1"}, "orders", None])
+def test_validate_batch_rejects_a_payload_that_is_not_a_list(
+    fake_redis: fakeredis.FakeRedis, payloads: Any
+) -> None:
+    with pytest.raises(ValidationError):
+        tasks._validate_batch(BATCH_TASK, payloads)
+    assert dead_letters(fake_redis) == []
+
+
+def test_hand_off_reports_sent_without_error(handed_off: list[Any]) -> None:
+    assert tasks._hand_off_failure(BATCH_TASK, "admin", payload("1"), None) == "sent"
+    assert handed_off == []
+
+
+def test_hand_off_retries_without_coalescing(
+    handed_off: list[Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "retry_jitter_seconds", 0.0)
+
+    status = tasks._hand_off_failure(
+        BATCH_TASK, "user", payload("1"), TelegramServerError(status_code=502)
+    )
+
+    assert status == "retrying"
+    assert handed_off == [
+        (
+            "user",
+            {
+                "args": [payload("1")],
+                "kwargs": {"coalesce": False},
+                "countdown": settings.retry_backoff_base_seconds,
+            },
+        )
+    ]
+
+
+def test_hand_off_dead_letters_permanent_errors(
+    fake_redis: fakeredis.FakeRedis, handed_off: list[Any]
+) -> None:
+    status = tasks._hand_off_failure(
+        BATCH_TASK, "user", payload("1"), TelegramForbidden(description="blocked")
+    )
+
+    assert status == "failed"
+    assert handed_off == []
+    [letter] = dead_letters(fake_redis)
+    assert (letter["task_name"], letter["reason"]) == (f"{BATCH_TASK}:user", "TelegramForbidden")
+
+
+def mock_telegram(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Telegram that accepts every message except those to BLOCKED_USER (403)."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content)["chat_id"] == BLOCKED_USER:
+            return httpx.Response(
+                403,
+                json={
+                    "ok": False,
+                    "error_code": 403,
+                    "description": "Forbidden: bot was blocked by the user",
+                },
+            )
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": 1}})
+
+    http = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(telegram_client, "get_http_client", lambda name: http)
+    # A client per test: the per-process one keeps its limiter bound to an earlier test's Redis
+    client = telegram_client.TelegramClient()
+    monkeypatch.setattr(dispatcher, "get_telegram_client", lambda: client)
+
+
+def test_batch_reports_a_blocked_user_as_failed(
+    fake_redis: fakeredis.FakeRedis, handed_off: list[Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_telegram(monkeypatch)
+    payloads = [payload("1"), payload("2", telegram_id=BLOCKED_USER), {"order_id": "3"}]
+
+    results = tasks.send_notification_order_batch.apply(args=[payloads]).get()
+
+    assert results == [
+        {"index": 0, "order_id": "1", "status": "processed", "admin": "sent", "user": "sent"},
+        {"index": 1, "order_id": "2", "status": "processed", "admin": "sent", "user": "failed"},
+        {"index": 2, "status": "invalid"},
+    ]
+    assert handed_off == []
+    assert {letter["reason"] for letter in dead_letters(fake_redis)} == {
+        "invalid_payload",
+        "TelegramForbidden",
+    }
+
+
+def test_combined_task_reports_a_blocked_user_as_failed(
+    fake_redis: fakeredis.FakeRedis, handed_off: list[Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_telegram(monkeypatch)
+
+    result = tasks.send_notification_order.apply(
+        args=[payload("1", telegram_id=BLOCKED_USER)]
+    ).get()
+
+    assert result == {"admin": "sent", "user": "failed"}
+
+
+def test_user_task_still_skips_a_blocked_user(
+    fake_redis: fakeredis.FakeRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mock_telegram(monkeypatch)
+
+    tasks.send_notification_order_user.apply(args=[payload("1", telegram_id=BLOCKED_USER)]).get()
+
+    assert dead_letters(fake_redis) == []
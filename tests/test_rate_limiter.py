@@ -0,0 +1,124 @@
+import fakeredis
+import httpx
+import pytest
+
+from notifications_worker.infra.telegram import client as telegram_client
+from notifications_worker.infra.telegram.errors import (
+    TelegramRateLimitDeferred,
+    TelegramRateLimited,
+)
+from notifications_worker.infra.telegram.rate_limiter import Bucket, TelegramRateLimiter
+
+
+def limiter_for(redis: fakeredis.FakeRedis) -> TelegramRateLimiter:
+    return TelegramRateLimiter(redis_factory=lambda: redis)
+
+
+def test_takes_tokens_up_to_capacity_then_reports_wait(fake_redis: fakeredis.FakeRedis) -> None:
+    limiter = limiter_for(fake_redis)
+    bucket = Bucket(key="tg:rl:test", rate=1.0, capacity=3)
+
+    assert [limiter.take([bucket]) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = limiter.take([bucket])
+    assert 0.9 < wait <= 1.0
+
+
+def test_takes_from_all_buckets_or_none(fake_redis: fakeredis.FakeRedis) -> None:
+    limiter = limiter_for(fake_redis)
+    roomy = Bucket(key="tg:rl:roomy", rate=1.0, capacity=10)
+    tight = Bucket(key="tg:rl:tight", rate=0.5, capacity=1)
+
+    assert limiter.take([roomy, tight]) == 0.0
+    # The tight bucket is empty: the roomy one must not be charged for the refused send
+    assert limiter.take([roomy, tight]) > 1.9
+    tokens = float(fake_redis.hget("tg:rl:roomy", "t") or 0)
+    assert 8.9 < tokens <= 9.0
+
+
+def test_buckets_are_shared_between_limiters(fake_redis: fakeredis.FakeRedis) -> None:
+    bucket = Bucket(key="tg:rl:shared", rate=1.0, capacity=1)
+
+    assert limiter_for(fake_redis).take([bucket]) == 0.0
+    assert limiter_for(fake_redis).take([bucket]) > 0
+
+
+def test_falls_back_to_local_buckets_without_redis(broken_redis: fakeredis.FakeRedis) -> None:
+    limiter = limiter_for(broken_redis)
+    bucket = Bucket(key="tg:rl:local", rate=1.0, capacity=1)
+
+    assert limiter.take([bucket]) == 0.0
+    assert limiter.take([bucket]) > 0
+
+
+def test_group_chat_gets_group_bucket() -> None:
+    limiter = TelegramRateLimiter()
+
+    group = limiter.buckets_for(-100123, thread_id=7)
+    private = limiter.buckets_for(42)
+
+    assert [b.key for b in group] == [
+        "tg:rl:global",
+        "tg:rl:chat:-100123",
+        "tg:rl:thread:-100123:7",
+    ]
+    assert group[1].rate < private[1].rate
+
+
+def test_acquire_defers_instead_of_waiting_too_long(
+    fake_redis: fakeredis.FakeRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        "notifications_worker.infra.telegram.rate_limiter.settings.telegram_rate_limit_max_wait_seconds",
+        0.1,
+    )
+    limiter = limiter_for(fake_redis)
+    limiter.acquire(42)
+
+    with pytest.raises(TelegramRateLimitDeferred) as error:
+        limiter.acquire(42)
+    assert error.value.retry_after == 1
+
+
+def mock_telegram(monkeypatch: pytest.MonkeyPatch, response: httpx.Response) -> list[httpx.Request]:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return response
+
+    http = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(telegram_client, "get_http_client", lambda name: http)
+    return requests
+
+
+def test_client_takes_a_token_before_sending(
+    fake_redis: fakeredis.FakeRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ok = httpx.Response(200, json={"ok": True, "result": {"message_id": 10}})
+    requests = mock_telegram(monkeypatch, ok)
+
+    message_id = telegram_client.TelegramClient().send_message(chat_id=42, text="hi")
+
+    assert message_id == 10
+    assert [request.url.path for request in requests] == ["/bot123456:test/sendMessage"]
+    assert fake_redis.exists("tg:rl:chat:42")
+
+
+def test_telegram_429_is_not_a_deferral(
+    fake_redis: fakeredis.FakeRedis, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    flood = httpx.Response(
+        429,
+        json={
+            "ok": False,
+            "error_code": 429,
+            "description": "Too Many Requests",
+            "parameters": {"retry_after": 7},
+        },
+    )
+    mock_telegram(monkeypatch, flood)
+
+    with pytest.raises(TelegramRateLimited) as error:
+        telegram_client.TelegramClient().send_message(chat_id=42, text="hi")
+    assert not isinstance(error.value, TelegramRateLimitDeferred)
+    assert error.value.retry_after == 7
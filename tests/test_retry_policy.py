@@ -0,0 +1,153 @@
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import fakeredis
+import pytest
+from celery.exceptions import Retry
+from pydantic import ValidationError
+
+from notifications_worker.domain.entities import NotificationsOrderEntity
+from notifications_worker.infra.settings import settings
+from notifications_worker.infra.telegram.errors import (
+    TelegramAPIError,
+    TelegramBadRequest,
+    TelegramForbidden,
+    TelegramRateLimitDeferred,
+    TelegramRateLimited,
+    TelegramServerError,
+    TelegramTransportError,
+)
+from notifications_worker.services.retry_policy import decide_retry, retry_or_dead_letter
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        "notifications_worker.services.retry_policy.settings.retry_jitter_seconds", 0.0
+    )
+
+
+def test_telegram_429_waits_retry_after() -> None:
+    decision = decide_retry(TelegramRateLimited(retry_after=17), retries=3)
+
+    assert decision.retry
+    assert decision.countdown == 17
+    assert decision.reason == "telegram_rate_limited"
+
+
+def test_429_without_retry_after_uses_default() -> None:
+    decision = decide_retry(TelegramRateLimited(), retries=0)
+
+    assert decision.countdown == 10.0
+
+
+def test_ok_false_429_reads_parameters() -> None:
+    error = TelegramAPIError("Too Many Requests", error_code=429, parameters={"retry_after": 4})
+
+    decision = decide_retry(error, retries=0)
+
+    assert (decision.retry, decision.countdown) == (True, 4)
+
+
+def test_limiter_deferral_is_told_apart_from_telegram_429() -> None:
+    decision = decide_retry(TelegramRateLimitDeferred(retry_after=3), retries=0)
+
+    assert (decision.retry, decision.countdown) == (True, 3)
+    assert decision.reason == "rate_limit_deferred"
+
+
+@pytest.mark.parametrize(
+    ("retries", "countdown"),
+    [(0, 5.0), (1, 10.0), (3, 40.0), (6, 300.0), (20, 300.0)],
+)
+def test_transient_errors_back_off_exponentially(retries: int, countdown: float) -> None:
+    for error in (TelegramServerError(status_code=502), TelegramTransportError("reset")):
+        decision = decide_retry(error, retries=retries)
+        assert (decision.retry, decision.countdown) == (True, countdown)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        TelegramBadRequest(description="chat not found"),
+        TelegramForbidden(description="bot was blocked by the user"),
+        TelegramAPIError("Bad Request", error_code=400),
+    ],
+)
+def test_permanent_errors_are_not_retried(error: Exception) -> None:
+    decision = decide_retry(error, retries=0)
+
+    assert not decision.retry
+    assert decision.reason
+
+
+def test_api_5xx_is_retried() -> None:
+    decision = decide_retry(TelegramAPIError("Internal", error_code=500), retries=0)
+
+    assert decision.retry
+
+
+def test_invalid_payload_is_not_retried() -> None:
+    with pytest.raises(ValidationError) as error:
+        NotificationsOrderEntity.model_validate({"order_id": "1"})
+
+    decision = decide_retry(error.value, retries=0)
+
+    assert (decision.retry, decision.reason) == (False, "invalid_payload")
+
+
+def test_unknown_errors_are_retried() -> None:
+    decision = decide_retry(RuntimeError("boom"), retries=0)
+
+    assert decision.retry
+    assert decision.reason == "RuntimeError"
+
+
+class StubTask:
+    """The parts of a bound celery Task that retry_or_dead_letter uses."""
+
+    name = "notifications.send_notification.order.admin"
+    max_retries = 2
+
+    def __init__(self, retries: int) -> None:
+        self.request = SimpleNamespace(id="task-1", retries=retries)
+        self.resent: list[dict[str, Any]] = []
+
+    def retry(self, exc: Exception, countdown: float) -> Retry:
+        self.request.retries += 1
+        return Retry(exc=exc, when=countdown)
+
+    def signature_from_request(self, request: Any, **options: Any) -> Any:
+        return SimpleNamespace(apply_async=lambda: self.resent.append(options))
+
+
+def test_deferral_does_not_count_against_max_retries() -> None:
+    task = StubTask(retries=2)
+
+    with pytest.raises(Retry):
+        retry_or_dead_letter(task, {"order_id": 1}, TelegramRateLimitDeferred(retry_after=3))
+
+    assert task.resent == [{"countdown": 3, "retries": 2}]
+
+
+def test_exhausted_retries_go_to_dead_letter(fake_redis: fakeredis.FakeRedis) -> None:
+    task = StubTask(retries=2)
+
+    with pytest.raises(TelegramServerError):
+        retry_or_dead_letter(task, {"order_id": 1}, TelegramServerError(status_code=502))
+
+    entry = json.loads(fake_redis.lindex(settings.dead_letter_key, 0))
+    assert entry["reason"] == "max_retries_exceeded:TelegramServerError"
+    assert entry["payload"] == {"order_id": 1}
+    assert task.resent == []
+
+
+def test_permanent_error_is_dead_lettered_at_once(fake_redis: fakeredis.FakeRedis) -> None:
+    task = StubTask(retries=0)
+
+    with pytest.raises(TelegramForbidden):
+        retry_or_dead_letter(task, {"order_id": 1}, TelegramForbidden(description="blocked"))
+
+    entry = json.loads(fake_redis.lindex(settings.dead_letter_key, 0))
+    assert (entry["reason"], entry["retries"]) == ("TelegramForbidden", 0)
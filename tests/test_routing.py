@@ -0,0 +1,118 @@
+from collections import Counter
+from typing import Any
+
+import pytest
+
+from notifications_worker.routing import (
+    BULK_LANE,
+    HIGH_LANE,
+    NORMAL_LANE,
+    NOTIFICATION_LANES,
+    WeightedCycle,
+    route_task,
+)
+
+NEW_ORDER = {"order_id": "1", "old_status": "created", "new_status": "created"}
+STATUS_UPDATE = {"order_id": "1", "old_status": "created", "new_status": "paid"}
+
+
+def queue_of(name: str, *args: Any) -> str | None:
+    route = route_task(name, args, {}, {})
+    return route["queue"] if route else None
+
+
+@pytest.mark.parametrize(
+    ("name", "payload", "queue"),
+    [
+        ("notifications.send_notification.order.admin", NEW_ORDER, HIGH_LANE),
+        ("notifications.send_notification.order", NEW_ORDER, HIGH_LANE),
+        ("notifications.send_notification.order.admin", STATUS_UPDATE, NORMAL_LANE),
+        ("notifications.send_notification.order", STATUS_UPDATE, NORMAL_LANE),
+        # The user's copy of a new order is not what operators act on
+        ("notifications.send_notification.order.user", NEW_ORDER, NORMAL_LANE),
+        ("notifications.send_notification.order.batch", [STATUS_UPDATE], BULK_LANE),
+        # New-order alerts of a batch (promo launch peaks) stay in the fast lane
+        ("notifications.send_notification.order.batch", [STATUS_UPDATE, NEW_ORDER], HIGH_LANE),
+        ("notifications.send_notification.order", "not a payload", NORMAL_LANE),
+    ],
+)
+def test_route_task_picks_the_lane(name: str, payload: object, queue: str) -> None:
+    assert queue_of(name, payload) == queue
+
+
+@pytest.mark.parametrize(
+    ("args", "kwargs", "queue"),
+    [
+        ([[NEW_ORDER], ["user"]], {}, BULK_LANE),
+        ([[NEW_ORDER]], {"recipients": ["user"]}, BULK_LANE),
+        ([[NEW_ORDER]], {"recipients": ["admin", "user"]}, HIGH_LANE),
+        ([[NEW_ORDER], None], {}, HIGH_LANE),
+        (["not a list"], {}, BULK_LANE),
+    ],
+)
+def test_batch_is_fast_only_with_new_order_admin_alerts(
+    args: list[Any], kwargs: dict[str, Any], queue: str
+) -> None:
+    route = route_task("notifications.send_notification.order.batch", args, kwargs, {})
+
+    assert route == {"queue": queue}
+
+
+def test_route_task_leaves_other_tasks_alone() -> None:
+    assert queue_of("images.create_variants", {"image_id": 1}) is None
+    assert queue_of("notifications.send_notification.order") == NORMAL_LANE
+
+
+def serve(cycle: WeightedCycle, picks: int, backlogged: set[str]) -> Counter[str]:
+    """Simulate BRPOP: the first queue of consume() that has messages is served."""
+    served: Counter[str] = Counter()
+    for _ in range(picks):
+        queue = next(q for q in cycle.consume(len(cycle.items)) if q in backlogged)
+        cycle.rotate(queue)
+        served[queue] += 1
+    return served
+
+
+def test_backlogged_lanes_are_served_by_weight() -> None:
+    cycle = WeightedCycle(NOTIFICATION_LANES)
+
+    served = serve(cycle, 100, set(NOTIFICATION_LANES))
+
+    assert served == {HIGH_LANE: 60, NORMAL_LANE: 30, BULK_LANE: 10}
+
+
+def test_high_lane_waits_few_slots_behind_a_backlog() -> None:
+    cycle = WeightedCycle(NOTIFICATION_LANES)
+    serve(cycle, 50, {NORMAL_LANE, BULK_LANE})
+
+    # The first alert after the backlog is taken at once
+    assert cycle.consume(3)[0] == HIGH_LANE
+
+
+def test_idle_lane_does_not_take_a_long_run_of_turns() -> None:
+    cycle = WeightedCycle(NOTIFICATION_LANES)
+    serve(cycle, 1000, {NORMAL_LANE, BULK_LANE})
+
+    served = serve(cycle, 10, set(NOTIFICATION_LANES))
+
+    assert served[HIGH_LANE] <= 7
+    assert served[NORMAL_LANE] + served[BULK_LANE] >= 3
+
+
+def test_queues_without_weight_weigh_one() -> None:
+    cycle = WeightedCycle(["images", BULK_LANE])
+
+    served = serve(cycle, 10, {"images", BULK_LANE})
+
+    assert served == {"images": 5, BULK_LANE: 5}
+    assert cycle.rotate("unknown") == "unknown"
+
+
+def test_update_keeps_credits_of_known_queues() -> None:
+    cycle = WeightedCycle(NOTIFICATION_LANES)
+    serve(cycle, 7, set(NOTIFICATION_LANES))
+    credits = dict(cycle.credits)
+
+    cycle.update([HIGH_LANE, NORMAL_LANE])
+
+    assert cycle.credits == {HIGH_LANE: credits[HIGH_LANE], NORMAL_LANE: credits[NORMAL_LANE]}
@@ -0,0 +1,106 @@
+from typing import Any
+
+from notifications_worker.domain.entities import NotificationsOrderEntity
+from notifications_worker.services.templates import (
+    notify_new_order_user,
+    notify_update_status_order_admin,
+    notify_update_status_order_user,
+    render_order_message_admin,
+    render_order_message_admin_with_status,
+)
+
+
+def order(**changes: Any) -> NotificationsOrderEntity:
+    payload = {
+        "order_id": "42",
+        "old_status": "created",
+        "new_status": "created",
+        "phone": "+79990000000",
+        "customer_name": "Анна",
+        "total": "1500.50",
+        "delivery_method": "courier",
+        "created_at": "2026-01-01 10:00",
+    }
+    return NotificationsOrderEntity.model_validate(payload | changes)
+
+
+ADMIN_CARD = (
+    "📦 <b>Заказ #42</b>\n"
+    "👤 <b>Клиент:</b> Анна\n"
+    "📱 <b>Телефон:</b> +79990000000\n"
+    "💰 <b>Сумма:</b> 1500.50\n"
+    "🚚 <b>Доставка:</b> Курьер\n"
+    "📅 <b>Дата:</b> 2026-01-01 10:00"
+)
+
+
+def test_new_order_admin_card() -> None:
+    assert render_order_message_admin(order()) == f"<b>Новый заказ</b>\n\n{ADMIN_CARD}"
+
+
+def test_admin_card_with_optional_fields() -> None:
+    e = order(email="anna@example.com", address="Москва", comment="Позвонить заранее")
+
+    assert render_order_message_admin(e) == (
+        f"<b>Новый заказ</b>\n\n{ADMIN_CARD}\n"
+        "📧 <b>Email:</b> anna@example.com\n"
+        "🗾 <b>Адрес:</b> Москва\n"
+        "\n━━━━━━━━━━━━━━━━━━━━\n\n"
+        "💬 <b>Комментарий:</b>\nПозвонить заранее"
+    )
+
+
+def test_admin_card_with_status() -> None:
+    e = order(old_status="created", new_status="paid", status_comment="Оплата картой")
+
+    assert render_order_message_admin_with_status(e) == (
+        f"💰 <b>Оплачен</b>\n\n{ADMIN_CARD}\n\n💬 <b>Комментарий к статусу:</b>\nОплата картой"
+    )
+
+
+def test_status_update_admin() -> None:
+    e = order(new_status="fulfilled")
+
+    assert notify_update_status_order_admin(e) == (
+        "✅ <b>Статус заказа обновлён</b>\n\n📦 Заказ: #42\nВыполнен"
+    )
+
+
+def test_new_order_user() -> None:
+    assert notify_new_order_user(order()) == (
+        "✅ <b>Заказ #42 создан</b>\n"
+        "В ближайшее время с вами свяжется оператор. Если у вас возникнут вопросы, "
+        "вы можете написать нам, нажав соответствующую кнопку ниже."
+    )
+
+
+def test_status_update_user() -> None:
+    assert notify_update_status_order_user(order(new_status="processing")) == (
+        "🔔 <b>Обновление по заказу #42</b>\n⏳ <b>Новый статус:</b> В обработке"
+    )
+    assert notify_update_status_order_user(
+        order(new_status="cancelled", status_comment="Нет в наличии")
+    ) == (
+        "🔔 <b>Обновление по заказу #42</b>\n❌ <b>Новый статус:</b> Отменён\n\n"
+        "💬 <b>Комментарий:</b>\nНет в наличии"
+    )
+
+
+def test_unknown_delivery_method_is_shown_as_is() -> None:
+    assert "🚚 <b>Доставка:</b> cdek\n" in render_order_message_admin(order(delivery_method="cdek"))
+
+
+def test_user_fields_are_html_escaped() -> None:
+    e = order(
+        customer_name="<b>Anna</b> & Co",
+        comment="1 < 2 > 0",
+        status_comment="<script>",
+        new_status="paid",
+    )
+
+    text = render_order_message_admin_with_status(e)
+
+    assert "👤 <b>Клиент:</b> &lt;b&gt;Anna&lt;/b&gt; &amp; Co\n" in text
+    assert "<b>Комментарий:</b>\n1 &lt; 2 &gt; 0" in text
+    assert text.endswith("<b>Комментарий к статусу:</b>\n&lt;script&gt;")
+    assert "<script>" not in notify_update_status_order_user(e)
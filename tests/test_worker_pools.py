@@ -0,0 +1,33 @@
+import pytest
+
+from notifications_worker.infra.settings import settings
+from notifications_worker.worker_pools import pool_profiles
+
+
+@pytest.mark.parametrize(
+    ("engine", "processes", "pool"),
+    [
+        ("cloudinary", 2, "prefork"),
+        # Prefork children are daemonic: the local engine's process pool needs threads
+        ("local", 2, "threads"),
+        ("local", 0, "prefork"),
+    ],
+)
+def test_default_images_pool(
+    monkeypatch: pytest.MonkeyPatch, engine: str, processes: int, pool: str
+) -> None:
+    monkeypatch.setattr(settings, "images_pool", None)
+    monkeypatch.setattr(settings, "images_engine", engine)
+    monkeypatch.setattr(settings, "images_local_processes", processes)
+
+    assert pool_profiles()["images"].pool == pool
+
+
+def test_explicit_images_pool_wins(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "images_pool", "prefork")
+    monkeypatch.setattr(settings, "images_engine", "local")
+
+    profile = pool_profiles()["images"]
+
+    assert profile.pool == "prefork"
+    assert profile.worker_argv()[profile.worker_argv().index("--pool") + 1] == "prefork"
@@ -0,0 +1,290 @@
+"""
+Local stand-in for the parts of the Cloudinary API the worker uses, for offline runs.
+
+Implements upload (with eager / eager_async), the Admin API resource lookup, destroy
+and CDN delivery of derived images (eager ones, or rendered on the fly on first request
+like the real CDN). With Pillow installed the derived images are real WebP/AVIF files;
+without it they are placeholder bytes with the right sizes in the metadata.
+
+    python tools/fakes/cloudinary.py --port 8123 --eager-delay 2
+
+and run the worker with CLOUDINARY_API_BASE_URL=http://127.0.0.1:8123.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import json
+import re
+import threading
+import time
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qsl, unquote
+
+PLACEHOLDER_SIZE = (1600, 1200)
+
+_UPLOAD = re.compile(r"^/v1_1/(?P<cloud>[^/]+)/image/(?P<action>upload|destroy)$")
+_RESOURCE = re.compile(r"^/v1_1/(?P<cloud>[^/]+)/resources/image/upload/(?P<public_id>.+)$")
+_DELIVERY = re.compile(
+    r"^/(?P<cloud>[^/]+)/image/upload/(?P<transformation>[^/]+)/v(?P<version>\d+)/"
+    r"(?P<public_id>.+)\.(?P<format>\w+)$"
+)
+
+
+@dataclass
+class _Asset:
+    original: bytes | None
+    width: int
+    height: int
+    version: int
+    # "c_limit,h_150,q_80,w_150/webp" -> (bytes, width, height)
+    derived: dict[str, tuple[bytes, int, int]] = field(default_factory=dict)
+
+
+class FakeCloudinary:
+    """In-memory Cloudinary. start() serves it on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, eager_delay: float = 1.0) -> None:
+        self.eager_delay = eager_delay
+        self.assets: dict[str, _Asset] = {}
+        self.calls: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeCloudinary":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    # --- API ---------------------------------------------------------------------------
+
+    def upload(self, cloud: str, fields: dict[str, str | bytes]) -> dict[str, object]:
+        public_id = str(fields.get("public_id") or f"fake/{time.monotonic_ns()}")
+        original = _load_original(fields.get("file"))
+        width, height = _image_size(original) if original else PLACEHOLDER_SIZE
+        asset = _Asset(original=original, width=width, height=height, version=int(time.time()))
+        with self._lock:
+            self.assets[public_id] = asset
+
+        eager = [t for t in str(fields.get("eager") or "").split("|") if t]
+        eager_async = str(fields.get("eager_async", "")).lower() in ("1", "true")
+        response: dict[str, object] = {
+            "public_id": public_id,
+            "version": asset.version,
+            "width": width,
+            "height": height,
+            "format": "jpg",
+            "resource_type": "image",
+        }
+        if eager_async:
+            response["eager"] = [{"status": "processing", "batch_id": public_id} for _ in eager]
+            timer = threading.Timer(self.eager_delay, self._derive, (asset, eager))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._derive(asset, eager)
+            response["eager"] = [self._derived_info(cloud, public_id, asset, t) for t in eager]
+        return response
+
+    def resource(self, cloud: str, public_id: str) -> dict[str, object] | None:
+        asset = self.assets.get(public_id)
+        if asset is None:
+            return None
+        return {
+            "public_id": public_id,
+            "version": asset.version,
+            "width": asset.width,
+            "height": asset.height,
+            "derived": [
+                {"transformation": t, **self._derived_info(cloud, public_id, asset, t)}
+                for t in list(asset.derived)
+            ],
+        }
+
+    def destroy(self, public_id: str) -> dict[str, object]:
+        with self._lock:
+            found = self.assets.pop(public_id, None) is not None
+        return {"result": "ok" if found else "not found"}
+
+    def deliver(self, public_id: str, transformation: str) -> bytes | None:
+        asset = self.assets.get(public_id)
+        if asset is None:
+            return None
+        derived = asset.derived.get(transformation)
+        if derived is None:
+            # On-the-fly transformation; like the real CDN it is not listed in "derived"
+            derived = _render(asset, transformation)
+        return derived[0]
+
+    def _derive(self, asset: _Asset, eager: list[str]) -> None:
+        for transformation in eager:
+            asset.derived[transformation] = _render(asset, transformation)
+
+    def _derived_info(
+        self, cloud: str, public_id: str, asset: _Asset, transformation: str
+    ) -> dict[str, object]:
+        data, width, height = asset.derived[transformation]
+        options, _, fmt = transformation.partition("/")
+        url = f"{self.base_url}/{cloud}/image/upload/{options}/v{asset.version}/{public_id}.{fmt}"
+        return {
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+            "format": fmt,
+            "url": url,
+            "secure_url": url,
+        }
+
+
+def _handler_for(fake: FakeCloudinary) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:  # noqa: N802
+            match = _UPLOAD.match(self.path.split("?")[0])
+            if not match:
+                return self._json(404, {"error": {"message": "not found"}})
+            fields = self._form()
+            action = match["action"]
+            fake.calls[action] += 1
+            if action == "upload":
+                return self._json(200, fake.upload(match["cloud"], fields))
+            return self._json(200, fake.destroy(str(fields.get("public_id", ""))))
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._get(head=False)
+
+        def do_HEAD(self) -> None:  # noqa: N802
+            self._get(head=True)
+
+        def _get(self, head: bool) -> None:
+            path = unquote(self.path.split("?")[0])
+            if match := _RESOURCE.match(path):
+                fake.calls["resource"] += 1
+                resource = fake.resource(match["cloud"], match["public_id"])
+                if resource is None:
+                    return self._json(404, {"error": {"message": "Resource not found"}})
+                return self._json(200, resource)
+            if match := _DELIVERY.match(path):
+                fake.calls["deliver"] += 1
+                transformation = f"{match['transformation']}/{match['format']}"
+                data = fake.deliver(match["public_id"], transformation)
+                if data is None:
+                    return self._send(404, b"", "text/plain", head)
+                return self._send(200, data, f"image/{match['format']}", head)
+            # Warmup and anything else
+            return self._send(200, b"", "text/plain", head)
+
+        def _form(self) -> dict[str, str | bytes]:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            content_type = self.headers.get("Content-Type", "")
+            if not content_type.startswith("multipart/"):
+                return dict(parse_qsl(body.decode()))
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            fields: dict[str, str | bytes] = {}
+            for part in message.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                payload = part.get_payload(decode=True) or b""
+                fields[str(name)] = payload if part.get_filename() else payload.decode()
+            return fields
+
+        def _json(self, status: int, payload: dict[str, object]) -> None:
+            self._send(status, json.dumps(payload).encode(), "application/json", False)
+
+        def _send(self, status: int, data: bytes, content_type: str, head: bool) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            pass
+
+    return Handler
+
+
+def _load_original(file: str | bytes | None) -> bytes | None:
+    if isinstance(file, bytes):
+        return file
+    if file and file.startswith(("http://", "https://")):
+        try:
+            with urllib.request.urlopen(file, timeout=5) as response:  # noqa: S310
+                return bytes(response.read())
+        except OSError:
+            return None
+    return None
+
+
+def _image_size(data: bytes) -> tuple[int, int]:
+    try:
+        from PIL import Image
+    except ImportError:
+        return PLACEHOLDER_SIZE
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return image.size
+    except OSError:
+        return PLACEHOLDER_SIZE
+
+
+def _render(asset: _Asset, transformation: str) -> tuple[bytes, int, int]:
+    """Apply a "c_fit|c_limit,h_..,q_..,w_../webp|avif" transformation."""
+    options, _, fmt = transformation.partition("/")
+    params = dict(item.split("_", 1) for item in options.split(",") if "_" in item)
+    box_width = int(params.get("w", asset.width))
+    box_height = int(params.get("h", asset.height))
+    scale = min(box_width / asset.width, box_height / asset.height)
+    if params.get("c") == "limit":
+        scale = min(scale, 1.0)
+    size = max(1, round(asset.width * scale)), max(1, round(asset.height * scale))
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\0" * (size[0] * size[1] // 20 + 64), size[0], size[1]
+
+    if asset.original:
+        with Image.open(BytesIO(asset.original)) as opened:
+            image = opened.convert("RGB").resize(size)
+    else:
+        image = Image.linear_gradient("L").convert("RGB").resize(size)
+    buffer = BytesIO()
+    image.save(buffer, (fmt or "webp").upper(), quality=int(params.get("q", 80)))
+    return buffer.getvalue(), size[0], size[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--eager-delay", type=float, default=1.0, help="seconds until eager_async")
+    args = parser.parse_args()
+
+    fake = FakeCloudinary(args.host, args.port, args.eager_delay)
+    print(f"Fake Cloudinary on {fake.base_url}")
+    fake.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local stand-in for the LeafFlow Internal API endpoints the worker calls, for offline runs.
+
+Accepts variant metadata on POST /v1/internal/images/variants/bulk and
+POST /v1/internal/images/{image_id}/variants (--no-bulk answers 404 on the bulk one, like
+an older server) and remembers it with the time it arrived. --latency delays every call.
+
+    python tools/fakes/leafflow.py --port 8125
+
+and run the worker with API_BASE_URL=http://127.0.0.1:8125.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_BULK = "/v1/internal/images/variants/bulk"
+_SINGLE = re.compile(r"^/v1/internal/images/(?P<image_id>\d+)/variants$")
+
+
+class FakeLeafFlow:
+    """In-memory LeafFlow. start() serves it on a background thread."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        bulk: bool = True,
+    ) -> None:
+        self.latency = latency
+        self.bulk = bulk
+        self.calls: Counter[str] = Counter()
+        # image_id -> variant -> metadata
+        self.variants: dict[int, dict[str, dict[str, object]]] = {}
+        # image_id -> time.time() of the last save
+        self.saved_at: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeLeafFlow":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.variants.clear()
+            self.saved_at.clear()
+
+    def save(self, image_id: int, variants: list[dict[str, object]]) -> None:
+        with self._lock:
+            stored = self.variants.setdefault(image_id, {})
+            for variant in variants:
+                stored[str(variant.get("variant"))] = variant
+            self.saved_at[image_id] = time.time()
+
+
+def _handler_for(fake: FakeLeafFlow) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:  # noqa: N802
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if fake.latency > 0:
+                time.sleep(fake.latency)
+            path = self.path.split("?")[0]
+
+            if path == _BULK and fake.bulk:
+                fake.calls["bulk"] += 1
+                for image in body.get("images", []):
+                    fake.save(int(image["image_id"]), list(image.get("variants", [])))
+                return self._json(200, {"ok": True})
+            if match := _SINGLE.match(path):
+                fake.calls["single"] += 1
+                fake.save(int(match["image_id"]), [body])
+                return self._json(200, {"ok": True})
+            return self._json(404, {"detail": "Not Found"})
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._send(200, b"", head=False)
+
+        def do_HEAD(self) -> None:  # noqa: N802
+            # Warmup
+            self._send(200, b"", head=True)
+
+        def _json(self, status: int, payload: dict[str, object]) -> None:
+            self._send(status, json.dumps(payload).encode(), head=False)
+
+        def _send(self, status: int, data: bytes, head: bool) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8125)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    parser.add_argument("--no-bulk", action="store_true", help="404 on the bulk endpoint")
+    args = parser.parse_args()
+
+    fake = FakeLeafFlow(args.host, args.port, latency=args.latency, bulk=not args.no_bulk)
+    print(f"Fake LeafFlow on {fake.base_url}")
+    fake.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
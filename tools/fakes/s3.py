@@ -0,0 +1,251 @@
+"""
+Local S3-compatible endpoint for offline runs: the object and multipart calls boto3 makes
+for the worker (put/get/head/delete object, create/upload part/complete/abort multipart),
+path-style, in memory. Buckets spring into existence on first use; signatures are not
+checked. --latency delays every call.
+
+    python tools/fakes/s3.py --port 8126
+
+and run the worker with S3_ENDPOINT=http://127.0.0.1:8126.
+"""
+
+import argparse
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+@dataclass(slots=True)
+class _Object:
+    data: bytes
+    etag: str
+    content_type: str
+
+
+class FakeS3:
+    """In-memory S3. start() serves it on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, *, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        # (bucket, key) -> object
+        self.objects: dict[tuple[str, str], _Object] = {}
+        # upload_id -> (content type, part number -> data)
+        self._uploads: dict[str, tuple[str, dict[int, bytes]]] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeS3":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def put(self, bucket: str, key: str, data: bytes, content_type: str) -> str:
+        etag = hashlib.md5(data).hexdigest()  # noqa: S324 - S3 ETag
+        with self._lock:
+            self.objects[bucket, key] = _Object(data, etag, content_type)
+        return etag
+
+    def url(self, bucket: str, key: str) -> str:
+        return f"{self.base_url}/{bucket}/{key}"
+
+    def create_upload(self, content_type: str) -> str:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = (content_type, {})
+        return upload_id
+
+    def upload_part(self, upload_id: str, number: int, data: bytes) -> str | None:
+        with self._lock:
+            upload = self._uploads.get(upload_id)
+            if upload is None:
+                return None
+            upload[1][number] = data
+        return hashlib.md5(data).hexdigest()  # noqa: S324
+
+    def complete_upload(self, bucket: str, key: str, upload_id: str) -> str | None:
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is None:
+            return None
+        content_type, parts = upload
+        ordered = [parts[number] for number in sorted(parts)]
+        digests = b"".join(hashlib.md5(part).digest() for part in ordered)  # noqa: S324
+        etag = f"{hashlib.md5(digests).hexdigest()}-{len(ordered)}"  # noqa: S324
+        with self._lock:
+            self.objects[bucket, key] = _Object(b"".join(ordered), etag, content_type)
+        return etag
+
+    def abort_upload(self, upload_id: str) -> None:
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
+
+def _decode_aws_chunked(body: bytes) -> bytes:
+    """Payload of a `Content-Encoding: aws-chunked` body (size;signature\\r\\ndata\\r\\n...)."""
+    data = bytearray()
+    position = 0
+    while True:
+        line_end = body.index(b"\r\n", position)
+        size = int(body[position:line_end].split(b";")[0], 16)
+        if size == 0:
+            return bytes(data)
+        start = line_end + 2
+        data += body[start : start + size]
+        position = start + size + 2
+
+
+def _handler_for(fake: FakeS3) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_PUT(self) -> None:  # noqa: N802
+            bucket, key, query = self._target()
+            data = self._body()
+            if "uploadId" in query:
+                fake.calls["upload_part"] += 1
+                etag = fake.upload_part(query["uploadId"], int(query["partNumber"]), data)
+                if etag is None:
+                    return self._error(404, "NoSuchUpload")
+                return self._send(200, b"", {"ETag": f'"{etag}"'})
+            fake.calls["put_object"] += 1
+            etag = fake.put(bucket, key, data, self._content_type())
+            self._send(200, b"", {"ETag": f'"{etag}"'})
+
+        def do_POST(self) -> None:  # noqa: N802
+            bucket, key, query = self._target()
+            self._body()
+            if "uploads" in query:
+                fake.calls["create_multipart_upload"] += 1
+                upload_id = fake.create_upload(self._content_type())
+                return self._xml(
+                    "InitiateMultipartUploadResult",
+                    f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                    f"<UploadId>{upload_id}</UploadId>",
+                )
+            if "uploadId" in query:
+                fake.calls["complete_multipart_upload"] += 1
+                etag = fake.complete_upload(bucket, key, query["uploadId"])
+                if etag is None:
+                    return self._error(404, "NoSuchUpload")
+                return self._xml(
+                    "CompleteMultipartUploadResult",
+                    f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                    f"<ETag>&quot;{etag}&quot;</ETag>",
+                )
+            self._error(400, "InvalidRequest")
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._get(head=False)
+
+        def do_HEAD(self) -> None:  # noqa: N802
+            self._get(head=True)
+
+        def do_DELETE(self) -> None:  # noqa: N802
+            bucket, key, query = self._target()
+            if "uploadId" in query:
+                fake.calls["abort_multipart_upload"] += 1
+                fake.abort_upload(query["uploadId"])
+            else:
+                fake.calls["delete_object"] += 1
+                fake.objects.pop((bucket, key), None)
+            self._send(204, b"")
+
+        def _get(self, head: bool) -> None:
+            bucket, key, _ = self._target()
+            if not key:
+                # Bucket checks and warmup
+                return self._send(200, b"", head=head)
+            fake.calls["head_object" if head else "get_object"] += 1
+            obj = fake.objects.get((bucket, key))
+            if obj is None:
+                return self._error(404, "NoSuchKey", head=head)
+            self._send(
+                200,
+                obj.data,
+                {"ETag": f'"{obj.etag}"', "Content-Type": obj.content_type},
+                head=head,
+            )
+
+        def _target(self) -> tuple[str, str, dict[str, str]]:
+            if fake.latency > 0:
+                time.sleep(fake.latency)
+            url = urlsplit(self.path)
+            bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+            query = {name: values[0] for name, values in parse_qs(url.query, True).items()}
+            return bucket, key, query
+
+        def _body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if "aws-chunked" in self.headers.get("Content-Encoding", ""):
+                return _decode_aws_chunked(body)
+            return body
+
+        def _content_type(self) -> str:
+            return self.headers.get("Content-Type") or "binary/octet-stream"
+
+        def _xml(self, root: str, inner: str) -> None:
+            body = (
+                f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<{root} xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{inner}</{root}>'
+            )
+            self._send(200, body.encode(), {"Content-Type": "application/xml"})
+
+        def _error(self, status: int, code: str, head: bool = False) -> None:
+            body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code></Error>'
+            self._send(status, body.encode(), {"Content-Type": "application/xml"}, head=head)
+
+        def _send(
+            self,
+            status: int,
+            data: bytes,
+            headers: dict[str, str] | None = None,
+            head: bool = False,
+        ) -> None:
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8126)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    args = parser.parse_args()
+
+    fake = FakeS3(args.host, args.port, latency=args.latency)
+    print(f"Fake S3 on {fake.base_url}")
+    fake.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
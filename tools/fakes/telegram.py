@@ -0,0 +1,259 @@
+"""
+Local stand-in for the Telegram Bot API methods the worker calls, for offline runs.
+
+sendMessage and editMessageText behave like the real API where it matters for load:
+
+- flood limits: over --global-per-second messages in total, --chat-per-second to one
+  private chat or --group-per-minute to one group answer 429 with parameters.retry_after
+  (0 disables a limit);
+- private chats with chat_id % 100 < --blocked-percent answer 403 "bot was blocked";
+- every call waits --latency seconds plus up to --jitter more, and --error-rate of them
+  answer 502;
+- editing a message with the same text answers 400 "message is not modified".
+
+    python tools/fakes/telegram.py --port 8124 --latency 0.05
+
+and run the worker with TELEGRAM_API_BASE_URL=http://127.0.0.1:8124.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_METHOD = re.compile(r"^/bot(?P<token>[^/]+)/(?P<method>\w+)$")
+
+
+class _Window:
+    """At most `limit` events per `seconds` (sliding window)."""
+
+    def __init__(self, limit: float, seconds: float) -> None:
+        self.limit = limit
+        self.seconds = seconds
+        self.events: deque[float] = deque()
+
+    def retry_after(self, now: float) -> int:
+        """0 if an event fits now (and records it), else seconds until it would."""
+        if self.limit <= 0:
+            return 0
+        while self.events and self.events[0] <= now - self.seconds:
+            self.events.popleft()
+        if len(self.events) >= self.limit:
+            return max(1, math.ceil(self.events[0] + self.seconds - now))
+        self.events.append(now)
+        return 0
+
+
+class FakeTelegram:
+    """In-memory Bot API. start() serves it on a background thread."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        blocked_percent: int = 0,
+        global_per_second: float = 30,
+        chat_per_second: float = 1,
+        group_per_minute: float = 20,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.blocked_percent = blocked_percent
+        self.global_per_second = global_per_second
+        self.chat_per_second = chat_per_second
+        self.group_per_minute = group_per_minute
+        # "sendMessage 200", "sendMessage 429", ...
+        self.calls: Counter[str] = Counter()
+        # chat_id -> message_id -> text
+        self.messages: dict[int, dict[int, str]] = {}
+        self._global = _Window(global_per_second, 1)
+        self._chats: dict[int, _Window] = {}
+        self._next_message_id = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTelegram":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def reset(self) -> None:
+        """Forget messages, counters and flood windows (between load test runs)."""
+        with self._lock:
+            self.calls.clear()
+            self.messages.clear()
+            self._global = _Window(self.global_per_second, 1)
+            self._chats.clear()
+
+    # --- API ---------------------------------------------------------------------------
+
+    def call(self, method: str, body: dict[str, object]) -> tuple[int, dict[str, object]]:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        status, response = self._answer(method, body)
+        self.calls[f"{method} {status}"] += 1
+        return status, response
+
+    def _answer(self, method: str, body: dict[str, object]) -> tuple[int, dict[str, object]]:
+        if method not in ("sendMessage", "editMessageText"):
+            return 200, {"ok": True, "result": True}
+        if random.random() < self.error_rate:
+            return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}
+
+        try:
+            chat_id = int(body["chat_id"])  # type: ignore[call-overload]
+        except (KeyError, TypeError, ValueError):
+            return _error(400, "Bad Request: chat_id is empty")
+        if chat_id > 0 and chat_id % 100 < self.blocked_percent:
+            return _error(403, "Forbidden: bot was blocked by the user")
+
+        with self._lock:
+            now = time.monotonic()
+            retry_after = self._global.retry_after(now) or self._chat_window(chat_id).retry_after(
+                now
+            )
+            if retry_after:
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                }
+            chat = self.messages.setdefault(chat_id, {})
+            text = str(body.get("text", ""))
+
+            if method == "editMessageText":
+                message_id = int(body.get("message_id") or 0)  # type: ignore[call-overload]
+                if message_id not in chat:
+                    return _error(400, "Bad Request: message to edit not found")
+                if chat[message_id] == text:
+                    return _error(
+                        400,
+                        "Bad Request: message is not modified: specified new message content "
+                        "and reply markup are exactly the same as a current content and reply "
+                        "markup of the message",
+                    )
+            else:
+                self._next_message_id += 1
+                message_id = self._next_message_id
+            chat[message_id] = text
+
+        return 200, {
+            "ok": True,
+            "result": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+                "text": text,
+            },
+        }
+
+    def _chat_window(self, chat_id: int) -> _Window:
+        window = self._chats.get(chat_id)
+        if window is None:
+            if chat_id > 0:
+                window = _Window(self.chat_per_second, 1)
+            else:
+                window = _Window(self.group_per_minute, 60)
+            self._chats[chat_id] = window
+        return window
+
+
+def _error(status: int, description: str) -> tuple[int, dict[str, object]]:
+    return status, {"ok": False, "error_code": status, "description": description}
+
+
+def _handler_for(fake: FakeTelegram) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:  # noqa: N802
+            match = _METHOD.match(self.path.split("?")[0])
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if not match:
+                return self._json(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                body = {}
+            status, response = fake.call(match["method"], body if isinstance(body, dict) else {})
+            self._json(status, response)
+
+        def do_GET(self) -> None:  # noqa: N802
+            self._send(200, b"", head=False)
+
+        def do_HEAD(self) -> None:  # noqa: N802
+            # Warmup
+            self._send(200, b"", head=True)
+
+        def _json(self, status: int, payload: dict[str, object]) -> None:
+            self._send(status, json.dumps(payload).encode(), head=False)
+
+        def _send(self, status: int, data: bytes, head: bool) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(data)
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8124)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answering 502")
+    parser.add_argument("--blocked-percent", type=int, default=0)
+    parser.add_argument("--global-per-second", type=float, default=30)
+    parser.add_argument("--chat-per-second", type=float, default=1)
+    parser.add_argument("--group-per-minute", type=float, default=20)
+    args = parser.parse_args()
+
+    fake = FakeTelegram(
+        args.host,
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        blocked_percent=args.blocked_percent,
+        global_per_second=args.global_per_second,
+        chat_per_second=args.chat_per_second,
+        group_per_minute=args.group_per_minute,
+    )
+    print(f"Fake Telegram on {fake.base_url}")
+    fake.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,492 @@
+"""
+End-to-end load test of the worker against local stand-ins of all its upstreams.
+
+Starts the fake Telegram, S3, Cloudinary and LeafFlow servers from tools/fakes, points the
+worker's settings at them and, for every --config, starts a worker process, enqueues the
+same synthetic load (per-recipient order notifications, new orders and status updates
+alternating, and images.create_variants), waits for it to drain and reports throughput,
+p50/p95/p99 latency (enqueue to the final result; for images, to the variant metadata
+reaching LeafFlow) and retries. New-order admin alerts (routed to the notifications.high lane)
+are reported apart from the other notifications.
+
+    PYTHONPATH=src python tools/loadtest.py --notifications 500 --images 20 \\
+        --config "pool=prefork concurrency=4 prefetch=1" \\
+        --config "pool=prefork concurrency=8 prefetch=4" \\
+        --config "pool=threads concurrency=100 NOTIFICATIONS_ENGINE=async"
+
+A config is space-separated key=value pairs: pool, concurrency and prefetch (the worker's
+--pool, --concurrency and --prefetch-multiplier); UPPER_CASE keys are passed to the worker
+as environment (any Settings field). Telegram behaviour is set with --telegram-* (latency,
+flood limits, blocked users, 5xx rate).
+
+Needs a running Redis (--redis-url). The harness uses its databases 13-15 as broker,
+result backend and worker state and FLUSHES them before every config. Retries by error
+come from the worker's metrics (needs the `metrics` extra, otherwise "n/a").
+"""
+
+import argparse
+import json
+import os
+import random
+import shlex
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes.cloudinary import FakeCloudinary  # noqa: E402
+from fakes.leafflow import FakeLeafFlow  # noqa: E402
+from fakes.s3 import FakeS3  # noqa: E402
+from fakes.telegram import FakeTelegram  # noqa: E402
+
+ADMIN_CHAT_ID = -1001000000001
+BUCKET = "loadtest"
+# Telegram ids of synthetic users; the fake blocks chat_id % 100 < --telegram-blocked-percent
+FIRST_USER_ID = 700_000_000
+ORIGINAL_SIZE = (2400, 1600)
+
+ADMIN_TASK = "notifications.send_notification.order.admin"
+USER_TASK = "notifications.send_notification.order.user"
+IMAGE_TASK = "images.create_variants"
+
+
+@dataclass
+class Config:
+    name: str
+    pool: str = "prefork"
+    concurrency: int = 4
+    prefetch: int = 1
+    env: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, text: str) -> "Config":
+        config = cls(name=text)
+        for item in shlex.split(text):
+            key, _, value = item.partition("=")
+            if key == "pool":
+                config.pool = value
+            elif key == "concurrency":
+                config.concurrency = int(value)
+            elif key == "prefetch":
+                config.prefetch = int(value)
+            elif key.isupper():
+                config.env[key] = value
+            else:
+                raise SystemExit(f"Unknown config key {key!r} in {text!r}")
+        return config
+
+
+@dataclass
+class Outcome:
+    kind: str
+    enqueued: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    latencies: list[float] = field(default_factory=list)
+    first_enqueued: float = 0.0
+    last_finished: float = 0.0
+
+    def summary(self) -> dict[str, Any]:
+        wall = max(self.last_finished - self.first_enqueued, 1e-9)
+        finished = self.succeeded + self.failed
+        return {
+            "enqueued": self.enqueued,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "lost": self.enqueued - finished,
+            "seconds": round(wall, 3) if finished else None,
+            "per_second": round(finished / wall, 2) if finished else None,
+            "p50_ms": _percentile(self.latencies, 50),
+            "p95_ms": _percentile(self.latencies, 95),
+            "p99_ms": _percentile(self.latencies, 99),
+        }
+
+
+def start_fakes(args: argparse.Namespace) -> dict[str, Any]:
+    return {
+        "telegram": FakeTelegram(
+            latency=args.telegram_latency,
+            jitter=args.telegram_jitter,
+            error_rate=args.telegram_error_rate,
+            blocked_percent=args.telegram_blocked_percent,
+            global_per_second=args.telegram_global_per_second,
+            chat_per_second=args.telegram_chat_per_second,
+            group_per_minute=args.telegram_group_per_minute,
+        ).start(),
+        "s3": FakeS3(latency=args.upstream_latency).start(),
+        "cloudinary": FakeCloudinary(eager_delay=args.cloudinary_eager_delay).start(),
+        "leafflow": FakeLeafFlow(latency=args.upstream_latency).start(),
+    }
+
+
+def point_settings_at(fakes: dict[str, Any], redis_url: str) -> None:
+    """Environment of this process and the workers it starts (read by Settings)."""
+    redis_url = redis_url.rstrip("/")
+    os.environ.update(
+        {
+            "TELEGRAM_BOT_TOKEN": "123456:loadtest",
+            "ADMIN_CHAT_ID": str(ADMIN_CHAT_ID),
+            "TELEGRAM_API_BASE_URL": fakes["telegram"].base_url,
+            "S3_ENDPOINT": fakes["s3"].base_url,
+            "S3_ACCESS_KEY": "loadtest",
+            "S3_SECRET_KEY": "loadtest",
+            "S3_BUCKET": BUCKET,
+            "API_BASE_URL": fakes["leafflow"].base_url,
+            "INTERNAL_TOKEN": "loadtest",
+            "CLOUDINARY_CLOUD_NAME": "loadtest",
+            "CLOUDINARY_API_KEY": "loadtest",
+            "CLOUDINARY_API_SECRET": "loadtest",
+            "CLOUDINARY_API_BASE_URL": fakes["cloudinary"].base_url,
+            "CELERY_BROKER_URL": f"{redis_url}/13",
+            "CELERY_RESULT_BACKEND": f"{redis_url}/14",
+            "REDIS_STATE_URL": f"{redis_url}/15",
+            # Every synthetic status update is measured on its own
+            "NOTIFICATIONS_COALESCE_WINDOW_SECONDS": "0",
+        }
+    )
+
+
+def original_image(index: int) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        # Enough for the fake Cloudinary (placeholder renders); the local engine needs Pillow
+        return random.Random(index).randbytes(256 * 1024)
+    image = Image.effect_mandelbrot(ORIGINAL_SIZE, (-2.0 + index * 0.01, -1.2, 0.6, 1.2), 100)
+    buffer = BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def order_payload(index: int) -> dict[str, Any]:
+    new_order = index % 2 == 0
+    return {
+        "order_id": f"LT-{index:07d}",
+        "telegram_id": FIRST_USER_ID + index,
+        "old_status": "created" if new_order else "processing",
+        "new_status": "created" if new_order else "paid",
+        "comment": "Позвоните за час до доставки, домофон не работает.",
+        "phone": "+7 999 123-45-67",
+        "customer_name": "Иванова Мария Петровна",
+        "total": f"{1000 + index}.00",
+        "delivery_method": "courier",
+        "email": "maria.ivanova@example.com",
+        "address": "г. Москва, ул. Лесная, д. 5, кв. 12",
+        "status_comment": None if new_order else "Оплата получена",
+        "created_at": "2026-10-18T12:00:00+03:00",
+    }
+
+
+def image_payload(fakes: dict[str, Any], run: str, index: int, original: bytes) -> dict[str, Any]:
+    key = f"products/loadtest/{run}/{index}.jpg"
+    fakes["s3"].put(BUCKET, key, original, "image/jpeg")
+    return {
+        "image_id": index + 1,
+        "product_id": f"loadtest-{index}",
+        "original_url": fakes["s3"].url(BUCKET, key),
+        "original_key": key,
+        "original_format": "jpg",
+        "original_width": ORIGINAL_SIZE[0],
+        "original_height": ORIGINAL_SIZE[1],
+    }
+
+
+def run_config(
+    config: Config,
+    number: int,
+    args: argparse.Namespace,
+    fakes: dict[str, Any],
+    originals: list[bytes],
+    workdir: Path,
+) -> dict[str, Any]:
+    from celery.result import AsyncResult
+
+    from notifications_worker.app import celery_app
+
+    _flush_redis()
+    fakes["telegram"].reset()
+    fakes["leafflow"].reset()
+    fakes["cloudinary"].calls.clear()
+
+    metrics_dir = workdir / f"metrics-{number}"
+    log_path = workdir / f"worker-{number}.log"
+    worker = _start_worker(config, number, args, metrics_dir, log_path)
+    try:
+        _wait_ready(celery_app, worker, log_path)
+
+        run = f"{number}-{int(time.time())}"
+        new_orders = Outcome("new_orders")
+        notifications = Outcome("notifications")
+        images = Outcome("images")
+        pending: dict[str, tuple[Outcome, float]] = {}
+        image_tasks: dict[int, tuple[str, float]] = {}
+
+        started = time.time()
+        new_orders.first_enqueued = notifications.first_enqueued = images.first_enqueued = started
+        for index in range(args.notifications):
+            payload = order_payload(index)
+            for task in (ADMIN_TASK, USER_TASK):
+                # Sent through the worker's router, as the backend would with queue=
+                result = celery_app.send_task(task, args=[payload])
+                new_order = task == ADMIN_TASK and payload["new_status"] == "created"
+                pending[result.id] = (new_orders if new_order else notifications, time.time())
+        for index in range(args.images):
+            payload = image_payload(fakes, run, index, originals[index % len(originals)])
+            result = celery_app.send_task(IMAGE_TASK, args=[payload])
+            image_tasks[payload["image_id"]] = (result.id, time.time())
+        for outcome, _ in pending.values():
+            outcome.enqueued += 1
+        images.enqueued = len(image_tasks)
+
+        deadline = time.monotonic() + args.timeout
+        while (pending or image_tasks) and time.monotonic() < deadline:
+            if worker.poll() is not None:
+                raise SystemExit(f"Worker exited with {worker.returncode}, see {log_path}")
+            for task_id, (outcome, enqueued_at) in list(pending.items()):
+                result = AsyncResult(task_id, app=celery_app)
+                if not result.ready():
+                    continue
+                finished_at = _timestamp(result.date_done)
+                _record(outcome, result.successful(), enqueued_at, finished_at)
+                del pending[task_id]
+            for image_id, (task_id, enqueued_at) in list(image_tasks.items()):
+                saved_at = fakes["leafflow"].saved_at.get(image_id)
+                if saved_at is not None:
+                    _record(images, True, enqueued_at, saved_at)
+                elif AsyncResult(task_id, app=celery_app).failed():
+                    _record(images, False, enqueued_at, time.time())
+                else:
+                    continue
+                del image_tasks[image_id]
+            time.sleep(0.2)
+    finally:
+        _stop_worker(worker)
+
+    return {
+        "config": config.name,
+        "new_orders": new_orders.summary(),
+        "notifications": notifications.summary(),
+        "images": images.summary(),
+        "retries": _read_retries(metrics_dir),
+        "telegram_calls": dict(fakes["telegram"].calls),
+        "cloudinary_calls": dict(fakes["cloudinary"].calls),
+    }
+
+
+def _record(outcome: Outcome, succeeded: bool, enqueued_at: float, finished_at: float) -> None:
+    if succeeded:
+        outcome.succeeded += 1
+        outcome.latencies.append(finished_at - enqueued_at)
+    else:
+        outcome.failed += 1
+    outcome.last_finished = max(outcome.last_finished, finished_at)
+
+
+def _timestamp(date_done: datetime | None) -> float:
+    if date_done is None:
+        return time.time()
+    if date_done.tzinfo is None:
+        date_done = date_done.replace(tzinfo=UTC)
+    return date_done.timestamp()
+
+
+def _flush_redis() -> None:
+    import redis
+
+    for variable in ("CELERY_BROKER_URL", "CELERY_RESULT_BACKEND", "REDIS_STATE_URL"):
+        redis.Redis.from_url(os.environ[variable]).flushdb()
+
+
+def _start_worker(
+    config: Config,
+    number: int,
+    args: argparse.Namespace,
+    metrics_dir: Path,
+    log_path: Path,
+) -> subprocess.Popen[bytes]:
+    env = {**os.environ, **config.env}
+    if _has_prometheus():
+        env.update(
+            {
+                "METRICS_ENABLED": "true",
+                "METRICS_MULTIPROC_DIR": str(metrics_dir),
+                "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir),
+                "METRICS_PORT": str(_free_port()),
+            }
+        )
+    command = [
+        sys.executable,
+        "-m",
+        "celery",
+        "-A",
+        "notifications_worker.app",
+        "worker",
+        "-l",
+        args.log_level,
+        "-Q",
+        "notifications.high,notifications,notifications.bulk,images",
+        "-n",
+        f"loadtest{number}@%h",
+        "--pool",
+        config.pool,
+        "--concurrency",
+        str(config.concurrency),
+        "--prefetch-multiplier",
+        str(config.prefetch),
+        "--without-gossip",
+        "--without-mingle",
+    ]
+    log = log_path.open("wb")
+    return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _wait_ready(celery_app: Any, worker: subprocess.Popen[bytes], log_path: Path) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if worker.poll() is not None:
+            raise SystemExit(f"Worker exited with {worker.returncode}, see {log_path}")
+        if celery_app.control.ping(timeout=1.0):
+            return
+    raise SystemExit(f"Worker did not start in 60s, see {log_path}")
+
+
+def _stop_worker(worker: subprocess.Popen[bytes]) -> None:
+    if worker.poll() is not None:
+        return
+    # Warm shutdown: children finish what they are doing and flush their metrics
+    worker.send_signal(signal.SIGTERM)
+    try:
+        worker.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        worker.kill()
+        worker.wait()
+
+
+def _has_prometheus() -> bool:
+    try:
+        import prometheus_client  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _read_retries(metrics_dir: Path) -> dict[str, int] | None:
+    """celery_task_retries_total of the worker by "task error"."""
+    if not _has_prometheus() or not metrics_dir.exists():
+        return None
+    from prometheus_client import CollectorRegistry
+    from prometheus_client.multiprocess import MultiProcessCollector
+
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=str(metrics_dir))
+    retries: dict[str, int] = {}
+    for metric in registry.collect():
+        if metric.name != "celery_task_retries":
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                key = f"{sample.labels['task']} {sample.labels['error']}"
+                retries[key] = retries.get(key, 0) + int(sample.value)
+    return retries
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def _percentile(values: list[float], percent: int) -> float | None:
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0] * 1000, 1)
+    return round(statistics.quantiles(values, n=100, method="inclusive")[percent - 1] * 1000, 1)
+
+
+def print_report(results: list[dict[str, Any]]) -> None:
+    header = (
+        f"{'config':<48} {'kind':<13} {'ok':>6} {'failed':>6} {'lost':>5} "
+        f"{'per sec':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    print(header)
+    for result in results:
+        for kind in ("new_orders", "notifications", "images"):
+            summary = result[kind]
+            if not summary["enqueued"]:
+                continue
+            print(
+                f"{result['config'][:48]:<48} {kind:<13} {summary['succeeded']:>6} "
+                f"{summary['failed']:>6} {summary['lost']:>5} {_cell(summary['per_second']):>8} "
+                f"{_cell(summary['p50_ms']):>9} {_cell(summary['p95_ms']):>9} "
+                f"{_cell(summary['p99_ms']):>9}"
+            )
+
+    print()
+    for result in results:
+        retries = result["retries"]
+        total = "n/a" if retries is None else sum(retries.values())
+        telegram = result["telegram_calls"]
+        rate_limited = sum(count for call, count in telegram.items() if call.endswith(" 429"))
+        print(f"{result['config']}: retries {total}, Telegram 429 answers {rate_limited}")
+        for key, count in sorted((retries or {}).items()):
+            print(f"    {key}: {count}")
+
+
+def _cell(value: float | None) -> str:
+    return "-" if value is None else f"{value:,.1f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--config", action="append", help="worker configuration (repeatable)")
+    parser.add_argument("--notifications", type=int, default=200, help="orders (x2 tasks)")
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--redis-url", default="redis://127.0.0.1:6379")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per config")
+    parser.add_argument("--log-level", default="warning", help="worker log level")
+    parser.add_argument("--output", type=Path, help="save results as JSON")
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--telegram-jitter", type=float, default=0.05)
+    parser.add_argument("--telegram-error-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-blocked-percent", type=int, default=2)
+    parser.add_argument("--telegram-global-per-second", type=float, default=30)
+    parser.add_argument("--telegram-chat-per-second", type=float, default=1)
+    parser.add_argument("--telegram-group-per-minute", type=float, default=20)
+    parser.add_argument("--upstream-latency", type=float, default=0.01, help="S3 and LeafFlow")
+    parser.add_argument("--cloudinary-eager-delay", type=float, default=1.0)
+    args = parser.parse_args()
+
+    configs = [Config.parse(text) for text in args.config or ["pool=prefork concurrency=4"]]
+    fakes = start_fakes(args)
+    point_settings_at(fakes, args.redis_url)
+    originals = [original_image(index) for index in range(min(args.images, 4))]
+
+    # Worker logs are kept for inspection
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    results = []
+    for number, config in enumerate(configs, 1):
+        print(f"[{number}/{len(configs)}] {config.name} (logs in {workdir})", file=sys.stderr)
+        results.append(run_config(config, number, args, fakes, originals, workdir))
+
+    print_report(results)
+    if args.output:
+        meta = {"time": datetime.now(UTC).isoformat(), "args": {**vars(args), "output": None}}
+        args.output.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()